@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from downsampling import peak_preserving_sample
+
+# --- Aggregate Cube ---
+# Everything the time-category charts need, precomputed once per category at load time.
+# Each entry holds small numpy arrays (one value per day or per hour of day), so the
+# dashboard callbacks only slice arrays instead of filtering and resampling data_df.
+
+SUB_METER_COLUMNS = ['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']
+# Bars drawn by the stacked sub-meter chart (split evenly across the three sub-meters)
+SUB_METER_SAMPLE_SIZE = 1000
+
+
+def _category_aggregates(rows):
+    daily_mean = rows['Energy_Consumption_kWh'].resample('D').mean(numeric_only=True)
+    daily_sums = rows[SUB_METER_COLUMNS].resample('D').sum(numeric_only=True)
+    hourly_mean = rows.groupby(rows.index.hour)['Energy_Consumption_kWh'].mean(numeric_only=True)
+
+    return {
+        'days': daily_mean.index.values,
+        'daily_mean': daily_mean.to_numpy(dtype='float64'),
+        'sub_days': daily_sums.index.values,
+        'daily_sub_sums': daily_sums.to_numpy(dtype='float64'),
+        'hours': hourly_mean.index.to_numpy(),
+        'hourly_mean': hourly_mean.to_numpy(dtype='float64'),
+        'sub_sample': _sub_meter_sample(daily_sums.to_numpy(dtype='float64')),
+    }
+
+
+def _sub_meter_sample(daily_sub_sums):
+    # Rows of the melted (DateTime, Sub_Meter) frame picked for the stacked bar chart.
+    # Min/max bucketing per sub-meter keeps the peak days that random sampling used to drop.
+    n_days = len(daily_sub_sums)
+    per_meter = SUB_METER_SAMPLE_SIZE // len(SUB_METER_COLUMNS)
+    return np.concatenate([
+        j * n_days + peak_preserving_sample(daily_sub_sums[:, j], per_meter)
+        for j in range(len(SUB_METER_COLUMNS))
+    ])
+
+
+def build_aggregate_cube(data_df, categories):
+    """Precomputes daily means/sums and hour-of-day means for 'ALL' and each Time_Category."""
+    cube = {'ALL': _category_aggregates(data_df)}
+    time_category = data_df['Time_Category']
+    if isinstance(time_category.dtype, pd.CategoricalDtype):
+        # Compact frames: compare the small integer codes instead of strings
+        codes = time_category.cat.codes.to_numpy()
+        for category in categories:
+            cube[category] = _category_aggregates(data_df[codes == time_category.cat.categories.get_loc(category)])
+    else:
+        for category in categories:
+            cube[category] = _category_aggregates(data_df[time_category == category])
+    return cube
+
+
+def slice_days(entry, start=None, end=None):
+    """A copy of a cube entry with its daily arrays limited to [start, end] (binary search)."""
+    entry = dict(entry)
+    lo = None if start is None else pd.Timestamp(start).normalize().to_datetime64()
+    hi = None if end is None else pd.Timestamp(end).normalize().to_datetime64()
+    for days_key, value_keys in (('days', ['daily_mean']), ('sub_days', ['daily_sub_sums'])):
+        days = entry[days_key]
+        i0 = 0 if lo is None else np.searchsorted(days, lo, side='left')
+        i1 = len(days) if hi is None else np.searchsorted(days, hi, side='right')
+        entry[days_key] = days[i0:i1]
+        for key in value_keys:
+            entry[key] = entry[key][i0:i1]
+    entry['sub_sample'] = _sub_meter_sample(entry['daily_sub_sums'])
+    return entry
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+
+# --- Configuration ---
+# Streams scored per hour of day: (kind flagged, meter resolution). A reading is flagged when it
+# lies more than ANOMALY_Z standard deviations above ('spike') or below ('sag') the running mean
+# of its stream and hour; the deviation is never taken below the meter's resolution.
+ANOMALY_STREAMS = {
+    'Global_active_power': ('spike', 0.002),
+    'Sub_metering_1': ('spike', 1.0),
+    'Sub_metering_2': ('spike', 1.0),
+    'Sub_metering_3': ('spike', 1.0),
+    'Voltage': ('sag', 0.01),
+}
+ANOMALY_KINDS = ['spike', 'sag', 'gap']
+# Threshold in standard deviations; ENERGY_ANOMALY_Z overrides
+ANOMALY_Z = float(os.environ.get('ENERGY_ANOMALY_Z', '8'))
+# Readings a (stream, hour) needs before its own readings are scored
+ANOMALY_WARMUP = 60
+# Flagged readings of one stream this close together (minutes) are one event
+ANOMALY_MERGE_MINUTES = 5
+# A run of at least this many missing or unreadable minutes is a gap event
+GAP_MINUTES = 1
+# Events overlaid on the time series per kind (the most severe ones in view)
+OVERLAY_EVENTS_PER_KIND = 50
+
+MINUTE_NS = 60 * 10**9
+HOUR_NS = 60 * MINUTE_NS
+
+
+def settings_key():
+    """Short hash of the detector settings, so cached events are rebuilt when they change."""
+    token = json.dumps([ANOMALY_STREAMS, ANOMALY_Z, ANOMALY_WARMUP, ANOMALY_MERGE_MINUTES, GAP_MINUTES])
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:8]
+
+
+# --- 1. Event Index ---
+class EventIndex:
+    """Anomaly events as five flat arrays, sorted by start: about 22 bytes per event.
+
+    start/end are epoch nanoseconds (both inclusive), kind indexes ANOMALY_KINDS, stream
+    indexes the ANOMALY_STREAMS columns (-1 for gaps) and severity is the peak z-score of a
+    spike or sag and the number of missing minutes of a gap. A window query binary-searches
+    the starts and the running maximum of the ends, so it costs O(log n + events returned).
+    """
+
+    FIELDS = {'start': 'int64', 'end': 'int64', 'kind': 'int8', 'stream': 'int8', 'severity': 'float32'}
+
+    def __init__(self, start, end, kind, stream, severity):
+        order = np.argsort(start, kind='stable')
+        self.start = np.asarray(start, dtype='int64')[order]
+        self.end = np.asarray(end, dtype='int64')[order]
+        self.kind = np.asarray(kind, dtype='int8')[order]
+        self.stream = np.asarray(stream, dtype='int8')[order]
+        self.severity = np.asarray(severity, dtype='float32')[order]
+        self._end_max = np.maximum.accumulate(self.end) if len(self.end) else self.end
+
+    def __len__(self):
+        return len(self.start)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.FIELDS)
+
+    @classmethod
+    def empty(cls):
+        return cls(*(np.empty(0, dtype=dtype) for dtype in cls.FIELDS.values()))
+
+    @classmethod
+    def concat(cls, indexes):
+        """One index holding the events of several (e.g. one per household)."""
+        indexes = [index for index in indexes if index is not None]
+        if not indexes:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(index, name) for index in indexes]) for name in cls.FIELDS))
+
+    def to_frame(self):
+        return pd.DataFrame({name: getattr(self, name) for name in self.FIELDS})
+
+    @classmethod
+    def from_frame(cls, frame):
+        return cls(*(frame[name].to_numpy(dtype=dtype) for name, dtype in cls.FIELDS.items()))
+
+    def counts(self):
+        """{kind: number of events}."""
+        counts = np.bincount(self.kind, minlength=len(ANOMALY_KINDS))
+        return {kind: int(count) for kind, count in zip(ANOMALY_KINDS, counts)}
+
+    def window(self, start=None, end=None, hours=None):
+        """Positions of the events overlapping [start, end], optionally only those starting in `hours`.
+
+        `hours` is a boolean array over the 24 hours of the day.
+        """
+        # Events overlap the window when they start before its end and end after its start
+        i1 = len(self.start) if end is None else int(np.searchsorted(self.start, pd.Timestamp(end).value, 'right'))
+        i0 = 0 if start is None else int(np.searchsorted(self._end_max, pd.Timestamp(start).value, 'left'))
+        positions = np.arange(i0, max(i0, i1))
+        if start is not None:
+            positions = positions[self.end[positions] >= pd.Timestamp(start).value]
+        if hours is not None:
+            positions = positions[hours[(self.start[positions] // HOUR_NS) % 24]]
+        return positions
+
+    def strongest(self, positions, per_kind=OVERLAY_EVENTS_PER_KIND):
+        """The `per_kind` most severe of `positions` for each kind, back in time order."""
+        keep = []
+        for code in range(len(ANOMALY_KINDS)):
+            of_kind = positions[self.kind[positions] == code]
+            if len(of_kind) > per_kind:
+                of_kind = of_kind[np.argsort(-np.abs(self.severity[of_kind]), kind='stable')[:per_kind]]
+            keep.append(of_kind)
+        return np.sort(np.concatenate(keep))
+
+    def describe(self, positions):
+        """Short hover text per event: stream, severity and duration."""
+        streams = list(ANOMALY_STREAMS)
+        texts = []
+        for i in positions:
+            minutes = int((self.end[i] - self.start[i]) // MINUTE_NS) + 1
+            if self.kind[i] == ANOMALY_KINDS.index('gap'):
+                texts.append(f'{minutes:,} min missing')
+            else:
+                texts.append(f'{streams[self.stream[i]]} z={self.severity[i]:.1f}, {minutes} min')
+        return texts
+
+
+def _join_runs(start, end, severity, within_ns):
+    # Joins time-sorted intervals that start within `within_ns` of the previous one's end;
+    # each run keeps its first start, last end and peak severity (negative for sags)
+    if not len(start):
+        return start, end, severity
+    new_run = np.concatenate([[True], start[1:] - np.maximum.accumulate(end)[:-1] > within_ns])
+    first = np.flatnonzero(new_run)
+    peak = np.maximum.reduceat(np.abs(severity), first)
+    signed = np.where(np.minimum.reduceat(severity, first) == -peak, -peak, peak)
+    return start[first], np.maximum.reduceat(end, first), signed
+
+
+# --- 2. Streaming Detector ---
+class AnomalyDetector:
+    """Flags spikes, voltage sags and missing-data gaps while the minute readings are parsed.
+
+    observe() is fed every raw chunk before incomplete rows are dropped. Each (stream, hour
+    of day) keeps Welford's running count, mean and sum of squared deviations: O(1) state,
+    however long the stream. Every reading is scored against the statistics of the readings
+    before it and then folded in. Within a chunk this is done with per-hour cumulative sums,
+    which give the same result as updating reading by reading. Gaps are the runs of minutes
+    between consecutive complete readings. events() returns the EventIndex.
+    """
+
+    def __init__(self, streams=ANOMALY_STREAMS, z=ANOMALY_Z, warmup=ANOMALY_WARMUP):
+        self.streams = dict(streams)
+        self.z = z
+        self.warmup = warmup
+        shape = (len(self.streams), 24)
+        self.count = np.zeros(shape, dtype='int64')
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.readings = 0
+        self._last_complete = None
+        self._parts = []
+        self._index = None
+
+    def observe(self, times, readings):
+        """Scores one chunk: `times` are its DateTimes (NaT allowed), `readings` {column: values} (NaN allowed)."""
+        with stage('detect_anomalies'):
+            t = np.asarray(times, dtype='datetime64[ns]').view('int64')
+            has_time = ~np.isnat(t.view('datetime64[ns]'))
+            t = t[has_time]
+            if not len(t):
+                return
+            self.readings += len(t)
+            columns = {col: np.asarray(values, dtype='float64')[has_time] for col, values in readings.items()}
+            complete = np.logical_and.reduce([~np.isnan(values) for values in columns.values()])
+            self._find_gaps(t[complete])
+
+            hours = (t // HOUR_NS) % 24
+            order = np.argsort(hours, kind='stable')
+            bounds = np.searchsorted(hours[order], np.arange(25))
+            for s, (col, (kind, resolution)) in enumerate(self.streams.items()):
+                flagged, z = self._score(s, columns[col][order], bounds, resolution, kind)
+                if len(flagged):
+                    flag_times = t[order[flagged]]
+                    by_time = np.argsort(flag_times, kind='stable')
+                    self._add_runs(flag_times[by_time], z[by_time], ANOMALY_KINDS.index(kind), s)
+
+    def _score(self, s, values, bounds, resolution, kind):
+        # Welford per hour of day, vectorized: within an hour's readings, the statistics before
+        # reading j come from exclusive cumulative sums of deviations from a fixed shift
+        flagged, scores = [], []
+        for hour in range(24):
+            a, b = bounds[hour], bounds[hour + 1]
+            if a == b:
+                continue
+            x = values[a:b]
+            valid = ~np.isnan(x)
+            if not valid.any():
+                continue
+            n0, m2_0 = self.count[s, hour], self.m2[s, hour]
+            shift = self.mean[s, hour] if n0 else x[valid][0]
+            d = np.where(valid, x - shift, 0.0)
+            c = np.cumsum(valid) - valid
+            sums = np.cumsum(d) - d
+            squares = np.cumsum(d * d) - d * d
+            n = n0 + c
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = shift + sums / n
+                variance = (m2_0 + squares - sums * sums / n) / (n - 1)
+                z = (x - mean) / np.sqrt(np.maximum(variance, 0.0) + resolution * resolution)
+            hit = valid & (n >= self.warmup) & ((z > self.z) if kind == 'spike' else (z < -self.z))
+            flagged.append(a + np.flatnonzero(hit))
+            scores.append(z[hit])
+            # Fold the whole hour's readings into the running state
+            total_n, total_d, total_dd = n0 + valid.sum(), d.sum(), (d * d).sum()
+            self.count[s, hour] = total_n
+            self.mean[s, hour] = shift + total_d / total_n
+            self.m2[s, hour] = m2_0 + total_dd - total_d * total_d / total_n
+        if not flagged:
+            return np.empty(0, dtype='int64'), np.empty(0)
+        return np.concatenate(flagged), np.concatenate(scores)
+
+    def _find_gaps(self, complete_times):
+        if not len(complete_times):
+            return
+        previous = complete_times if self._last_complete is None else np.concatenate([[self._last_complete],
+                                                                                       complete_times])
+        steps = np.diff(previous)
+        missing = steps // MINUTE_NS - 1
+        at = np.flatnonzero(missing >= GAP_MINUTES)
+        self._last_complete = previous.max()
+        if len(at):
+            self._parts.append((previous[at] + MINUTE_NS, previous[at + 1] - MINUTE_NS,
+                                np.full(len(at), ANOMALY_KINDS.index('gap')), np.full(len(at), -1),
+                                missing[at].astype('float32')))
+
+    def _add_runs(self, times, z, kind, stream):
+        start, end, peak = _join_runs(times, times, z, ANOMALY_MERGE_MINUTES * MINUTE_NS)
+        self._parts.append((start, end, np.full(len(start), kind), np.full(len(start), stream), peak))
+
+    def use_cached(self, index):
+        """Takes the events of an earlier run over the same source (see load_and_process_data)."""
+        self._index = index
+
+    def events(self):
+        """The EventIndex of everything observed; runs split by chunk borders are joined here."""
+        if self._index is not None:
+            return self._index
+        if not self._parts:
+            return EventIndex.empty()
+        fields = [np.concatenate(parts) for parts in zip(*self._parts)]
+        kind, stream = fields[2], fields[3]
+        gaps = kind == ANOMALY_KINDS.index('gap')
+        indexes = [EventIndex(*(field[gaps] for field in fields))]
+        for s in range(len(self.streams)):
+            runs = EventIndex(*(field[~gaps & (stream == s)] for field in fields))
+            start, end, peak = _join_runs(runs.start, runs.end, runs.severity, ANOMALY_MERGE_MINUTES * MINUTE_NS)
+            indexes.append(EventIndex(start, end, runs.kind[:len(start)], runs.stream[:len(start)], peak))
+        self._index = EventIndex.concat(indexes)
+        return self._index
@@ -1,49 +1,207 @@
+import importlib.util
+
 import dash
+import flask
 from dash import dcc, html
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 
 # Import functions and data from data_analysis.py
-from dashboard_layout import create_layout
-from data_analysis import data_df, prediction_model, model_r2, avg_hourly_usage, peak_hour
+from dashboard_layout import (create_layout, make_time_series_figure, make_sub_meter_figure, make_hourly_figure,
+                              make_breakdown_figure, make_detail_figure, make_forecast_figure,
+                              make_placeholder_figure, format_key_metrics, figure_patch,
+                              time_series_traces, time_series_layout, detail_traces, detail_layout, anomaly_traces,
+                              sub_meter_traces, hourly_traces, breakdown_traces, breakdown_layout)
+from data_analysis import get_data_service, in_worker_process
+from forecasting import LAG_HOURS, REPORT_HORIZONS, hourly_series
+from households import FLEET
+from downsampling import parse_relayout_range
+from instrumentation import register_instrumentation, timed_callback
+from live_tail import LIVE_MODE, LIVE_POLL_SECONDS, LiveTail
+from prediction_api import register_prediction_api, voltage_sweep
+from result_cache import memoized
 
 # --- App Initialization ---
+# gzip the callback responses when flask-compress is installed (pip install flask-compress)
+COMPRESS_RESPONSES = importlib.util.find_spec('flask_compress') is not None
+
 # FIX: Updated browser tab title
-app = dash.Dash(__name__, title="Energy Consumption Analysis System")
+app = dash.Dash(__name__, title="Energy Consumption Analysis System", compress=COMPRESS_RESPONSES)
 server = app.server
 
+# Start loading data / training the model in the background; the server binds immediately
+data_service = get_data_service()
+
+# Live mode: follow the source file and keep the sidebar metrics current (single-household mode only).
+# Not in multiprocessing workers: spawned pool processes (households, model selection) re-import
+# app.py, and a tail there would wait for a data load of its own (see get_data_service)
+live_tail = (LiveTail(data_service).start()
+             if LIVE_MODE and not data_service.household_dir and not in_worker_process()
+             else None)
+
+
+# --- Health Checks (for load balancers and rolling deploys) ---
+@server.route('/healthz')
+def healthz():
+    # Liveness: the process is up, whether or not the data has finished loading
+    return flask.jsonify(status=data_service.status)
+
+
+@server.route('/readyz')
+def readyz():
+    # Readiness: only route traffic here once the data and model are available
+    code = 200 if data_service.ready else 503
+    return flask.jsonify(status=data_service.status), code
+
+
+# --- Batch Prediction API (POST /api/predict, see prediction_api.py) ---
+register_prediction_api(server, data_service)
+
+# --- Instrumentation (GET /metrics in Prometheus format, see instrumentation.py) ---
+register_instrumentation(server, data_service)
+
 # --- App Layout ---
-app.layout = create_layout()
+app.layout = create_layout(live_poll_seconds=LIVE_POLL_SECONDS if LIVE_MODE else None)
 
 # --- Callbacks ---
 
+# 0. Data Loading Status (polls the background DataService until it is done)
+@app.callback(
+    [Output('data-status', 'data'),
+     Output('data-status-interval', 'disabled')],
+    [Input('data-status-interval', 'n_intervals')],
+    [State('data-status', 'data')]
+)
+@timed_callback('poll_data_status')
+def poll_data_status(n_intervals, current_status):
+    status = data_service.status
+    if status == current_status:
+        return dash.no_update, dash.no_update
+    return status, status in ('ready', 'failed')
+
+
+# Date picker bounds follow the loaded data
+@app.callback(
+    [Output('date-range-picker', 'min_date_allowed'),
+     Output('date-range-picker', 'max_date_allowed'),
+     Output('date-range-picker', 'initial_visible_month')],
+    [Input('data-status', 'data')]
+)
+@timed_callback('set_date_range_bounds')
+def set_date_range_bounds(status):
+    if status != 'ready' or data_service.data_df.empty:
+        raise PreventUpdate
+    first, last = data_service.data_df.index[0].date(), data_service.data_df.index[-1].date()
+    return first, last, first
+
+
+# Household selector options, shown once a household directory has loaded
+@app.callback(
+    [Output('household-dropdown', 'options'),
+     Output('household-selector', 'style')],
+    [Input('data-status', 'data')]
+)
+@timed_callback('set_household_options')
+def set_household_options(status):
+    if status != 'ready' or not data_service.households:
+        raise PreventUpdate
+    options = [{'label': f'All Households ({len(data_service.households)})', 'value': FLEET}]
+    options += [{'label': household, 'value': household} for household in data_service.households]
+    return options, {'display': 'block', 'marginBottom': '20px'}
+
+
+def _triggered_ids():
+    # Empty when a callback is called directly (e.g. by benchmarks/run_benchmarks.py) rather than by Dash
+    try:
+        return set(dash.callback_context.triggered_prop_ids.values())
+    except dash.exceptions.MissingCallbackContextException:
+        return set()
+
+
+def _whole_days(start_date, end_date):
+    # The picker's days as a [start, end] window of timestamps (both days included)
+    start = pd.Timestamp(start_date).normalize() if start_date else None
+    end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1) - pd.Timedelta(1) if end_date else None
+    return start, end
+
+
+def _sends_whole_figures(triggered):
+    # The first render after loading (and any direct call) sends whole figures. After that
+    # the browser already holds the templates and layouts, so only a Patch of the changed
+    # trace arrays and titles goes over the wire.
+    return not triggered or 'data-status' in triggered
+
+
+# Sidebar metrics and the breakdown pie (all categories) for the selected household or
+# the fleet, filled once the data is ready, recomputed from prefix sums when a date range
+# is picked and, in live mode, refreshed from the tail's running totals on every tick
+@app.callback(
+    [Output('avg-usage-value', 'children'),
+     Output('peak-hour-value', 'children'),
+     Output('avg-submeter-value', 'children'),
+     Output('model-r2-value', 'children'),
+     Output('appliance-breakdown-pie', 'figure')],
+    [Input('data-status', 'data'),
+     Input('live-update-interval', 'n_intervals'),
+     Input('date-range-picker', 'start_date'),
+     Input('date-range-picker', 'end_date'),
+     Input('household-dropdown', 'value')]
+)
+@timed_callback('fill_key_metrics')
+def fill_key_metrics(status, live_ticks, start_date=None, end_date=None, household=FLEET):
+    if status == 'failed':
+        return ("Error",) * 4 + (dash.no_update,)
+    if status != 'ready':
+        raise PreventUpdate
+    whole_figure = _sends_whole_figures(_triggered_ids())
+    view = data_service.view(household)
+    if start_date or end_date:
+        metrics = view.range_metrics(start_date, end_date)
+    elif live_tail is not None and live_tail.active:
+        metrics = live_tail.key_metrics()
+    else:
+        metrics = view.metrics
+    # Nothing recorded in the picked range: an empty pie with a message
+    message = 'No data in the selected date range' if metrics['peak_hour'] is None else None
+    breakdown = metrics['normalized_breakdown']
+    if whole_figure:
+        fig_breakdown = make_breakdown_figure(breakdown, message)
+    else:
+        fig_breakdown = figure_patch(breakdown_traces(breakdown), breakdown_layout(message))
+    if message is not None:
+        return ("N/A",) * 3 + (f"{data_service.model_r2:.2f}", fig_breakdown)
+    return format_key_metrics(metrics, data_service.model_r2) + (fig_breakdown,)
+
+
 # 1. Prediction Callback (For Sidebar)
 @app.callback(
     Output('prediction-output', 'children'),
-    [Input('voltage-input', 'value')]
+    [Input('voltage-input', 'value'),
+     Input('data-status', 'data')]
 )
-def update_prediction(voltage):
+@timed_callback('update_prediction')
+def update_prediction(voltage, status):
+    if status != 'ready':
+        return "Loading..." if status == 'loading' else "N/A"
+    return _prediction_text(voltage)
+
+
+# Callback results are cached per data version (see result_cache.py), so every session
+# asking for the same voltage or chart state reuses one computation
+@memoized('update_prediction', lambda: data_service.data_version)
+def _prediction_text(voltage):
+    prediction_model = data_service.prediction_model
     if voltage is None or voltage <= 0 or prediction_model is None:
         return "N/A"
     
-    # Create a dummy DataFrame with mean values for features, replacing Voltage with user input
-    # The columns must match the features used during training: 
-    # ['Global_reactive_power', 'Voltage', 'Global_intensity', 'Sub_metering_3', 'Time_of_Day', 'Month']
-    
-    # Use mean values from the data for all features except Voltage
-    dummy_data = data_df[['Global_reactive_power', 'Global_intensity', 'Sub_metering_3', 'Time_of_Day', 'Month']].mean().to_frame().T
-    
-    # Insert the user's Voltage input
-    dummy_data['Voltage'] = voltage
-    
-    # Reorder columns to match the model's training order
-    X_predict = dummy_data[['Global_reactive_power', 'Voltage', 'Global_intensity', 'Sub_metering_3', 'Time_of_Day', 'Month']]
-    
+    # Every other feature is held at its dataset mean (cached at load time), with the
+    # user's Voltage in its place; the same vectorized path backs POST /api/predict.
     try:
-        prediction = prediction_model.predict(X_predict)[0]
+        prediction = voltage_sweep(prediction_model, data_service.feature_means, [voltage])[0]
         return f"{prediction:.3f} kW"
     except Exception as e:
         return f"Error: {e}"
@@ -54,52 +212,111 @@ def update_prediction(voltage):
     [Output('time-series-graph', 'figure'),
      Output('sub-meter-breakdown-graph', 'figure'),
      Output('hourly-trend-graph', 'figure')],
-    [Input('time-category-dropdown', 'value')]
+    [Input('time-category-dropdown', 'value'),
+     Input('data-status', 'data'),
+     Input('time-series-graph', 'relayoutData'),
+     Input('date-range-picker', 'start_date'),
+     Input('date-range-picker', 'end_date'),
+     Input('household-dropdown', 'value')]
 )
-def update_graphs_by_time_category(selected_category):
-    filtered_df = data_df.copy()
-    
-    # Filter the main DataFrame based on the selected Time Category
-    if selected_category != 'ALL':
-        filtered_df = filtered_df[filtered_df['Time_Category'] == selected_category]
-        
-    # Recalculate Time Series Graph
-    ts_data = filtered_df.resample('D')['Energy_Consumption_kWh'].mean(numeric_only=True).reset_index()
-    fig_time = px.line(
-        ts_data, x='DateTime', y='Energy_Consumption_kWh',
-        title=f'1. Energy Consumption Trend Over Time (Daily Mean) - Category: {selected_category}',
-        labels={'Energy_Consumption_kWh': 'Energy (kW)'},
-        template='plotly_dark'
-    )
-    
-    # Recalculate Sub-meter Stacked Bar Chart
-    sub_metering_data = filtered_df[['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']].resample('D').sum(numeric_only=True).reset_index()
-    sub_metering_data = sub_metering_data.melt(id_vars=['DateTime'], var_name='Sub_Meter', value_name='Consumption_Wh')
-    
-    fig_submeters = px.bar(
-        sub_metering_data.sample(n=min(len(sub_metering_data), 1000), random_state=42),
-        x='DateTime', 
-        y='Consumption_Wh', 
-        color='Sub_Meter',
-        title=f'3. Daily Consumption Breakdown by Metering Sub-System - Category: {selected_category}',
-        template='plotly_dark',
-        labels={'Consumption_Wh': 'Consumption (Wh)', 'Sub_Meter': 'Sub-Meter'},
-        color_discrete_map={'Sub_metering_1': '#00FFFF', 'Sub_metering_2': '#FFA07A', 'Sub_metering_3': '#90EE90'}
-    )
-    
-    # Recalculate Hourly Trend Graph
-    hourly_mean_data = filtered_df.groupby(filtered_df.index.hour)['Energy_Consumption_kWh'].mean(numeric_only=True).reset_index().rename(columns={'DateTime': 'Time_of_Day'})
-    fig_hourly = px.bar(
-        hourly_mean_data, 
-        x='Time_of_Day', y='Energy_Consumption_kWh',
-        title=f'2. Average Consumption by Hour - Category: {selected_category}',
-        template='plotly_dark',
-        color='Energy_Consumption_kWh',
-        color_continuous_scale=px.colors.sequential.Inferno,
-        labels={'Time_of_Day': 'Hour of Day (0-23)', 'Energy_Consumption_kWh': 'Avg. Energy (kW)'}
-    )
-    
-    return fig_time, fig_submeters, fig_hourly
+@timed_callback('update_graphs_by_time_category')
+def update_graphs_by_time_category(selected_category, status, relayout_data=None, start_date=None, end_date=None,
+                                   household=FLEET):
+    # The layout's placeholder figures stay until the data is ready
+    if status != 'ready':
+        raise PreventUpdate
+
+    # Zooming the time series only redraws that graph
+    x_range = parse_relayout_range(relayout_data)
+    triggered = _triggered_ids()
+    zoom_only = triggered == {'time-series-graph'}
+    if zoom_only and x_range is None:
+        raise PreventUpdate
+    return _chart_figures(selected_category, x_range, start_date, end_date, household,
+                          _sends_whole_figures(triggered), zoom_only)
+
+
+@memoized('update_graphs_by_time_category', lambda: data_service.data_version)
+def _chart_figures(selected_category, x_range, start_date, end_date, household, whole_figures, zoom_only):
+    # Every chart is sliced from the precomputed per-category aggregates; a date range
+    # narrows the daily arrays and takes the hourly profile from the prefix sums.
+    # The anomaly events in view are overlaid on the time series as markers.
+    view = data_service.view(household)
+    if start_date or end_date:
+        entry, _ = view.range_view(selected_category, start_date, end_date)
+    else:
+        entry = view.aggregate_cube[selected_category]
+    detail = view.detail_index[selected_category] if view.detail_index else None
+    if zoom_only and detail is None:
+        # No minute detail (household mode): the browser already shows the zoomed daily
+        # series, and resending it would reset the range it just zoomed to
+        return dash.no_update, dash.no_update, dash.no_update
+
+    if isinstance(x_range, tuple) and detail is not None:
+        # Zoomed in: peak-preserving minute-level points for the visible window only
+        times, values, rows_in_window = detail.window(*x_range)
+        overlay = anomaly_traces(view.anomalies, view.anomaly_positions(selected_category, *x_range), times, values)
+        title = f'1. Energy Consumption (Minute Detail, {len(values):,} of {rows_in_window:,} readings) - Category: {selected_category}'
+        if whole_figures:
+            fig_time = make_detail_figure(times, values, title, x_range, overlay)
+        else:
+            fig_time = figure_patch(detail_traces(times, values) + overlay, detail_layout(title, x_range))
+    else:
+        positions = view.anomaly_positions(selected_category, *_whole_days(start_date, end_date))
+        overlay = anomaly_traces(view.anomalies, positions, entry['days'], entry['daily_mean'])
+        title = f'1. Energy Consumption Trend Over Time (Daily Mean) - Category: {selected_category}'
+        if whole_figures:
+            fig_time = make_time_series_figure(entry, title, overlay)
+        else:
+            fig_time = figure_patch(time_series_traces(entry) + overlay, time_series_layout(title))
+    if zoom_only:
+        return fig_time, dash.no_update, dash.no_update
+
+    sub_meter_title = f'3. Daily Consumption Breakdown by Metering Sub-System - Category: {selected_category}'
+    hourly_title = f'2. Average Consumption by Hour - Category: {selected_category}'
+    if whole_figures:
+        return fig_time, make_sub_meter_figure(entry, sub_meter_title), make_hourly_figure(entry, hourly_title)
+    return (fig_time,
+            figure_patch(sub_meter_traces(entry), {'title_text': sub_meter_title}),
+            figure_patch(hourly_traces(entry), {'title_text': hourly_title}))
+
+
+# 3. Load Forecast Callback (next 24h and 168h for the selected household or the fleet)
+@app.callback(
+    Output('forecast-graph', 'figure'),
+    [Input('data-status', 'data'),
+     Input('household-dropdown', 'value')]
+)
+@timed_callback('update_forecast')
+def update_forecast(status, household=FLEET):
+    if status != 'ready':
+        raise PreventUpdate
+    return _forecast_figure(household)
+
+
+@memoized('update_forecast', lambda: data_service.data_version)
+def _forecast_figure(household):
+    title = '4. Hourly Demand Forecast (Next 24h / 168h)'
+    forecaster = data_service.forecaster
+    if forecaster is None:
+        return make_placeholder_figure(title, 'Not enough hourly history to forecast')
+    view = data_service.view(household)
+    series = hourly_series(view.data_df)
+    if len(series) < LAG_HOURS:
+        # A household (or a short file) may not cover the week of lags a forecast starts from
+        return make_placeholder_figure(title, 'Not enough hourly history to forecast')
+    # Every horizon comes from one (features x horizons) matrix product
+    times, forecasts = forecaster.forecast(series)
+    # The forecaster is trained on the fleet; a household is scored on its own held-out hours
+    label, household_errors = 'held-out', None
+    if view is not data_service:
+        household_errors = forecaster.evaluate(series)
+        label = 'held-out' if household_errors is not None else 'fleet held-out'
+    errors = []
+    for hours in REPORT_HORIZONS:
+        mae, naive_mae = forecaster.summary(hours, household_errors)
+        errors.append(f'{hours}h MAE {mae:.3f} kW (seasonal naive {naive_mae:.3f})')
+    return make_forecast_figure(series.iloc[-LAG_HOURS:], times, forecasts, f"{title} - {label} {', '.join(errors)}")
 
 # app.py (Corrected Run App section)
 
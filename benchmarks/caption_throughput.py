@@ -0,0 +1,90 @@
+"""Times the image classifier's batched path against the original one-image-at-a-time path.
+
+    python benchmarks/caption_throughput.py --images 256 --batch-size 32
+
+Synthetic JPEGs are classified three ways: the original loop (decode, then model.predict on
+a batch of one), classify_images with the result cache off, and a single image through the
+smallest traced batch shape against the same image padded to --batch-size. Without the
+weights file in assets/, MobileNetV2 is built with untrained weights: the graph, and so the
+speed, is the same, only the labels are meaningless.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def synthetic_jpegs(n, size=(640, 480), seed=0):
+    """n distinct JPEG-encoded images: smooth colour gradients plus noise, like photos at that size."""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size[1], 0:size[0]]
+    blobs = []
+    for _ in range(n):
+        base = np.stack([(x * rng.uniform(0.1, 0.5) + y * rng.uniform(0.1, 0.5)) % 256 for _ in range(3)], axis=-1)
+        pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype('uint8')
+        buffer = BytesIO()
+        Image.fromarray(pixels).save(buffer, format='JPEG', quality=90)
+        blobs.append(buffer.getvalue())
+    return blobs
+
+
+def _best_of(fn, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), statistics.median(seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=256)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=None, help='decode threads (default: DECODE_WORKERS)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per path (the best is reported)')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_ROOT)
+    import tensorflow as tf
+    import captiongenerator as cg
+
+    workers = args.workers or cg.DECODE_WORKERS
+    weights = cg.WEIGHTS_PATH if os.path.exists(cg.WEIGHTS_PATH) else None
+    start = time.perf_counter()
+    classifier = cg.BatchClassifier(batch_size=args.batch_size, weights_path=weights)
+    print(f"Model built and {len(classifier.buckets)} batch shapes {classifier.buckets} traced in "
+          f"{time.perf_counter() - start:.1f}s ({'bundled' if weights else 'untrained'} weights, "
+          f"TensorFlow {tf.__version__}, {os.cpu_count()} CPUs).")
+    blobs = synthetic_jpegs(args.images)
+
+    rows = []
+    single, _ = _best_of(lambda: cg.classify_one_at_a_time(blobs, classifier), args.repeat)
+    rows.append(('one at a time (model.predict)', len(blobs) / single))
+    batched, _ = _best_of(lambda: cg.classify_images(blobs, classifier, None, workers), args.repeat)
+    rows.append((f'batched (batch {args.batch_size}, {workers} decode threads)', len(blobs) / batched))
+    for name, rate in rows:
+        print(f"  {name:48s} {rate:8.1f} images/s")
+    print(f"  speedup {single / batched:.2f}x")
+
+    # One upload: the batch-of-1 graph against the same image padded to the full batch
+    image = np.stack([cg.decode_image(blobs[0])])
+    one, _ = _best_of(lambda: classifier.predict(image), max(args.repeat, 10))
+    buckets, classifier.buckets = classifier.buckets, [classifier.batch_size]
+    padded, _ = _best_of(lambda: classifier.predict(image), max(args.repeat, 10))
+    classifier.buckets = buckets
+    print(f"  single image: {one * 1e3:.1f} ms with the batch-of-{buckets[0]} graph, "
+          f"{padded * 1e3:.1f} ms padded to {classifier.batch_size}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
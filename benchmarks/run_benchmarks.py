@@ -0,0 +1,264 @@
+"""Times and memory-profiles ingestion, training, layout and the dashboard callbacks.
+
+    python benchmarks/run_benchmarks.py --rows 1e5 1e6 --missing-rate 0.0125
+    python benchmarks/run_benchmarks.py --rows 1e6 --compare benchmarks/results/<older>.json
+
+For every size a synthetic file is generated once (kept in --data-dir) and the
+benchmarks run in a fresh interpreter pointed at it through ENERGY_DATA_FILE, with its
+own cache and model directories, so sizes never share caches or memory. Results go to
+one JSON file per run (schema below); --compare prints the change against an older one.
+
+    {"schema": 1, "created", "git_commit", "python", "platform", "packages": {...},
+     "runs": [{"rows", "missing_rate", "file_bytes", "hourly_rows", "frame_bytes",
+               "benchmarks": {name: {"seconds": [...], "min_s", "median_s",
+                                     "peak_alloc_mb", "max_rss_mb"}}}]}
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+RESULTS_SCHEMA = 1
+# --compare flags a benchmark whose median time grew by more than this factor
+REGRESSION_THRESHOLD = 1.10
+
+
+# --- 1. Measuring One Call ---
+def _max_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def measure(fn, repeat):
+    """Times `repeat` calls of fn(), then makes one more call under tracemalloc for peak memory."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds': [round(s, 6) for s in seconds],
+        'min_s': round(min(seconds), 6),
+        'median_s': round(statistics.median(seconds), 6),
+        'peak_alloc_mb': round(peak / 1e6, 3),
+        'max_rss_mb': round(_max_rss_mb(), 1),
+    }
+
+
+# --- 2. The Benchmarks (run inside the per-size worker process) ---
+def run_worker(data_file, repeat, skip):
+    """Runs every benchmark against data_file and returns the run's result dict."""
+    sys.path.insert(0, REPO_ROOT)
+    import dash
+    import data_analysis
+    from dashboard_layout import create_layout
+
+    results = {}
+
+    def bench(name, fn, times=repeat):
+        if any(s in name for s in skip):
+            return
+        print(f"  {name} ...", file=sys.stderr, flush=True)
+        results[name] = measure(fn, times)
+
+    # Ingestion: cold CSV parse, the streaming path, then the columnar cache once it is warm
+    bench('load_and_process_data', lambda: data_analysis.load_and_process_data(data_file, use_cache=False))
+    bench('load_and_process_data[streaming]',
+          lambda: data_analysis.load_and_process_data(data_file, use_cache=False, streaming=True))
+    # The same cold parse, scoring every minute reading for anomalies on the way
+    from anomalies import AnomalyDetector
+    bench('load_and_process_data[anomalies]',
+          lambda: data_analysis.load_and_process_data(data_file, use_cache=False, detector=AnomalyDetector()))
+    data_analysis.load_and_process_data(data_file)  # fills the cache
+    bench('load_and_process_data[cached]', lambda: data_analysis.load_and_process_data(data_file))
+
+    data = data_analysis.load_and_process_data(data_file)
+    bench('train_prediction_model', lambda: data_analysis.train_prediction_model(data, select=False))
+    # Cross-validated model selection: the folds in this process, then in the process pool
+    bench('train_prediction_model[select, 1 worker]',
+          lambda: data_analysis.train_prediction_model(data, select=True, max_workers=1), times=1)
+    bench('train_prediction_model[select, pool]',
+          lambda: data_analysis.train_prediction_model(data, select=True, max_workers=max(2, os.cpu_count())), times=1)
+    _forecast_benchmarks(bench, data.set_index('DateTime'))
+    bench('create_layout', create_layout)
+
+    # The callbacks, called directly once app.py's DataService has loaded
+    import app
+    service = app.data_service.wait()
+    first_day = service.data_df.index[0]
+    week = (str(first_day.date()), str((first_day + data_analysis.pd.Timedelta(days=6)).date()))
+    zoom = {'xaxis.range[0]': str(first_day), 'xaxis.range[1]': str(first_day + data_analysis.pd.Timedelta(days=2))}
+
+    bench('update_prediction', lambda: app.update_prediction(240, 'ready'))
+    for category in ['ALL'] + data_analysis.TIME_CATEGORIES:
+        bench(f'update_graphs_by_time_category[{category}]',
+              lambda category=category: app.update_graphs_by_time_category(category, 'ready'))
+    bench('update_graphs_by_time_category[zoom]', lambda: app.update_graphs_by_time_category('ALL', 'ready', zoom))
+    bench('update_graphs_by_time_category[week]',
+          lambda: app.update_graphs_by_time_category('ALL', 'ready', None, *week))
+    bench('fill_key_metrics', lambda: app.fill_key_metrics('ready', 0))
+    bench('fill_key_metrics[week]', lambda: app.fill_key_metrics('ready', 0, *week))
+    bench('update_forecast', lambda: app.update_forecast('ready'))
+
+    # The callbacks above run with the result cache off (see run_size); this is a cache hit
+    from result_cache import callback_cache
+    callback_cache.max_bytes = 64_000_000
+    app.update_graphs_by_time_category('ALL', 'ready')
+    bench('update_graphs_by_time_category[cached]', lambda: app.update_graphs_by_time_category('ALL', 'ready'))
+
+    return {
+        'hourly_rows': int(len(service.data_df)),
+        'frame_bytes': int(service.data_df.memory_usage(deep=True).sum()),
+        'dash_version': dash.__version__,
+        'benchmarks': results,
+    }
+
+
+def _forecast_benchmarks(bench, hourly):
+    """The batched multi-horizon forecaster against sklearn LinearRegression on the same features."""
+    import numpy as np
+    import forecasting
+    from sklearn.linear_model import LinearRegression
+
+    forecaster = forecasting.train_forecaster(hourly)
+    if forecaster is None:
+        return
+    bench('train_forecaster', lambda: forecasting.train_forecaster(hourly))
+    series = forecasting.hourly_series(hourly)
+    bench('forecast[all horizons]', lambda: forecaster.forecast(series))
+
+    # The same feature rows and targets, materialized for sklearn
+    values = series.to_numpy()
+    origins = forecasting._complete_origins(values, forecaster.horizon)
+    X = forecasting._origin_features(
+        values, np.lib.stride_tricks.sliding_window_view(values, forecasting.LAG_HOURS),
+        forecasting._WindowStats(values), series.index.hour.to_numpy(), series.index.dayofweek.to_numpy(), origins)
+    Y = np.lib.stride_tricks.sliding_window_view(values[1:], forecaster.horizon)[origins]
+    bench('train_forecaster[LinearRegression multi-output]', lambda: LinearRegression().fit(X, Y), times=1)
+    bench('train_forecaster[LinearRegression per horizon]',
+          lambda: [LinearRegression().fit(X, Y[:, h]) for h in range(forecaster.horizon)], times=1)
+    per_horizon = [LinearRegression().fit(X, Y[:, h]) for h in range(forecaster.horizon)]
+    bench('forecast[LinearRegression per horizon]', lambda: [m.predict(X[-1:]) for m in per_horizon])
+
+
+# --- 3. Driver ---
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _package_versions():
+    versions = {}
+    for name in ('numpy', 'pandas', 'sklearn', 'plotly', 'pyarrow'):
+        try:
+            versions[name] = __import__(name).__version__
+        except ImportError:
+            versions[name] = None
+    return versions
+
+
+def run_size(rows, missing_rate, data_dir, repeat, skip):
+    sys.path.insert(0, BENCHMARK_DIR)
+    from generate_data import generate
+
+    data_file = os.path.join(data_dir, f'synthetic_{rows}_{missing_rate}.txt')
+    if not os.path.exists(data_file):
+        print(f"Generating {rows:,} rows -> {data_file}", file=sys.stderr, flush=True)
+        generate(data_file, rows, missing_rate)
+
+    with tempfile.TemporaryDirectory(prefix='energy-bench-') as scratch:
+        env = dict(os.environ, ENERGY_DATA_FILE=data_file,
+                   ENERGY_CACHE_DIR=os.path.join(scratch, 'cache'), ENERGY_MODEL_DIR=os.path.join(scratch, 'models'))
+        env.pop('ENERGY_SHARED_SNAPSHOT', None)
+        env.pop('ENERGY_CALLBACK_CACHE_DIR', None)
+        env['ENERGY_CALLBACK_CACHE_MB'] = '0'
+        command = [sys.executable, os.path.abspath(__file__), '--worker', data_file, '--repeat', str(repeat)]
+        command += [arg for s in skip for arg in ('--skip', s)]
+        print(f"Benchmarking {rows:,} rows", file=sys.stderr, flush=True)
+        worker = subprocess.run(command, env=env, cwd=REPO_ROOT, stdout=subprocess.PIPE, check=True)
+
+    run = {'rows': rows, 'missing_rate': missing_rate, 'file_bytes': os.path.getsize(data_file)}
+    run.update(json.loads(worker.stdout.decode('utf-8').strip().splitlines()[-1]))
+    return run
+
+
+def compare(current, baseline_path):
+    """Prints median time and peak memory of each benchmark relative to an older results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old_runs = {(r['rows'], r['missing_rate']): r for r in baseline['runs']}
+    print(f"\nChange against {baseline_path} ({baseline.get('git_commit')}):")
+    for run in current['runs']:
+        old = old_runs.get((run['rows'], run['missing_rate']))
+        if old is None:
+            continue
+        print(f"  {run['rows']:,} rows")
+        for name, result in run['benchmarks'].items():
+            before = old['benchmarks'].get(name)
+            if before is None or not before['median_s']:
+                continue
+            ratio = result['median_s'] / before['median_s']
+            flag = '  <-- slower' if ratio > REGRESSION_THRESHOLD else ''
+            print(f"    {name:48s} {before['median_s'] * 1e3:10.3f} ms -> {result['median_s'] * 1e3:10.3f} ms "
+                  f"({ratio:5.2f}x)  peak {before['peak_alloc_mb']:.1f} -> {result['peak_alloc_mb']:.1f} MB{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=float, nargs='+', default=[1e5, 1e6], help='file sizes in minutes (1e5 to 1e8)')
+    parser.add_argument('--missing-rate', type=float, default=0.0125, help="share of rows written as '?'")
+    parser.add_argument('--repeat', type=int, default=3, help='timed calls per benchmark')
+    parser.add_argument('--skip', action='append', default=[], help='skip benchmarks whose name contains this')
+    parser.add_argument('--data-dir', default=os.path.join(BENCHMARK_DIR, 'data'))
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--compare', help='an older results file to compare against')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        # One JSON line on stdout for the driver; progress goes to stderr
+        print(json.dumps(run_worker(args.worker, args.repeat, args.skip)))
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    commit = _git_commit()
+    results = {
+        'schema': RESULTS_SCHEMA,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'packages': _package_versions(),
+        'runs': [run_size(int(rows), args.missing_rate, args.data_dir, args.repeat, args.skip) for rows in args.rows],
+    }
+
+    output = args.output or os.path.join(BENCHMARK_DIR, 'results', f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Wrote benchmark results to '{output}'.")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,13 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
 import streamlit as st
 from PIL import Image
 import tensorflow as tf
@@ -5,60 +15,310 @@ import numpy as np
 # from gtts import gTTS # gTTS remains the same
 # from io import BytesIO # io remains the same
 
-# ✅ Page configuration
-st.set_page_config(page_title="AI Keras Image Classifier", layout="wide", page_icon="📘")
+# ✅ Configuration
+# Most images per forward pass. CAPTION_BATCH_SIZE overrides.
+BATCH_SIZE = int(os.environ.get('CAPTION_BATCH_SIZE', '32'))
+# Smaller batch shapes traced next to BATCH_SIZE: a batch is padded to the smallest one that
+# fits, so a single upload runs a batch of 1, not 32, and no call ever traces a new shape
+BATCH_BUCKETS = (1, 8)
+# Threads decoding and resizing images (PIL releases the GIL while it does). CAPTION_DECODE_WORKERS overrides.
+DECODE_WORKERS = int(os.environ.get('CAPTION_DECODE_WORKERS', str(min(8, os.cpu_count() or 1))))
+IMAGE_SIZE = (224, 224)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Local model files: nothing is downloaded at startup, so the app runs air-gapped. The labels
+# ship in assets/; fetch the weights once on a connected machine with: python captiongenerator.py --fetch-assets
+ASSET_DIR = os.environ.get('CAPTION_ASSET_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets'))
+LABELS_PATH = os.path.join(ASSET_DIR, 'ImageNetLabels.txt')
+WEIGHTS_PATH = os.path.join(ASSET_DIR, 'mobilenet_v2_weights_tf_dim_ordering_tf_kernels_1.0_224.h5')
+LABELS_URL = 'https://storage.googleapis.com/download.tensorflow.org/data/ImageNetLabels.txt'
+WEIGHTS_URL = ('https://storage.googleapis.com/tensorflow/keras-applications/mobilenet_v2/'
+               + os.path.basename(WEIGHTS_PATH))
+# Results are cached by image content (SHA-256); CAPTION_CACHE_DIR moves the folder, '' turns it off
+RESULT_CACHE_DIR = os.environ.get(
+    'CAPTION_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'captions')
+)
+
+
+# ✅ Labels and model (local files only)
+def load_labels(path=LABELS_PATH):
+    """The 1000 ImageNet class names, in MobileNetV2's output order."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            labels = f.read().splitlines()
+    except FileNotFoundError:
+        print(f"❌ ERROR: Labels file '{path}' not found. Run 'python captiongenerator.py --fetch-assets' "
+              f"on a connected machine and copy {ASSET_DIR} here.")
+        raise
+    # ImageNetLabels.txt starts with a 'background' class that the Keras model does not have
+    return labels[1:] if len(labels) == 1001 else labels
+
+
+class BatchClassifier:
+    """MobileNetV2 behind one traced graph per batch shape (BATCH_BUCKETS and batch_size).
+
+    __init__ traces and warms up every shape; a batch is padded to the smallest one that
+    fits, so no call pays for tracing or Keras' predict() setup, and a single image costs
+    a batch of one. weights_path=None builds untrained weights, for timing only.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, weights_path=WEIGHTS_PATH, labels_path=LABELS_PATH):
+        self.batch_size = batch_size
+        self.buckets = sorted({size for size in BATCH_BUCKETS if size < batch_size} | {batch_size})
+        self.labels = load_labels(labels_path)
+        if weights_path is not None and not os.path.exists(weights_path):
+            # Never fall back to Keras' download: the app has to run air-gapped
+            raise FileNotFoundError(f"MobileNetV2 weights '{weights_path}' not found. Run 'python captiongenerator.py "
+                                    f"--fetch-assets' on a connected machine and copy {ASSET_DIR} here.")
+        self.model = tf.keras.applications.MobileNetV2(weights=weights_path)
+        self.tag = hashlib.sha1(('mobilenet_v2_224\n' + '\n'.join(self.labels)).encode('utf-8')).hexdigest()[:12]
+        infer = tf.function(lambda images: self.model(images, training=False))
+        self._graphs = {size: infer.get_concrete_function(tf.TensorSpec((size,) + IMAGE_SIZE + (3,), tf.float32))
+                        for size in self.buckets}
+        for size, graph in self._graphs.items():
+            graph(tf.zeros((size,) + IMAGE_SIZE + (3,)))
+
+    def predict(self, images):
+        """Class probabilities for up to batch_size preprocessed images."""
+        size = next(size for size in self.buckets if size >= len(images))
+        batch = np.zeros((size,) + IMAGE_SIZE + (3,), dtype='float32')
+        batch[:len(images)] = images
+        return self._graphs[size](tf.constant(batch)).numpy()[:len(images)]
+
+    def describe(self, probabilities):
+        top_index = int(np.argmax(probabilities))
+        return {'label': self.labels[top_index], 'index': top_index, 'score': float(probabilities[top_index])}
+
 
 # ✅ Load model (cached)
 @st.cache_resource
 def load_model_tensorflow():
-    # Load a standard Keras pre-trained model (e.g., MobileNetV2)
-    model = tf.keras.applications.MobileNetV2(weights="imagenet")
-    # Load ImageNet labels for output mapping
-    labels_url = tf.keras.utils.get_file('ImageNetLabels.txt', 
-                                         'https://storage.googleapis.com/download.tensorflow.org/data/ImageNetLabels.txt')
-    with open(labels_url) as f:
-        labels = f.read().splitlines()
-    return model, labels
-
-model, labels = load_model_tensorflow()
-
-# ... (Title, subtitle, and sidebar UI code remains largely the same) ...
-
-# ✅ File upload
-uploaded_file = st.file_uploader("📤 Upload an image", type=["jpg", "jpeg", "png"], label_visibility="visible")
-
-if uploaded_file:
-    col1, col2 = st.columns(2)
-
-    with col1:
-        image = Image.open(uploaded_file).convert('RGB')
-        st.image(image, caption="🖼️ Uploaded Image", use_container_width=True)
-
-    with col2:
-        st.markdown("### ✨ Generating Classification...")
-        progress = st.progress(0)
-
-        # 1. TensorFlow Preprocessing (Resize and convert to NumPy array)
-        image = image.resize((224, 224))
-        img_array = tf.keras.utils.img_to_array(image)
-        img_array = np.expand_dims(img_array, axis=0) # Add batch dimension
-        img_array = tf.keras.applications.mobilenet_v2.preprocess_input(img_array)
-        progress.progress(30)
-
-        # 2. TensorFlow/Keras Inference Logic
-        predictions = model.predict(img_array)
-        progress.progress(70)
-
-        # 3. Decode Predictions
-        # Get the top prediction index
-        top_index = np.argmax(predictions[0])
-        final_story = f"This image is classified as: {labels[top_index]}"
-        
-        progress.progress(100)
-
-        st.markdown("### 📘 Generated Classification")
-        story_text = st.text_area("Prediction:", value=final_story, height=150)
-        word_count = len(story_text.split())
-        st.caption(f"📝 Word count: {word_count}")
-
-        # ... (Download and gTTS audio logic would remain the same) ...
\ No newline at end of file
+    return BatchClassifier()
+
+
+# ✅ Decoding (thread pool)
+def decode_image(data):
+    """Raw image bytes -> preprocessed float32 (224, 224, 3) array."""
+    image = Image.open(BytesIO(data)).convert('RGB').resize(IMAGE_SIZE)
+    img_array = tf.keras.utils.img_to_array(image)
+    return tf.keras.applications.mobilenet_v2.preprocess_input(img_array)
+
+
+def _decoded_batches(blobs, batch_size, pool):
+    # Decoding runs one batch ahead of the model (while a batch is being classified, the next
+    # one decodes), so memory stays at two batches however many images there are
+    pending = []
+    for data in blobs:
+        pending.append(pool.submit(decode_image, data))
+        if len(pending) == 2 * batch_size:
+            yield [future.result() for future in pending[:batch_size]]
+            pending = pending[batch_size:]
+    while pending:
+        yield [future.result() for future in pending[:batch_size]]
+        pending = pending[batch_size:]
+
+
+# ✅ Result cache (content hash)
+class ResultCache:
+    """Top-1 results keyed by the SHA-256 of the image bytes, one small JSON file per image.
+
+    Entries live under the classifier's tag (model + labels), so other labels never hit.
+    """
+
+    def __init__(self, directory=RESULT_CACHE_DIR, tag=''):
+        self.directory = os.path.join(directory, tag) if directory else None
+        self._memory = {}
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + '.json')
+
+    def get(self, digest):
+        if digest in self._memory or not self.directory:
+            return self._memory.get(digest)
+        try:
+            with open(self._path(digest), encoding='utf-8') as f:
+                self._memory[digest] = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return self._memory[digest]
+
+    def put(self, digest, result):
+        self._memory[digest] = result
+        if not self.directory:
+            return
+        path = self._path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"⚠️ WARNING: Could not write the caption cache entry '{path}': {e}")
+
+
+# ✅ Batched classification
+def classify_images(blobs, classifier, cache=None, workers=DECODE_WORKERS):
+    """Top-1 result per image (dicts with label, index, score and cached), in input order.
+
+    Cached images skip decoding and inference. The rest are decoded in a thread pool and
+    run through the model batch_size at a time while the next batch is still decoding.
+    """
+    digests = [hashlib.sha256(data).hexdigest() for data in blobs]
+    results = [cache.get(digest) if cache is not None else None for digest in digests]
+    results = [dict(result, cached=True) if result is not None else None for result in results]
+    # Identical images in one request are classified once
+    todo = {}
+    for i, result in enumerate(results):
+        if result is None:
+            todo.setdefault(digests[i], i)
+    misses = list(todo.values())
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in _decoded_batches([blobs[i] for i in misses], classifier.batch_size, pool):
+            for probabilities, i in zip(classifier.predict(np.stack(batch)), misses[done:done + len(batch)]):
+                result = classifier.describe(probabilities)
+                results[i] = dict(result, cached=False)
+                if cache is not None:
+                    cache.put(digests[i], result)
+            done += len(batch)
+    for i, digest in enumerate(digests):
+        if results[i] is None:
+            results[i] = dict(results[todo[digest]], cached=True)
+    return results
+
+
+def classify_one_at_a_time(blobs, classifier):
+    """The original path: decode, then model.predict on a batch of one, for each image in turn."""
+    results = []
+    for data in blobs:
+        img_array = np.expand_dims(decode_image(data), axis=0) # Add batch dimension
+        predictions = classifier.model.predict(img_array, verbose=0)
+        results.append(classifier.describe(predictions[0]))
+    return results
+
+
+# ✅ Command line / directory mode
+def image_files(paths):
+    """Image files named in `paths`, with directories expanded (recursively, sorted)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files += [os.path.join(root, n) for n in sorted(names) if n.lower().endswith(IMAGE_EXTENSIONS)]
+        else:
+            files.append(path)
+    return files
+
+
+def fetch_assets(directory=ASSET_DIR):
+    """Downloads the MobileNetV2 weights (and a fresh copy of the labels) into `directory` (run once, online)."""
+    os.makedirs(directory, exist_ok=True)
+    for url in (LABELS_URL, WEIGHTS_URL):
+        name = os.path.basename(url)
+        shutil.copy(tf.keras.utils.get_file(name, url), os.path.join(directory, name))
+    print(f"✅ Saved the labels and MobileNetV2 weights to '{directory}'.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Classify every image in the given files and folders.')
+    parser.add_argument('paths', nargs='*', help='image files and/or folders of images')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=DECODE_WORKERS, help='decode threads')
+    parser.add_argument('--no-cache', action='store_true', help='ignore and do not fill the result cache')
+    parser.add_argument('--compare', action='store_true',
+                        help='also time the one-image-at-a-time path and report both throughputs')
+    parser.add_argument('--fetch-assets', action='store_true',
+                        help=f'download the labels and weights into {ASSET_DIR} and exit')
+    args = parser.parse_args(argv)
+    if args.fetch_assets:
+        fetch_assets()
+        return 0
+    files = image_files(args.paths)
+    if not files:
+        parser.error('no images found')
+
+    start = time.perf_counter()
+    classifier = BatchClassifier(batch_size=args.batch_size)
+    print(f"✅ Model loaded and warmed up in {time.perf_counter() - start:.1f}s.")
+    blobs = []
+    for path in files:
+        with open(path, 'rb') as f:
+            blobs.append(f.read())
+    cache = None if args.no_cache else ResultCache(tag=classifier.tag)
+
+    start = time.perf_counter()
+    results = classify_images(blobs, classifier, cache, args.workers)
+    elapsed = time.perf_counter() - start
+    for path, result in zip(files, results):
+        print('\t'.join([path, result['label'], f"{result['score']:.3f}"] + (['(cached)'] if result['cached'] else [])))
+    hits = sum(result['cached'] for result in results)
+    print(f"✅ Batched: {len(files)} images in {elapsed:.2f}s ({len(files) / elapsed:.1f} images/s, "
+          f"{hits} from cache, batch size {args.batch_size}, {args.workers} decode threads).")
+
+    if args.compare:
+        start = time.perf_counter()
+        classify_one_at_a_time(blobs, classifier)
+        elapsed_single = time.perf_counter() - start
+        print(f"✅ One at a time: {len(files)} images in {elapsed_single:.2f}s "
+              f"({len(files) / elapsed_single:.1f} images/s).")
+    return 0
+
+
+# ✅ Streamlit UI
+def run_app():
+    # ✅ Page configuration
+    st.set_page_config(page_title="AI Keras Image Classifier", layout="wide", page_icon="📘")
+
+    classifier = load_model_tensorflow()
+
+    # ... (Title, subtitle, and sidebar UI code remains largely the same) ...
+
+    # ✅ File upload (one or many images)
+    uploaded_files = st.file_uploader("📤 Upload images", type=["jpg", "jpeg", "png"], accept_multiple_files=True,
+                                      label_visibility="visible")
+    if not uploaded_files:
+        return
+
+    st.markdown("### ✨ Generating Classification...")
+    blobs = [uploaded_file.getvalue() for uploaded_file in uploaded_files]
+    start = time.perf_counter()
+    results = classify_images(blobs, classifier, load_result_cache(classifier.tag))
+    elapsed = time.perf_counter() - start
+
+    if len(uploaded_files) == 1:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.image(Image.open(uploaded_files[0]).convert('RGB'), caption="🖼️ Uploaded Image",
+                     use_container_width=True)
+        with col2:
+            final_story = f"This image is classified as: {results[0]['label']}"
+            st.markdown("### 📘 Generated Classification")
+            story_text = st.text_area("Prediction:", value=final_story, height=150)
+            word_count = len(story_text.split())
+            st.caption(f"📝 Word count: {word_count}")
+
+            # ... (Download and gTTS audio logic would remain the same) ...
+        return
+
+    st.markdown("### 📘 Generated Classifications")
+    st.caption(f"⚡ {len(blobs)} images in {elapsed:.2f}s ({len(blobs) / elapsed:.1f} images/s, "
+               f"{sum(r['cached'] for r in results)} from cache)")
+    columns = st.columns(4)
+    for i, (uploaded_file, result) in enumerate(zip(uploaded_files, results)):
+        with columns[i % 4]:
+            st.image(Image.open(uploaded_file).convert('RGB'), use_container_width=True,
+                     caption=f"{result['label']} ({result['score']:.0%})")
+
+
+@st.cache_resource
+def load_result_cache(tag):
+    return ResultCache(tag=tag)
+
+
+if __name__ == '__main__':
+    # `streamlit run captiongenerator.py` starts the app; `python captiongenerator.py <paths>` runs the CLI
+    from streamlit import runtime
+    if runtime.exists():
+        run_app()
+    else:
+        sys.exit(main())
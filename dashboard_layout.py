@@ -1,68 +1,204 @@
-from dash import dcc, html
+import base64
+
+from dash import Patch, dcc, html
+import numpy as np
 import plotly.express as px
 import pandas as pd
 import plotly.graph_objects as go # <-- Ensure this is imported
-from data_analysis import data_df, model_r2, avg_hourly_usage, peak_hour, avg_sub_metering_usage, consumption_breakdown, normalized_breakdown 
-# Ensure normalized_breakdown is imported
+from aggregates import SUB_METER_COLUMNS
+from anomalies import ANOMALY_KINDS
+# The layout no longer imports data: everything data-driven is filled in by app.py callbacks
+# once the background DataService in data_analysis.py has finished loading.
 
 # --- 1. Create Plotly Figures ---
 
-# Dynamic: Consumption Over Time 
-ts_data_daily = data_df.resample('D')['Energy_Consumption_kWh'].mean(numeric_only=True).reset_index()
-fig_time = px.line(
-    ts_data_daily, x='DateTime', y='Energy_Consumption_kWh',
-    title='1. Energy Consumption Trend Over Time (Daily Mean) - Filtered',
-    labels={'Energy_Consumption_kWh': 'Energy (kW)'},
-    template='plotly_dark'
-)
-
-# Dynamic: Voltage vs. Energy 
-fig_voltage = px.scatter(
-    data_df.sample(n=min(len(data_df), 1000), random_state=42).reset_index(), x='Voltage', y='Energy_Consumption_kWh', 
-    color='Sub_metering_3', 
-    title='Voltage vs. Energy Consumption',
-    template='plotly_dark',
-    color_discrete_map={0: '#90EE90', 1: '#FFA07A'} 
-)
-
-# Hourly Consumption Trend (Emphasizing Peak/Off-Peak)
-hourly_mean_data = data_df.groupby(data_df.index.hour)['Energy_Consumption_kWh'].mean(numeric_only=True).reset_index().rename(columns={'DateTime': 'Time_of_Day'})
-fig_hourly = px.bar(
-    hourly_mean_data, 
-    x='Time_of_Day', y='Energy_Consumption_kWh',
-    title='2. Average Consumption by Hour (Highlighting Peak & Trough Times)',
-    template='plotly_dark',
-    color='Energy_Consumption_kWh',
-    color_continuous_scale=px.colors.sequential.Inferno,
-    labels={'Time_of_Day': 'Hour of Day (0-23)', 'Energy_Consumption_kWh': 'Avg. Energy (kW)'}
-)
-
-
-# Sub-System Stacked Bar Chart 
-sub_metering_data = data_df[['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']].resample('D').sum(numeric_only=True).reset_index()
-sub_metering_data = sub_metering_data.melt(id_vars=['DateTime'], var_name='Sub_Meter', value_name='Consumption_Wh')
-
-fig_submeters = px.bar(
-    sub_metering_data.sample(n=min(len(sub_metering_data), 1000), random_state=42), 
-    x='DateTime', 
-    y='Consumption_Wh', 
-    color='Sub_Meter',
-    title='3. Daily Consumption Breakdown by Metering Sub-System - Filtered',
-    template='plotly_dark',
-    labels={'Consumption_Wh': 'Consumption (Wh)', 'Sub_Meter': 'Sub-Meter'},
-    color_discrete_map={'Sub_metering_1': '#00FFFF', 'Sub_metering_2': '#FFA07A', 'Sub_metering_3': '#90EE90'}
-)
-
-# dashboard_layout.py (Around line 52 - REPLACED fig_breakdown)
-import plotly.graph_objects as go # <-- ADD THIS IMPORT AT THE TOP OF THE FILE
-
-
-
-
-# dashboard_layout.py (Around line 60 - FINAL UPDATED fig_breakdown)
-
-# Use the normalized data to create a visually useful chart (excluding the 99.8% category)
-breakdown_df_normalized = pd.DataFrame(normalized_breakdown.items(), columns=['Appliance Category', 'Total kWh'])
+# Each chart is a fixed "shell" (template, colours, axes, one trace per series) plus the
+# data-dependent trace properties below. The filter callback in app.py sends the whole
+# figure once; after that it sends only a Patch of the trace arrays and the title, so the
+# template and layout stay in the browser. Numbers travel as base64 typed arrays (the
+# plotly.js typed-array spec) and dates as float64 milliseconds on a date axis.
+DAY_MS = 86_400_000
+
+
+def typed_array(values, dtype='f4'):
+    """Numeric array as a plotly.js typed array: {'dtype', 'bdata': base64 little-endian bytes}."""
+    values = np.asarray(values)
+    if values.size == 0:
+        return []
+    data = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<')).tobytes()
+    return {'dtype': dtype, 'bdata': base64.b64encode(data).decode('ascii')}
+
+
+def date_array(times):
+    """datetime64 values as float64 epoch milliseconds, which a date axis reads as dates."""
+    return typed_array(np.asarray(times, dtype='datetime64[ms]').astype('int64'), 'f8')
+
+
+def figure_patch(traces, layout):
+    """A dash.Patch assigning trace (by index) and layout properties.
+
+    Keys use plotly's magic underscores ('marker_color', 'title_text'); None deletes the property.
+    """
+    patch = Patch()
+    for i, props in enumerate(traces):
+        _assign(patch['data'][i], props)
+    _assign(patch['layout'], layout)
+    return patch
+
+
+def _assign(target, props):
+    for key, value in props.items():
+        *parents, leaf = key.split('_')
+        node = target
+        for parent in parents:
+            node = node[parent]
+        if value is None:
+            del node[leaf]
+        else:
+            node[leaf] = value
+
+
+def _filled(fig, traces, layout):
+    # The shell already has the right trace types; a Patch may also switch them
+    for trace, props in zip(fig.data, traces):
+        trace.update({key: value for key, value in props.items() if key != 'type'})
+    fig.update_layout(layout)
+    return fig
+
+
+# Daily mean consumption: the days are contiguous, so x is just a start date and a step
+def time_series_traces(entry):
+    days = entry['days']
+    return [{'type': 'scatter', 'x': None, 'x0': str(pd.Timestamp(days[0]).date()) if len(days) else None,
+             'dx': DAY_MS, 'y': typed_array(entry['daily_mean'])}]
+
+
+def time_series_layout(title):
+    return {'title_text': title, 'xaxis_range': None, 'xaxis_autorange': True}
+
+
+# Zoomed, minute-level view of the time series (peak-preserving min/max points)
+def detail_traces(times, values):
+    return [{'type': 'scattergl', 'x': date_array(times), 'x0': None, 'dx': None, 'y': typed_array(values)}]
+
+
+def detail_layout(title, x_range):
+    return {'title_text': title, 'xaxis_range': [str(pd.Timestamp(t)) for t in x_range], 'xaxis_autorange': None}
+
+
+# Anomaly overlay: one marker trace per kind (spike, voltage sag, gap), each event drawn on
+# the line at its start; the hover text names the stream, the z-score and the duration
+ANOMALY_MARKERS = {
+    'spike': ('Spike', {'symbol': 'triangle-up', 'color': '#FF4136', 'size': 9}),
+    'sag': ('Voltage sag', {'symbol': 'triangle-down', 'color': '#FFD700', 'size': 9}),
+    'gap': ('Missing data', {'symbol': 'x', 'color': '#A9A9A9', 'size': 7}),
+}
+
+
+def anomaly_traces(anomalies, positions, times, values):
+    """Marker arrays for the events at `positions` of an EventIndex, over the line (times, values)."""
+    if anomalies is None or positions is None:
+        return [{'x': [], 'y': [], 'text': []} for _ in ANOMALY_KINDS]
+    line_ms = np.asarray(times, dtype='datetime64[ms]').astype('int64')
+    values = np.asarray(values, dtype='float64')
+    drawn = np.isfinite(values)
+    traces = []
+    for code in range(len(ANOMALY_KINDS)):
+        of_kind = positions[anomalies.kind[positions] == code]
+        starts = anomalies.start[of_kind] // 1_000_000
+        y = np.interp(starts, line_ms[drawn], values[drawn]) if drawn.any() else np.full(len(starts), np.nan)
+        traces.append({'x': date_array(starts.astype('datetime64[ms]')), 'y': typed_array(y),
+                       'text': anomalies.describe(of_kind)})
+    return traces
+
+
+def hourly_traces(entry):
+    means = typed_array(entry['hourly_mean'])
+    return [{'x': typed_array(entry['hours'], 'i1'), 'y': means, 'marker_color': means}]
+
+
+def sub_meter_traces(entry):
+    # One bar trace per sub-meter, holding the days that meter's peak-preserving sample picked
+    days, sums, sample = entry['sub_days'], entry['daily_sub_sums'], entry['sub_sample']
+    n_days = max(len(days), 1)
+    traces = []
+    for j in range(len(SUB_METER_COLUMNS)):
+        rows = sample[sample // n_days == j] % n_days
+        traces.append({'x': date_array(days[rows]), 'y': typed_array(sums[rows, j])})
+    return traces
+
+
+def _time_series_shell(render_mode='auto'):
+    fig = px.line(
+        pd.DataFrame({'DateTime': pd.to_datetime([np.nan]), 'Energy_Consumption_kWh': [np.nan]}),
+        x='DateTime', y='Energy_Consumption_kWh',
+        labels={'Energy_Consumption_kWh': 'Energy (kW)'},
+        template='plotly_dark',
+        render_mode=render_mode
+    )
+    fig.update_xaxes(type='date')
+    for kind in ANOMALY_KINDS:
+        name, marker = ANOMALY_MARKERS[kind]
+        fig.add_trace(go.Scatter(x=[], y=[], mode='markers', name=name, marker=marker,
+                                 hovertemplate='%{text}<br>%{x}<extra></extra>'))
+    fig.update_layout(showlegend=True, legend={'orientation': 'h', 'y': -0.2, 'x': 0.5, 'xanchor': 'center'})
+    return fig
+
+
+def make_time_series_figure(entry, title, overlay=()):
+    return _filled(_time_series_shell(), time_series_traces(entry) + list(overlay), time_series_layout(title))
+
+
+def make_detail_figure(times, values, title, x_range, overlay=()):
+    return _filled(_time_series_shell('webgl'), detail_traces(times, values) + list(overlay),
+                   detail_layout(title, x_range))
+
+
+def make_hourly_figure(entry, title):
+    fig = px.bar(
+        pd.DataFrame({'Time_of_Day': [0], 'Energy_Consumption_kWh': [np.nan]}),
+        x='Time_of_Day', y='Energy_Consumption_kWh',
+        template='plotly_dark',
+        color='Energy_Consumption_kWh',
+        color_continuous_scale=px.colors.sequential.Inferno,
+        labels={'Time_of_Day': 'Hour of Day (0-23)', 'Energy_Consumption_kWh': 'Avg. Energy (kW)'}
+    )
+    return _filled(fig, hourly_traces(entry), {'title_text': title})
+
+
+def make_sub_meter_figure(entry, title):
+    fig = px.bar(
+        pd.DataFrame({'DateTime': pd.to_datetime([np.nan] * len(SUB_METER_COLUMNS)),
+                      'Sub_Meter': SUB_METER_COLUMNS, 'Consumption_Wh': [np.nan] * len(SUB_METER_COLUMNS)}),
+        x='DateTime', 
+        y='Consumption_Wh', 
+        color='Sub_Meter',
+        template='plotly_dark',
+        labels={'Consumption_Wh': 'Consumption (Wh)', 'Sub_Meter': 'Sub-Meter'},
+        color_discrete_map={'Sub_metering_1': '#00FFFF', 'Sub_metering_2': '#FFA07A', 'Sub_metering_3': '#90EE90'}
+    )
+    fig.update_xaxes(type='date')
+    return _filled(fig, sub_meter_traces(entry), {'title_text': title})
+
+
+# Load forecast: the last week of hourly readings, then every forecast hour from one batched call
+def make_forecast_figure(history, times, forecasts, title):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=date_array(history.index), y=typed_array(history.to_numpy()), mode='lines',
+                             name='Last 7 days', line={'color': '#A9A9A9'}))
+    for hours, name, line in ((len(times), 'Next 168h', {'color': '#00FFFF', 'dash': 'dot'}),
+                              (24, 'Next 24h', {'color': '#FFA07A', 'width': 3})):
+        fig.add_trace(go.Scatter(x=date_array(times[:hours]), y=typed_array(forecasts[:hours]), mode='lines',
+                                 name=name, line=line))
+    fig.update_layout(
+        title_text=title,
+        template='plotly_dark',
+        xaxis={'type': 'date', 'title': {'text': 'DateTime'}},
+        yaxis={'title': {'text': 'Energy (kW)'}},
+        legend={'orientation': 'h', 'y': -0.2, 'x': 0.5, 'xanchor': 'center'}
+    )
+    return fig
+
 
 # Define a consistent, high-contrast color palette
 device_colors = {
@@ -70,36 +206,78 @@ device_colors = {
     'Water Heater / AC (Sub-meter 3)': '#00FFFF',       # Cyan/Blue
     'General Use (Lights, Plugs, TV)': '#90EE90'        # Green
 }
-# Only include colors for the categories we are plotting
-colors_ordered = [device_colors[c] for c in breakdown_df_normalized['Appliance Category']]
-
-fig_breakdown = go.Figure(data=[go.Pie(
-    labels=breakdown_df_normalized['Appliance Category'],
-    values=breakdown_df_normalized['Total kWh'],
-    # Key settings for look and feel:
-    name="", # Remove secondary chart name
-    hole=0.4,
-    marker_colors=colors_ordered,
-    textinfo='percent+label', # Display both percentage and label inside the slice
-    insidetextorientation='radial', # Place text radially inside the slice (like your example)
-    textfont_size=16, # Increase text size for clarity
-)])
-
-fig_breakdown.update_layout(
-    title_text='5. Consumption Breakdown (Excluding Dominant Kitchen Use)',
-    template='plotly_dark',
-    height=400,
-    # Center the chart and adjust margins
-    margin=dict(l=20, r=20, t=50, b=20),
-    # Move legend outside and below the chart
-    legend=dict(
-        orientation="h",
-        y=-0.2,
-        x=0.5,
-        xanchor="center"
+
+# The pie's labels and colours never change, so after the first render only its three
+# values (and the empty-range message) are sent
+def breakdown_traces(normalized_breakdown):
+    return [{'values': [float(v) for v in normalized_breakdown.values()]}]
+
+
+def breakdown_layout(message=None):
+    annotations = [] if message is None else [
+        {'text': message, 'showarrow': False, 'font': {'size': 18, 'color': '#A9A9A9'}}
+    ]
+    return {'annotations': annotations}
+
+
+def make_breakdown_figure(normalized_breakdown, message=None):
+    # Use the normalized data to create a visually useful chart (excluding the 99.8% category)
+    labels = list(normalized_breakdown)
+
+    # Only include colors for the categories we are plotting
+    colors_ordered = [device_colors[c] for c in labels]
+
+    fig_breakdown = go.Figure(data=[go.Pie(
+        labels=labels,
+        # Key settings for look and feel:
+        name="", # Remove secondary chart name
+        hole=0.4,
+        marker_colors=colors_ordered,
+        textinfo='percent+label', # Display both percentage and label inside the slice
+        insidetextorientation='radial', # Place text radially inside the slice (like your example)
+        textfont_size=16, # Increase text size for clarity
+    )])
+
+    fig_breakdown.update_layout(
+        title_text='5. Consumption Breakdown (Excluding Dominant Kitchen Use)',
+        template='plotly_dark',
+        height=400,
+        # Center the chart and adjust margins
+        margin=dict(l=20, r=20, t=50, b=20),
+        # Move legend outside and below the chart
+        legend=dict(
+            orientation="h",
+            y=-0.2,
+            x=0.5,
+            xanchor="center"
+        )
+    )
+    return _filled(fig_breakdown, breakdown_traces(normalized_breakdown), breakdown_layout(message))
+
+
+# Shown in every graph until the background data load has finished
+def make_placeholder_figure(title, message="Loading data..."):
+    fig = go.Figure()
+    fig.update_layout(
+        title_text=title,
+        template='plotly_dark',
+        xaxis={'visible': False},
+        yaxis={'visible': False},
+        annotations=[{'text': message, 'showarrow': False, 'font': {'size': 18, 'color': '#A9A9A9'}}]
     )
-)
-# Ensure plotly.graph_objects is imported at the top of dashboard_layout.py
+    return fig
+
+
+# Sidebar metric texts, in the order of the sidebar cards
+def format_key_metrics(metrics, model_r2):
+    return (
+        f"{metrics['avg_hourly_usage']} kW",
+        f"{metrics['peak_hour']}:00 Hrs",
+        f"{metrics['avg_sub_metering_usage']} Wh",
+        f"{model_r2:.2f}",
+    )
+
+LOADING_TEXT = "..."
 
 
 # --- 2. Define Enhanced Components (UI Styles) ---
@@ -130,10 +308,18 @@ CONTENT_STYLE = {
 
 
 # --- 3. Full Layout (Raw Data Table Removed) ---
-def create_layout():
-    """Returns the full HTML layout for the Dash application."""
+def create_layout(live_poll_seconds=None):
+    """Returns the full HTML layout for the Dash application.
+
+    With live_poll_seconds set, the sidebar metrics are refreshed at that interval (live tail mode).
+    """
     return html.Div(style={'backgroundColor': '#252934', 'minHeight': '100vh', 'fontFamily': 'Arial, sans-serif'}, children=[
         
+        # --- DATA LOADING STATUS (polled until the background load has finished) ---
+        dcc.Store(id='data-status', data='loading'),
+        dcc.Interval(id='data-status-interval', interval=1000),
+        dcc.Interval(id='live-update-interval', interval=(live_poll_seconds or 60) * 1000, disabled=not live_poll_seconds),
+
         # --- HEADER (Minimal to avoid overlap) ---
         html.Div(style={'padding': '25px 0', 'backgroundColor': '#1E2130'}),
         
@@ -144,25 +330,25 @@ def create_layout():
             # Metric 1: Avg. Hourly Usage
             html.Div(style={'backgroundColor': '#333A4A', 'padding': '15px', 'borderRadius': '8px', 'marginBottom': '25px'}, children=[
                 html.H4("Avg. Total Usage (kW/h)", style={'color': '#A9A9A9', 'fontSize': '16px'}),
-                html.P(f"{avg_hourly_usage} kW", style={'fontSize': '32px', 'fontWeight': 'bold', 'color': 'white'}),
+                html.P(LOADING_TEXT, id='avg-usage-value', style={'fontSize': '32px', 'fontWeight': 'bold', 'color': 'white'}),
             ]),
             
             # Metric 2: Peak Hour
             html.Div(style={'backgroundColor': '#333A4A', 'padding': '15px', 'borderRadius': '8px', 'marginBottom': '25px'}, children=[
                 html.H4("Overall Peak Usage Time", style={'color': '#A9A9A9', 'fontSize': '16px'}),
-                html.P(f"{peak_hour}:00 Hrs", style={'fontSize': '32px', 'fontWeight': 'bold', 'color': '#FFA07A'}),
+                html.P(LOADING_TEXT, id='peak-hour-value', style={'fontSize': '32px', 'fontWeight': 'bold', 'color': '#FFA07A'}),
             ]),
 
             # Metric 3: Avg Sub-Metering
             html.Div(style={'backgroundColor': '#333A4A', 'padding': '15px', 'borderRadius': '8px', 'marginBottom': '25px'}, children=[
                 html.H4("Avg. Sub-Metering (Wh/min)", style={'color': '#A9A9A9', 'fontSize': '16px'}),
-                html.P(f"{avg_sub_metering_usage} Wh", style={'fontSize': '32px', 'fontWeight': 'bold', 'color': '#90EE90'}),
+                html.P(LOADING_TEXT, id='avg-submeter-value', style={'fontSize': '32px', 'fontWeight': 'bold', 'color': '#90EE90'}),
             ]),
 
             # Metric 4: Model R2
             html.Div(style={'backgroundColor': '#333A4A', 'padding': '15px', 'borderRadius': '8px', 'marginBottom': '40px'}, children=[
                 html.H4("Prediction Model R²", style={'color': '#A9A9A9', 'fontSize': '16px'}),
-                html.P(f"{model_r2:.2f}", style={'fontSize': '32px', 'fontWeight': 'bold', 'color': '#00FFFF'}),
+                html.P(LOADING_TEXT, id='model-r2-value', style={'fontSize': '32px', 'fontWeight': 'bold', 'color': '#00FFFF'}),
             ]),
 
             # Prediction Input Section
@@ -188,6 +374,11 @@ def create_layout():
             
             # Dropdown Filter for Time Category
             html.Div(style={'marginBottom': '30px', 'backgroundColor': '#1E2130', 'padding': '20px', 'borderRadius': '8px', 'boxShadow': '0 4px 8px rgba(0,0,0,0.3)'}, children=[
+                # Household selector: only shown when a directory of household files is loaded
+                html.Div(id='household-selector', style={'display': 'none', 'marginBottom': '20px'}, children=[
+                    html.Label("Household:", style={'color': '#00FFFF', 'display': 'block', 'marginBottom': '10px', 'fontWeight': 'bold'}),
+                    dcc.Dropdown(id='household-dropdown', options=[], value='FLEET', clearable=False, style={'color': '#252934'}),
+                ]),
                 html.Label("Filter Charts by Time Category (Peak/Off-Peak):", style={'color': '#00FFFF', 'display': 'block', 'marginBottom': '10px', 'fontWeight': 'bold'}),
                 dcc.Dropdown(
                     id='time-category-dropdown',
@@ -201,25 +392,41 @@ def create_layout():
                     clearable=False,
                     style={'color': '#252934'}
                 ),
+                # Date range: KPI cards, pie and charts are recomputed for the chosen days
+                html.Label("Filter by Date Range (leave empty for all data):", style={'color': '#00FFFF', 'display': 'block', 'marginTop': '20px', 'marginBottom': '10px', 'fontWeight': 'bold'}),
+                dcc.DatePickerRange(
+                    id='date-range-picker',
+                    display_format='DD/MM/YYYY',
+                    clearable=True,
+                    start_date_placeholder_text='Start date',
+                    end_date_placeholder_text='End date',
+                ),
             ]),
             
             # Row 1: Time Series and NEW Breakdown Pie Chart
             html.Div(className='row', style={'display': 'flex', 'flexWrap': 'wrap', 'marginBottom': '20px'}, children=[
                 html.Div(style={'width': '50%', 'padding': '10px', 'boxSizing': 'border-box'}, children=[
-                    dcc.Graph(id='time-series-graph', figure=fig_time, style={'height': '400px'})
+                    dcc.Graph(id='time-series-graph', figure=make_placeholder_figure('1. Energy Consumption Trend Over Time (Daily Mean)'), style={'height': '400px'})
                 ]),
                 html.Div(style={'width': '50%', 'padding': '10px', 'boxSizing': 'border-box'}, children=[
-                    dcc.Graph(id='appliance-breakdown-pie', figure=fig_breakdown, style={'height': '400px'})
+                    dcc.Graph(id='appliance-breakdown-pie', figure=make_placeholder_figure('5. Consumption Breakdown'), style={'height': '400px'})
                 ]),
             ]),
             
             # Row 2: Hourly Trend and Sub-System Stacked Bar
             html.Div(className='row', style={'display': 'flex', 'flexWrap': 'wrap'}, children=[
                 html.Div(style={'width': '50%', 'padding': '10px', 'boxSizing': 'border-box'}, children=[
-                    dcc.Graph(id='hourly-trend-graph', figure=fig_hourly, style={'height': '400px'})
+                    dcc.Graph(id='hourly-trend-graph', figure=make_placeholder_figure('2. Average Consumption by Hour'), style={'height': '400px'})
                 ]),
                  html.Div(style={'width': '50%', 'padding': '10px', 'boxSizing': 'border-box'}, children=[
-                    dcc.Graph(id='sub-meter-breakdown-graph', figure=fig_submeters, style={'height': '400px'})
+                    dcc.Graph(id='sub-meter-breakdown-graph', figure=make_placeholder_figure('3. Daily Consumption Breakdown by Metering Sub-System'), style={'height': '400px'})
+                ]),
+            ]),
+
+            # Row 3: Load Forecast (last week of readings, then the next 24h and 168h)
+            html.Div(className='row', style={'display': 'flex', 'flexWrap': 'wrap'}, children=[
+                html.Div(style={'width': '100%', 'padding': '10px', 'boxSizing': 'border-box'}, children=[
+                    dcc.Graph(id='forecast-graph', figure=make_placeholder_figure('4. Hourly Demand Forecast (Next 24h / 168h)'), style={'height': '400px'})
                 ]),
             ]),
         ])
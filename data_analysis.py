@@ -1,132 +1,1001 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score, mean_absolute_error
-import numpy as np
-
-# --- Configuration & Scheme Parameters ---
-# !!! IMPORTANT: Ensure this file path is correct for your system !!!
-FILE_PATH = r'C:\Users\Rabiya\Desktop\BDA\household_power_consumption.txt'
-
-# --- 1. Load, Clean, and Process Data ---
-def load_and_process_data():
-    """Loads, cleans, resamples to hourly, and engineers features."""
-    try:
-        # Load the raw data (it uses semicolon delimiter)
-        data = pd.read_csv(FILE_PATH, sep=';', low_memory=False)
-    except FileNotFoundError:
-        print(f"❌ ERROR: Data file '{FILE_PATH}' not found. Please download the Kaggle dataset and place it in your BDA folder.")
-        raise
-
-    # 1. Combine Date and Time into a single DateTime column
-    data['DateTime'] = pd.to_datetime(data['Date'] + ' ' + data['Time'], format='%d/%m/%Y %H:%M:%S', errors='coerce')
-    
-    # 2. Convert relevant columns to numeric (coercing '?' or non-numeric strings to NaN)
-    cols_to_convert = ['Global_active_power', 'Global_reactive_power', 'Voltage', 'Global_intensity', 
-                       'Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']
-    for col in cols_to_convert:
-        data[col] = pd.to_numeric(data[col], errors='coerce')
-
-    # 3. Handle Missing Values (Drop rows with any NaN values for simplicity)
-    data = data.dropna(subset=cols_to_convert + ['DateTime'])
-    
-    # Drop original string columns
-    data = data.drop(columns=['Date', 'Time'])
-    
-    # 4. Resample to HOURLY Data (Crucial for performance and hourly trends)
-    data = data.set_index('DateTime')
-    
-    # Use numeric_only=True to prevent issues with non-numeric columns
-    hourly_data = data.resample('H').mean(numeric_only=True).reset_index()
-    
-    # --- Feature Engineering ---
-    hourly_data['Energy_Consumption_kWh'] = hourly_data['Global_active_power'] * 1 
-    hourly_data['Time_of_Day'] = hourly_data['DateTime'].dt.hour
-    hourly_data['Month'] = hourly_data['DateTime'].dt.month
-    
-    # Has_AC_Numeric (Proxy for cooling/heating demand)
-    hourly_data['Has_AC_Numeric'] = (hourly_data['Sub_metering_3'] > 0).astype(int)
-
-    # Peak/Off-Peak Category
-    hourly_data['Time_Category'] = hourly_data['Time_of_Day'].apply(
-        lambda h: 'Peak Evening (17-21h)' if 17 <= h <= 21 else 
-                  'Off-Peak Night (22-8h)' if h >= 22 or h <= 8 else 
-                  'Mid-Day (9-16h)'
-    )
-    
-    return hourly_data
-
-# NOTE: The calculate_gruha_jyothi_eligibility function is removed as per your request.
-
-
-# --- 2. Run Machine Learning Model ---
-def train_prediction_model(data):
-    """Trains the Linear Regression model using the hourly data."""
-    
-    # FIX: Drop all rows with any remaining NaNs, as required by LinearRegression
-    data_clean = data.dropna()
-    if data_clean.empty:
-        print("🚨 ERROR: DataFrame is empty after cleaning. Cannot train model.")
-        return None, 0.0, 0.0 
-    
-    # Features for the ML model
-    X = data_clean[['Global_reactive_power', 'Voltage', 'Global_intensity', 'Sub_metering_3', 'Time_of_Day', 'Month']]
-    y = data_clean['Energy_Consumption_kWh']
-    
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    model = LinearRegression()
-    model.fit(X_train, y_train)
-    
-    y_pred = model.predict(X_test)
-    r2 = r2_score(y_test, y_pred)
-    mae = mean_absolute_error(y_test, y_pred)
-    
-    return model, r2, mae
-
-# data_analysis.py (REPLACE THE FINAL SECTION WITH THIS)
-
-# --- Execute Analysis ---
-data_df = load_and_process_data()
-# The Gruha Jyothi eligibility function is commented out based on past context
-# data_df = calculate_gruha_jyothi_eligibility(data_df)
-prediction_model, model_r2, model_mae = train_prediction_model(data_df)
-
-# IMPORTANT FIX: Ensure the DateTime column is the index for resample operations in the dashboard file.
-data_df = data_df.set_index('DateTime') 
-
-
-# --- Key Metrics for Frontend (UPDATED with Consumption Breakdown) ---
-
-# 1. Total Consumption Metrics for Frontend Breakdown
-# Calculate total usage for each Sub-meter (kWh)
-total_sub1_kwh = (data_df['Sub_metering_1'].sum() / 1000).round(2)
-total_sub2_kwh = (data_df['Sub_metering_2'].sum() / 1000).round(2)
-total_sub3_kwh = (data_df['Sub_metering_3'].sum() / 1000).round(2)
-total_all_subs = (total_sub1_kwh + total_sub2_kwh + total_sub3_kwh).round(2)
-
-# Calculate Residual 
-total_global_active_kwh = data_df['Energy_Consumption_kWh'].sum().round(2)
-total_residual_kwh = (total_global_active_kwh - total_all_subs).round(2)
-
-# Dictionary for the Pie Chart breakdown (This is the full data)
-consumption_breakdown = {
-    'Kitchen Appliances (Sub-meter 1)': total_sub1_kwh,
-    'Refrigerator & Laundry (Sub-meter 2)': total_sub2_kwh,
-    'Water Heater / AC (Sub-meter 3)': total_sub3_kwh,
-    'General Use (Lights, Plugs, TV)': total_residual_kwh
-}
-
-# 2. Normalized Breakdown (EXCLUDING THE DOMINANT CATEGORY for visual clarity)
-# This is the variable the dashboard_layout file is trying to import.
-normalized_breakdown = {
-    k: v 
-    for k, v in consumption_breakdown.items() 
-    if 'Kitchen Appliances' not in k 
-}
-
-
-# 3. Standard Metrics for Frontend
-avg_hourly_usage = data_df['Energy_Consumption_kWh'].mean().round(3)
-peak_hour = data_df.groupby('Time_of_Day')['Energy_Consumption_kWh'].mean(numeric_only=True).idxmax()
-avg_sub_metering_usage = (data_df['Sub_metering_1'] + data_df['Sub_metering_2'] + data_df['Sub_metering_3']).mean().round(3)
\ No newline at end of file
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score, mean_absolute_error
+import numpy as np
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+
+from aggregates import build_aggregate_cube, slice_days
+from anomalies import AnomalyDetector, EventIndex, settings_key
+from data_cache import load_cached_frames, source_fingerprint, store_cached_frames
+from downsampling import build_detail_index
+from forecasting import train_forecaster
+from instrumentation import stage
+from model_selection import select_model
+from model_store import LinearSufficientStats, load_latest_model_artifact, save_model_artifact
+from shared_snapshot import attach_snapshot
+
+# --- Configuration & Scheme Parameters ---
+# !!! IMPORTANT: Ensure this file path is correct for your system (or set ENERGY_DATA_FILE) !!!
+FILE_PATH = os.environ.get('ENERGY_DATA_FILE', r'C:\Users\Rabiya\Desktop\BDA\household_power_consumption.txt')
+# Store the hourly frame with float32/int8/categorical columns (see compact_dtypes)
+COMPACT_MEMORY = False
+# 'full' refits LinearRegression when the data changes; 'incremental' folds only the new
+# hours into the saved XᵀX / Xᵀy statistics (see train_incremental_model)
+MODEL_TRAINING_MODE = 'full'
+# Keep a min/max pyramid of the minute-level readings so zooming the time series shows
+# full-resolution detail (see downsampling.py)
+MINUTE_DETAIL = True
+# Multi-worker deployments: attach to the snapshot a loader process published in this
+# directory instead of loading per worker (see shared_snapshot.py and gunicorn_conf.py)
+SHARED_SNAPSHOT_DIR = os.environ.get('ENERGY_SHARED_SNAPSHOT')
+# 'memory' keeps the whole history in RAM; 'partitioned' keeps the cleaned readings in a
+# month-partitioned Parquet store and reads only what a query needs (see partitioned_store.py)
+STORAGE_BACKEND = os.environ.get('ENERGY_STORAGE', 'memory')
+# Flag spikes, voltage sags and missing-data gaps while the minute readings are parsed (see anomalies.py)
+ANOMALY_DETECTION = True
+# 'full' training picks the regressor and feature set by time-series cross-validation in a
+# process pool instead of fitting LinearRegression on one random split (see model_selection.py)
+MODEL_SELECTION = True
+# A directory of per-household files (one household per .txt/.csv) to load instead of FILE_PATH (see households.py)
+HOUSEHOLD_DIR = os.environ.get('ENERGY_HOUSEHOLD_DIR')
+
+# --- 1. Load, Clean, and Process Data ---
+RAW_COLUMNS = ['Date', 'Time', 'Global_active_power', 'Global_reactive_power', 'Voltage',
+               'Global_intensity', 'Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']
+NUMERIC_COLUMNS = ['Global_active_power', 'Global_reactive_power', 'Voltage', 'Global_intensity', 
+                   'Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']
+TIME_CATEGORIES = ['Peak Evening (17-21h)', 'Off-Peak Night (22-8h)', 'Mid-Day (9-16h)']
+# TIME_CATEGORIES code for every hour of the day (0-23)
+HOUR_TO_CATEGORY_CODE = np.array([1] * 9 + [2] * 8 + [0] * 5 + [1] * 2, dtype='int8')
+
+def parse_minute_data(file_path, detector=None):
+    """Parses the raw semicolon file into a clean, DateTime-indexed minute-level frame.
+
+    A detector (anomalies.AnomalyDetector) sees every row before incomplete ones are dropped.
+    """
+    try:
+        # Load the raw data (it uses semicolon delimiter)
+        with stage('read_csv'):
+            data = pd.read_csv(file_path, sep=';', low_memory=False)
+    except FileNotFoundError:
+        print(f"❌ ERROR: Data file '{file_path}' not found. Please download the Kaggle dataset and place it in your BDA folder.")
+        raise
+
+    # 1. Combine Date and Time into a single DateTime column
+    with stage('parse_datetime'):
+        data['DateTime'] = pd.to_datetime(data['Date'] + ' ' + data['Time'], format='%d/%m/%Y %H:%M:%S', errors='coerce')
+    
+    with stage('clean'):
+        # 2. Convert relevant columns to numeric (coercing '?' or non-numeric strings to NaN)
+        for col in NUMERIC_COLUMNS:
+            data[col] = pd.to_numeric(data[col], errors='coerce')
+        if detector is not None:
+            detector.observe(data['DateTime'], {col: data[col] for col in NUMERIC_COLUMNS})
+
+        # 3. Handle Missing Values (Drop rows with any NaN values for simplicity)
+        data = data.dropna(subset=NUMERIC_COLUMNS + ['DateTime'])
+
+        # Drop original string columns
+        data = data.drop(columns=['Date', 'Time'])
+    
+    return data.set_index('DateTime')
+
+
+# --- 1b. Streaming (Chunked) Ingestion ---
+# Rows per read_csv chunk in streaming mode; peak memory scales with this, not with file size.
+STREAM_CHUNKSIZE = 500_000
+
+def _parse_datetime_fast(dates, times):
+    """Vectorized DateTime parsing: each distinct Date / Time string is parsed only once.
+
+    A chunk holds at most a few hundred distinct dates and 1440 distinct times, so this is
+    equivalent to parsing 'Date Time' with '%d/%m/%Y %H:%M:%S' (errors='coerce') row by row.
+    """
+    date_codes, date_uniques = pd.factorize(dates)
+    time_codes, time_uniques = pd.factorize(times)
+    date_values = pd.to_datetime(date_uniques, format='%d/%m/%Y', errors='coerce').values
+    time_values = (pd.to_datetime('1970-01-01 ' + time_uniques, format='%Y-%m-%d %H:%M:%S', errors='coerce')
+                   - pd.Timestamp('1970-01-01')).values
+    # factorize marks missing strings with -1; send those to a trailing NaT slot
+    date_values = np.append(date_values, np.datetime64('NaT', 'ns'))
+    time_values = np.append(time_values, np.timedelta64('NaT', 'ns'))
+    return pd.DatetimeIndex(date_values[date_codes] + time_values[time_codes], name='DateTime')
+
+
+def clean_minute_chunk(chunk, detector=None):
+    """Cleans one raw chunk the same way parse_minute_data cleans the whole file."""
+    date_time = _parse_datetime_fast(chunk['Date'].to_numpy(), chunk['Time'].to_numpy())
+    numeric = {}
+    for col in NUMERIC_COLUMNS:
+        values = chunk[col]
+        # Fast path: the C parser already produced floats ('?' is read as NaN)
+        if values.dtype.kind not in 'fiu':
+            values = pd.to_numeric(values, errors='coerce')
+        numeric[col] = values.to_numpy(dtype='float64')
+    if detector is not None:
+        detector.observe(date_time, numeric)
+
+    data = pd.DataFrame(numeric, index=date_time)
+    return data[data.notna().all(axis=1) & date_time.notna()]
+
+
+def iter_minute_chunks(file_path, chunksize=STREAM_CHUNKSIZE, offset=0, detector=None):
+    """Yields cleaned, DateTime-indexed minute-level chunks of the raw file.
+
+    A non-zero `offset` must be the start of a data line (see live_tail.find_offset_of_hour);
+    reading then starts there instead of at the header. A detector sees every raw chunk.
+    """
+    try:
+        source = open(file_path, 'rb')
+    except FileNotFoundError:
+        print(f"❌ ERROR: Data file '{file_path}' not found. Please download the Kaggle dataset and place it in your BDA folder.")
+        raise
+    source.seek(offset)
+    header = {'header': None, 'names': RAW_COLUMNS} if offset else {}
+    reader = pd.read_csv(source, sep=';', na_values=['?'], chunksize=chunksize,
+                         dtype={'Date': str, 'Time': str}, **header)
+    with source, reader:
+        while True:
+            with stage('read_csv'):
+                chunk = next(reader, None)
+            if chunk is None:
+                return
+            with stage('clean'):
+                cleaned = clean_minute_chunk(chunk, detector)
+            yield cleaned
+
+
+class HourlyAccumulator:
+    """Running per-hour sums and row counts, fed with cleaned minute-level chunks.
+
+    Rows of the newest hour are held back until a later hour shows up, so for time-ordered
+    input every hour is reduced in a single groupby and hourly_frame() matches
+    resample('h').mean() exactly. Out-of-order rows are still merged into their hour.
+    """
+
+    def __init__(self, columns=NUMERIC_COLUMNS):
+        self.columns = list(columns)
+        self._pending = None
+        self._sums = []
+        self._counts = []
+
+    def add(self, chunk):
+        """Folds a cleaned, DateTime-indexed chunk into the accumulators."""
+        if self._pending is not None and len(self._pending):
+            chunk = pd.concat([self._pending, chunk[self.columns]])
+        else:
+            chunk = chunk[self.columns]
+        if chunk.empty:
+            return
+        hours = chunk.index.floor('h')
+        is_last_hour = hours == hours.max()
+        self._pending = chunk[is_last_hour]
+        self._fold(chunk[~is_last_hour], hours[~is_last_hour])
+
+    def _fold(self, rows, hours):
+        if rows.empty:
+            return
+        grouped = rows.groupby(hours)
+        self._sums.append(grouped.sum())
+        self._counts.append(grouped.size())
+        # Keep the number of partial frames small for very long streams
+        if len(self._sums) >= 64:
+            self._sums, self._counts = [self._merged(self._sums)], [self._merged(self._counts)]
+
+    @staticmethod
+    def _merged(parts):
+        merged = pd.concat(parts)
+        if not merged.index.is_unique:
+            merged = merged.groupby(level=0).sum()
+        return merged.sort_index()
+
+    def drain_completed(self):
+        """Returns (sums, counts) of the completed hours and forgets them.
+
+        The newest, still-open hour stays pending. Used by live tailing so the
+        accumulator only ever holds the hours touched since the last drain.
+        """
+        if not self._sums:
+            return pd.DataFrame(columns=self.columns, dtype='float64'), pd.Series(dtype='int64')
+        sums, counts = self._merged(self._sums), self._merged(self._counts)
+        self._sums, self._counts = [], []
+        return sums, counts
+
+    def totals(self):
+        """Returns (sums, counts) per hour, including the still-open newest hour."""
+        sums, counts = list(self._sums), list(self._counts)
+        if self._pending is not None and len(self._pending):
+            grouped = self._pending.groupby(self._pending.index.floor('h'))
+            sums.append(grouped.sum())
+            counts.append(grouped.size())
+        if not sums:
+            return pd.DataFrame(columns=self.columns, dtype='float64'), pd.Series(dtype='int64')
+        return self._merged(sums), self._merged(counts)
+
+    def hourly_frame(self):
+        """Returns the hourly means in the same shape as resample('h').mean().reset_index()."""
+        sums, counts = self.totals()
+        if sums.empty:
+            return pd.DataFrame(columns=['DateTime'] + self.columns)
+        full_range = pd.date_range(sums.index[0], sums.index[-1], freq='h', name='DateTime')
+        means = sums.div(counts, axis=0).reindex(full_range)
+        return means.reset_index()
+
+
+def stream_hourly_data(file_path, chunksize=STREAM_CHUNKSIZE, detector=None):
+    """Builds the hourly resample chunk by chunk without holding the raw file in memory."""
+    accumulator = HourlyAccumulator()
+    for chunk in iter_minute_chunks(file_path, chunksize, detector=detector):
+        with stage('resample_hourly'):
+            accumulator.add(chunk)
+    with stage('resample_hourly'):
+        return accumulator.hourly_frame()
+
+
+def engineer_features(hourly_data):
+    """Adds the model/dashboard feature columns to an hourly frame with a DateTime column."""
+    hourly_data['Energy_Consumption_kWh'] = hourly_data['Global_active_power'] * 1 
+    hourly_data['Time_of_Day'] = hourly_data['DateTime'].dt.hour
+    hourly_data['Month'] = hourly_data['DateTime'].dt.month
+    
+    # Has_AC_Numeric (Proxy for cooling/heating demand)
+    hourly_data['Has_AC_Numeric'] = (hourly_data['Sub_metering_3'] > 0).astype(int)
+
+    # Peak/Off-Peak Category (17-21h Peak Evening, 22-8h Off-Peak Night, 9-16h Mid-Day),
+    # looked up per hour in one vectorized take instead of a per-row apply
+    category_codes = HOUR_TO_CATEGORY_CODE[hourly_data['Time_of_Day'].to_numpy()]
+    hourly_data['Time_Category'] = np.asarray(TIME_CATEGORIES, dtype=object)[category_codes]
+    
+    return hourly_data
+
+
+# --- 1c. Compact Memory Mode ---
+FLOAT32_COLUMNS = NUMERIC_COLUMNS + ['Energy_Consumption_kWh']
+INT8_COLUMNS = ['Time_of_Day', 'Month', 'Has_AC_Numeric']
+
+def compact_dtypes(hourly_data):
+    """Returns a copy of the hourly frame with float32 readings, int8 calendar fields and a
+    Categorical Time_Category (one int8 code per row instead of a Python string)."""
+    compact = hourly_data.copy()
+    # Column subsets (e.g. read from the partitioned store) keep whichever columns they have
+    for col in FLOAT32_COLUMNS:
+        if col in compact:
+            compact[col] = compact[col].astype('float32')
+    for col in INT8_COLUMNS:
+        if col in compact:
+            compact[col] = compact[col].astype('int8')
+    if 'Time_Category' in compact:
+        compact['Time_Category'] = pd.Categorical(compact['Time_Category'], categories=TIME_CATEGORIES)
+    return compact
+
+
+def memory_report(before, after):
+    """Bytes per column of two versions of the same frame (deep, i.e. including string objects)."""
+    report = pd.DataFrame({
+        'before_bytes': before.memory_usage(index=True, deep=True),
+        'after_bytes': after.memory_usage(index=True, deep=True),
+    })
+    report.loc['TOTAL'] = report.sum()
+    report['saved_pct'] = (100 * (1 - report['after_bytes'] / report['before_bytes'])).round(1)
+    return report
+
+
+def load_minute_data(file_path=None, use_cache=True):
+    """Returns the cleaned minute-level frame, reusing the on-disk cache when it is current."""
+    file_path = file_path or FILE_PATH
+    if use_cache:
+        cached = load_cached_frames(file_path, ['minute'])
+        if cached is not None:
+            return cached['minute']
+
+    data = parse_minute_data(file_path)
+    if use_cache:
+        store_cached_frames(file_path, {'minute': data})
+    return data
+
+
+def load_and_process_data(file_path=None, use_cache=True, streaming=False, chunksize=STREAM_CHUNKSIZE,
+                          compact=False, storage=None, start=None, end=None, columns=None, detector=None):
+    """Loads, cleans, resamples to hourly, and engineers features.
+
+    The cleaned minute frame and its hourly resample are cached in a columnar file keyed
+    by the source's size/mtime/hash (see data_cache.py), so later starts skip CSV parsing.
+    With streaming=True the file is read in chunks of `chunksize` rows and folded straight
+    into hourly accumulators; the minute-level frame is never materialised.
+    compact=True returns the frame in compact_dtypes() form.
+    A detector (anomalies.AnomalyDetector) scores the minute readings during parsing; its
+    events are cached next to the hourly frame and handed back to it on a cache hit.
+
+    With storage='partitioned' (default: STORAGE_BACKEND) the hourly rows come from the
+    month-partitioned store, which is brought up to date first; only the months between
+    `start` and `end` (whole days, inclusive) and the listed `columns` are read.
+    """
+    file_path = file_path or FILE_PATH
+    if (storage or STORAGE_BACKEND) == 'partitioned':
+        # Imported here: partitioned_store builds on the parsing helpers in this module
+        from partitioned_store import open_store
+        hourly_data = open_store(file_path, chunksize).read('hourly', columns, start, end).reset_index()
+        return compact_dtypes(hourly_data) if compact else hourly_data
+
+    # Events are cached per detector settings, so changing a threshold re-parses the file
+    events_name = f'events-{settings_key()}'
+    with stage('cache_read'):
+        names = ['hourly'] if detector is None else ['hourly', events_name]
+        cached = load_cached_frames(file_path, names) if use_cache else None
+    if cached is not None:
+        hourly_data = cached['hourly']
+        if detector is not None:
+            detector.use_cached(EventIndex.from_frame(cached[events_name]))
+    elif streaming:
+        hourly_data = stream_hourly_data(file_path, chunksize, detector)
+        if use_cache:
+            with stage('cache_write'):
+                store_cached_frames(file_path, _with_events({'hourly': hourly_data}, events_name, detector))
+    else:
+        data = parse_minute_data(file_path, detector)
+        
+        # 4. Resample to HOURLY Data (Crucial for performance and hourly trends)
+        # Use numeric_only=True to prevent issues with non-numeric columns
+        with stage('resample_hourly'):
+            hourly_data = data.resample('h').mean(numeric_only=True).reset_index()
+        if use_cache:
+            with stage('cache_write'):
+                store_cached_frames(file_path, _with_events({'minute': data, 'hourly': hourly_data}, events_name, detector))
+    
+    # --- Feature Engineering ---
+    with stage('engineer_features'):
+        hourly_data = engineer_features(hourly_data)
+    if compact:
+        with stage('compact_dtypes'):
+            hourly_data = compact_dtypes(hourly_data)
+    return hourly_data
+
+
+def _with_events(frames, events_name, detector):
+    if detector is not None:
+        frames[events_name] = detector.events().to_frame()
+    return frames
+
+# NOTE: The calculate_gruha_jyothi_eligibility function is removed as per your request.
+
+
+# --- 2. Run Machine Learning Model ---
+# Features for the ML model, in the column order the model is trained on
+MODEL_FEATURES = ['Global_reactive_power', 'Voltage', 'Global_intensity', 'Sub_metering_3', 'Time_of_Day', 'Month']
+
+def train_prediction_model(data, select=None, max_workers=None):
+    """Trains the prediction model using the hourly data.
+
+    With model selection (select, default MODEL_SELECTION) the winner of the time-series
+    cross-validation is returned with its mean fold R² and MAE; otherwise a LinearRegression
+    scored on one random 80/20 split. max_workers overrides model_selection.SELECTION_WORKERS.
+    """
+    select = MODEL_SELECTION if select is None else select
+
+    # FIX: Drop all rows with any remaining NaNs, as required by LinearRegression
+    with stage('model_prepare'):
+        data_clean = data.dropna()
+        if data_clean.empty:
+            print("🚨 ERROR: DataFrame is empty after cleaning. Cannot train model.")
+            return None, 0.0, 0.0 
+
+    if select:
+        # The folds need time order (a household fleet is stored household by household);
+        # the one float64 matrix is what the workers share
+        with stage('model_prepare'):
+            if 'DateTime' in data_clean.columns:
+                data_clean = data_clean.sort_values('DateTime', kind='stable')
+            else:
+                data_clean = data_clean.sort_index(kind='stable')
+            X = data_clean[MODEL_FEATURES].to_numpy(dtype='float64')
+            y = data_clean['Energy_Consumption_kWh'].to_numpy(dtype='float64')
+        try:
+            model, r2, mae, _ = select_model(X, y, MODEL_FEATURES, max_workers)
+            return model, r2, mae
+        except ValueError as e:
+            print(f"⚠️ WARNING: Model selection skipped ({e}); fitting LinearRegression on one split.")
+
+    with stage('model_prepare'):
+        # Features for the ML model
+        X = data_clean[MODEL_FEATURES]
+        y = data_clean['Energy_Consumption_kWh']
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    with stage('model_fit'):
+        model = LinearRegression()
+        model.fit(X_train, y_train)
+    
+    with stage('model_evaluate'):
+        y_pred = model.predict(X_test)
+        r2 = r2_score(y_test, y_pred)
+        mae = mean_absolute_error(y_test, y_pred)
+    
+    return model, r2, mae
+
+# --- 2b. Incremental Training (Sufficient Statistics) ---
+# Every HOLDOUT_EVERY-th hour (by a stable hash of its timestamp) is held out for R²/MAE,
+# so the train/test assignment of an hour never changes as data is appended.
+HOLDOUT_EVERY = 5
+
+def _holdout_mask(timestamps):
+    return (pd.util.hash_pandas_object(timestamps, index=False).to_numpy() % HOLDOUT_EVERY) == 0
+
+
+def _linear_model(intercept, coef):
+    # A fitted LinearRegression built from solved coefficients, usable with predict()
+    model = LinearRegression()
+    model.coef_ = np.asarray(coef, dtype='float64')
+    model.intercept_ = float(intercept)
+    model.feature_names_in_ = np.asarray(MODEL_FEATURES, dtype=object)
+    model.n_features_in_ = len(MODEL_FEATURES)
+    return model
+
+
+def train_incremental_model(data, state=None):
+    """Trains (or updates) the linear model from running least-squares statistics.
+
+    `data` is the hourly frame with a DateTime column. With a previous `state`, only hours
+    after state['trained_through'] are folded in, so an update costs O(new rows).
+    Returns (model, r2, mae, state); R² covers every held-out hour seen so far, MAE the
+    held-out hours of this batch.
+    """
+    data_clean = data.dropna()
+    if state is None:
+        state = {
+            'train': LinearSufficientStats(len(MODEL_FEATURES)),
+            'test': LinearSufficientStats(len(MODEL_FEATURES)),
+            'trained_through': None,
+            'mae': 0.0,
+        }
+    elif state['trained_through'] is not None:
+        data_clean = data_clean[data_clean['DateTime'] > state['trained_through']]
+
+    if not data_clean.empty:
+        holdout = _holdout_mask(data_clean['DateTime'])
+        X = data_clean[MODEL_FEATURES].to_numpy(dtype='float64')
+        y = data_clean['Energy_Consumption_kWh'].to_numpy(dtype='float64')
+        state['train'].update(X[~holdout], y[~holdout])
+        state['test'].update(X[holdout], y[holdout])
+        state['trained_through'] = data_clean['DateTime'].max()
+
+    if state['train'].n == 0:
+        print("🚨 ERROR: DataFrame is empty after cleaning. Cannot train model.")
+        return None, 0.0, 0.0, state
+
+    intercept, coef = state['train'].solve()
+    model = _linear_model(intercept, coef)
+    r2 = state['test'].r2(intercept, coef)
+    if not data_clean.empty and holdout.any():
+        state['mae'] = float(np.abs(X[holdout] @ coef + intercept - y[holdout]).mean())
+    return model, r2, state['mae'], state
+
+
+def training_settings(mode=None):
+    """The configuration a saved model was trained under; a model saved under other settings is retrained."""
+    mode = mode or MODEL_TRAINING_MODE
+    # Model selection only applies to 'full' training
+    return {'mode': mode, 'model_selection': MODEL_SELECTION if mode == 'full' else None}
+
+
+def load_or_train_model(data, source, mode=None):
+    """Reuses the saved model artifact for this data version, or (re)trains and saves one.
+
+    `source` identifies the data version (see data_cache.source_fingerprint). The artifact
+    must also have been trained under the current training_settings() (MODEL_TRAINING_MODE,
+    MODEL_SELECTION). In 'incremental' mode a stale artifact is updated with only the hours
+    it has not seen. Returns (model, r2, mae, artifact_version).
+    """
+    mode = mode or MODEL_TRAINING_MODE
+    settings = training_settings(mode)
+    artifact = load_latest_model_artifact(MODEL_FEATURES)
+    if artifact is not None and artifact['source'] == source and artifact.get('settings') == settings:
+        return artifact['model'], artifact['r2'], artifact['mae'], artifact['version']
+
+    state = None
+    if mode == 'incremental':
+        # Only extend statistics that were accumulated from the same source file
+        previous = None
+        if artifact is not None and artifact['incremental'] and artifact['source']['source'] == source['source']:
+            previous = artifact['training_state']
+        with stage('model_fit_incremental'):
+            model, r2, mae, state = train_incremental_model(data, previous)
+    else:
+        model, r2, mae = train_prediction_model(data)
+    if model is None:
+        return model, r2, mae, None
+
+    feature_means = data[MODEL_FEATURES].astype('float64').mean()
+    version = save_model_artifact(model, r2, mae, feature_means, MODEL_FEATURES, source, training_state=state,
+                                  settings=settings)
+    return model, r2, mae, version
+
+
+# --- 3. Key Metrics for Frontend (UPDATED with Consumption Breakdown) ---
+def _key_metrics(sub1_sum, sub2_sum, sub3_sum, energy_sum, avg_hourly_usage, peak_hour, avg_sub_metering_usage):
+    # Shared by compute_key_metrics (whole frame) and HourlyMetricTotals (running totals).
+    # Plain floats, so compact (float32) sums round and display exactly like the default ones
+    sub1_sum, sub2_sum, sub3_sum, energy_sum = float(sub1_sum), float(sub2_sum), float(sub3_sum), float(energy_sum)
+    avg_hourly_usage, avg_sub_metering_usage = float(avg_hourly_usage), float(avg_sub_metering_usage)
+
+    # 1. Total Consumption Metrics for Frontend Breakdown
+    # Calculate total usage for each Sub-meter (kWh)
+    total_sub1_kwh = np.round(sub1_sum / 1000, 2)
+    total_sub2_kwh = np.round(sub2_sum / 1000, 2)
+    total_sub3_kwh = np.round(sub3_sum / 1000, 2)
+    total_all_subs = np.round(total_sub1_kwh + total_sub2_kwh + total_sub3_kwh, 2)
+
+    # Calculate Residual 
+    total_global_active_kwh = np.round(energy_sum, 2)
+    total_residual_kwh = np.round(total_global_active_kwh - total_all_subs, 2)
+
+    # Dictionary for the Pie Chart breakdown (This is the full data)
+    consumption_breakdown = {
+        'Kitchen Appliances (Sub-meter 1)': total_sub1_kwh,
+        'Refrigerator & Laundry (Sub-meter 2)': total_sub2_kwh,
+        'Water Heater / AC (Sub-meter 3)': total_sub3_kwh,
+        'General Use (Lights, Plugs, TV)': total_residual_kwh
+    }
+
+    # 2. Normalized Breakdown (EXCLUDING THE DOMINANT CATEGORY for visual clarity)
+    normalized_breakdown = {
+        k: v 
+        for k, v in consumption_breakdown.items() 
+        if 'Kitchen Appliances' not in k 
+    }
+
+    # 3. Standard Metrics for Frontend
+    return {
+        'total_sub1_kwh': total_sub1_kwh,
+        'total_sub2_kwh': total_sub2_kwh,
+        'total_sub3_kwh': total_sub3_kwh,
+        'total_all_subs': total_all_subs,
+        'total_global_active_kwh': total_global_active_kwh,
+        'total_residual_kwh': total_residual_kwh,
+        'consumption_breakdown': consumption_breakdown,
+        'normalized_breakdown': normalized_breakdown,
+        'avg_hourly_usage': np.round(avg_hourly_usage, 3),
+        'peak_hour': None if peak_hour is None else int(peak_hour),
+        'avg_sub_metering_usage': np.round(avg_sub_metering_usage, 3),
+    }
+
+
+def compute_key_metrics(data_df):
+    """Computes the sidebar numbers and the pie-chart breakdown from the DateTime-indexed hourly frame."""
+    # Summed in float64 even when the frame is compact (float32 readings)
+    readings = data_df[['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3', 'Energy_Consumption_kWh']].astype('float64')
+    return _key_metrics(
+        readings['Sub_metering_1'].sum(),
+        readings['Sub_metering_2'].sum(),
+        readings['Sub_metering_3'].sum(),
+        readings['Energy_Consumption_kWh'].sum(),
+        readings['Energy_Consumption_kWh'].mean(),
+        readings['Energy_Consumption_kWh'].groupby(data_df['Time_of_Day']).mean().idxmax(),
+        (readings['Sub_metering_1'] + readings['Sub_metering_2'] + readings['Sub_metering_3']).mean(),
+    )
+
+
+class HourlyMetricTotals:
+    """Running sums behind compute_key_metrics, so new hours update the metrics in O(new hours).
+
+    add() folds DateTime-indexed hourly rows in; key_metrics() returns the same dict as
+    compute_key_metrics over every hour added so far (plus an optional still-open hour).
+    """
+
+    def __init__(self):
+        self.sub_sums = np.zeros(3)
+        self.energy_sum = 0.0
+        self.energy_hours = 0
+        self.sub_total_sum = 0.0
+        self.sub_total_hours = 0
+        self.hour_of_day_sums = np.zeros(24)
+        self.hour_of_day_counts = np.zeros(24, dtype='int64')
+
+    def add(self, hourly, sign=1):
+        """Adds (sign=1) or removes (sign=-1) hourly rows from the totals."""
+        energy = hourly['Energy_Consumption_kWh'].to_numpy(dtype='float64')
+        subs = hourly[['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']].to_numpy(dtype='float64')
+        has_energy = ~np.isnan(energy)
+        sub_total = subs.sum(axis=1)
+        has_subs = ~np.isnan(sub_total)
+        hours = hourly.index.hour.to_numpy()[has_energy]
+
+        self.sub_sums += sign * np.nansum(subs, axis=0)
+        self.energy_sum += sign * energy[has_energy].sum()
+        self.energy_hours += sign * int(has_energy.sum())
+        self.sub_total_sum += sign * sub_total[has_subs].sum()
+        self.sub_total_hours += sign * int(has_subs.sum())
+        self.hour_of_day_sums += sign * np.bincount(hours, weights=energy[has_energy], minlength=24)
+        self.hour_of_day_counts += sign * np.bincount(hours, minlength=24)
+
+    def key_metrics(self, open_hours=None):
+        """compute_key_metrics() over the added hours, plus `open_hours` without storing them."""
+        if open_hours is not None and len(open_hours):
+            self.add(open_hours)
+            try:
+                return self.key_metrics()
+            finally:
+                self.add(open_hours, sign=-1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            hour_of_day_means = self.hour_of_day_sums / self.hour_of_day_counts
+        return _key_metrics(
+            self.sub_sums[0], self.sub_sums[1], self.sub_sums[2], self.energy_sum,
+            self.energy_sum / self.energy_hours if self.energy_hours else np.nan,
+            int(np.nanargmax(hour_of_day_means)) if self.energy_hours else None,
+            self.sub_total_sum / self.sub_total_hours if self.sub_total_hours else np.nan,
+        )
+
+
+# --- 3b. Date-Range Totals (Prefix Sums) ---
+class PrefixSumIndex:
+    """Cumulative sums over the hourly frame, so any date range is totalled in O(log n).
+
+    For 'ALL' and each Time_Category it keeps running sums of the sub-meters, the energy and
+    their valid-hour counts, plus running per-hour-of-day energy sums/counts. A range query
+    binary-searches the time index for its two ends and subtracts two rows, however many
+    hours the range covers.
+    """
+
+    def __init__(self, data_df, categories=TIME_CATEGORIES):
+        self.times = data_df.index.values.astype('datetime64[ns]').view('int64')
+        self.categories = list(categories)
+        energy = data_df['Energy_Consumption_kWh'].to_numpy(dtype='float64')
+        subs = data_df[['Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']].to_numpy(dtype='float64')
+        sub_total = subs.sum(axis=1)
+        has_energy = ~np.isnan(energy)
+        has_subs = ~np.isnan(sub_total)
+
+        # Columns: sub1, sub2, sub3, energy, energy hours, sub total, sub total hours
+        base = np.column_stack([
+            np.nan_to_num(subs), np.where(has_energy, energy, 0.0), has_energy,
+            np.where(has_subs, sub_total, 0.0), has_subs,
+        ])
+        hour_of_day = data_df.index.hour.to_numpy()
+        rows = np.arange(len(data_df))
+        by_hour = np.zeros((len(data_df), 48))
+        by_hour[rows, hour_of_day] = base[:, 3]
+        by_hour[rows, 24 + hour_of_day] = has_energy
+
+        self._all = self._cumulative(np.hstack([base, by_hour]))
+        self._hour_codes = HOUR_TO_CATEGORY_CODE[hour_of_day]
+        self._by_category = {
+            category: self._cumulative(base * (self._hour_codes == code)[:, None])
+            for code, category in enumerate(self.categories)
+        }
+
+    @staticmethod
+    def _cumulative(values):
+        out = np.zeros((len(values) + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=out[1:])
+        return out
+
+    def bounds(self, start=None, end=None):
+        """Row range [i0, i1) of the hours from `start` up to the end of day `end` (inclusive)."""
+        i0 = 0 if start is None else int(np.searchsorted(self.times, pd.Timestamp(start).normalize().value, side='left'))
+        end_value = None if end is None else (pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).value
+        i1 = len(self.times) if end_value is None else int(np.searchsorted(self.times, end_value, side='left'))
+        return i0, max(i0, i1)
+
+    def totals(self, start=None, end=None, category='ALL'):
+        """HourlyMetricTotals for the date range (and category), from two prefix-sum rows."""
+        i0, i1 = self.bounds(start, end)
+        all_sums = self._all[i1] - self._all[i0]
+        base = all_sums[:7] if category == 'ALL' else self._by_category[category][i1] - self._by_category[category][i0]
+
+        totals = HourlyMetricTotals()
+        totals.sub_sums = base[:3].copy()
+        totals.energy_sum, totals.energy_hours = base[3], int(round(base[4]))
+        totals.sub_total_sum, totals.sub_total_hours = base[5], int(round(base[6]))
+        totals.hour_of_day_sums = all_sums[7:31].copy()
+        totals.hour_of_day_counts = np.rint(all_sums[31:55]).astype('int64')
+        if category != 'ALL':
+            # Hours of day outside the category contribute nothing to it
+            outside = HOUR_TO_CATEGORY_CODE != self.categories.index(category)
+            totals.hour_of_day_sums[outside] = 0.0
+            totals.hour_of_day_counts[outside] = 0
+        return totals
+
+    def hour_of_day_means(self, start=None, end=None, category='ALL'):
+        """(hours, mean energy) for the hours of day that have data in the range."""
+        totals = self.totals(start, end, category)
+        hours = np.flatnonzero(totals.hour_of_day_counts)
+        return hours, totals.hour_of_day_sums[hours] / totals.hour_of_day_counts[hours]
+
+
+# --- 4. Data Service (Lazy, Background Loading) ---
+class _RangeQueries:
+    """Date-range queries shared by DataService and HouseholdView.
+
+    Needs aggregate_cube plus either a partitioned `store` or a `prefix_index`, and an
+    `anomalies` EventIndex (or None).
+    """
+
+    @property
+    def range_index(self):
+        """What date-range queries read: the partitioned store, or the in-memory prefix sums."""
+        return self.store if self.store is not None else self.prefix_index
+
+    def range_metrics(self, start=None, end=None):
+        """Key metrics (all categories) over the whole days from start to end."""
+        return self.range_index.totals(start, end).key_metrics()
+
+    def range_view(self, category='ALL', start=None, end=None):
+        """(chart entry, key metrics) for a date range, from the cube and the prefix sums.
+
+        The entry has the same layout as aggregate_cube[category], restricted to the range;
+        the metrics match compute_key_metrics over the range's hours (all categories).
+        """
+        entry = slice_days(self.aggregate_cube[category], start, end)
+        entry['hours'], entry['hourly_mean'] = self.range_index.hour_of_day_means(start, end, category)
+        return entry, self.range_metrics(start, end)
+
+    def anomaly_positions(self, category='ALL', start=None, end=None):
+        """Positions in `anomalies` of the events to overlay for a chart view, or None without an index.
+
+        Those overlapping [start, end] that start in the category's hours, and of those only
+        the most severe OVERLAY_EVENTS_PER_KIND of each kind.
+        """
+        if self.anomalies is None:
+            return None
+        hours = None if category == 'ALL' else HOUR_TO_CATEGORY_CODE == TIME_CATEGORIES.index(category)
+        return self.anomalies.strongest(self.anomalies.window(start, end, hours))
+
+
+class HouseholdView(_RangeQueries):
+    """One household's hourly frame, chart aggregates and key metrics (see households.py)."""
+
+    def __init__(self, household, data_df, aggregate_cube, metrics, anomalies=None):
+        self.household = household
+        self.data_df = data_df
+        self.aggregate_cube = aggregate_cube
+        self.metrics = metrics
+        self.anomalies = anomalies
+        self.detail_index = None
+        self.store = None
+        self._prefix_index = None
+
+    @property
+    def prefix_index(self):
+        # Built on the first date-range query, so households nobody filters cost no index memory
+        if self._prefix_index is None:
+            self._prefix_index = PrefixSumIndex(self.data_df)
+        return self._prefix_index
+
+
+class DataService(_RangeQueries):
+    """Loads the data, trains the model and computes the metrics in a background thread.
+
+    Nothing is computed at import time: the web server can bind its port and answer health
+    checks immediately while start() does the work. Read the results (data_df,
+    prediction_model, model_r2, model_mae, forecaster, aggregate_cube, feature_means,
+    detail_index, prefix_index, store, anomalies, metrics) once `ready` is True, or call wait() to block until they are.
+    data_version is a short token that changes whenever the source data or the model does.
+
+    With snapshot_dir set, the results are first looked for in a shared snapshot published
+    by a loader process (read-only, memory-mapped); the service only loads by itself when
+    that snapshot is missing or was built from another version of the source file.
+    With storage='partitioned', key metrics, date ranges and zooms are answered from the
+    month-partitioned store instead of in-memory indexes (see partitioned_store.py).
+    With household_dir, every household file in it is loaded in a process pool; the
+    results above then cover the whole fleet and view(household) gives one household.
+    """
+
+    def __init__(self, file_path=None, compact=None, snapshot_dir=None, storage=None, household_dir=None):
+        self.file_path = file_path
+        self.compact = COMPACT_MEMORY if compact is None else compact
+        self.snapshot_dir = snapshot_dir
+        self.storage = storage or STORAGE_BACKEND
+        self.household_dir = household_dir
+        self.data_df = None
+        self.prediction_model = None
+        self.model_r2 = 0.0
+        self.model_mae = 0.0
+        self.aggregate_cube = None
+        self.feature_means = None
+        self.model_version = None
+        self.forecaster = None
+        self.data_version = None
+        self.detail_index = None
+        self.prefix_index = None
+        self.store = None
+        self.anomalies = None
+        self.households = {}
+        self.metrics = {}
+        self.error = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    @property
+    def status(self):
+        """One of 'idle', 'loading', 'ready' or 'failed'."""
+        if self._thread is None:
+            return 'idle'
+        if not self._done.is_set():
+            return 'loading'
+        return 'failed' if self.error is not None else 'ready'
+
+    def start(self):
+        """Starts loading in a daemon thread (only the first call does anything)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name='data-service-loader', daemon=True)
+                self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Starts loading if needed and blocks until done. Re-raises a loading failure."""
+        self.start()
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Data service still loading after {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def view(self, household=None):
+        """The HouseholdView for `household`, or the service itself (fleet-wide) for None/'FLEET'."""
+        return self.households.get(household, self)
+
+    def current_source(self):
+        """The version of the data this service loads: the source file's fingerprint, or every household file's."""
+        if self.household_dir:
+            from households import fleet_source
+            return fleet_source(self.household_dir)
+        return source_fingerprint(self.file_path or FILE_PATH)
+
+    def snapshot_state(self):
+        """The loaded results, as published to and attached from a shared snapshot."""
+        return {name: getattr(self.wait(), name) for name in SNAPSHOT_ATTRIBUTES}
+
+    def _attach_snapshot(self, source):
+        try:
+            state = attach_snapshot(self.snapshot_dir, source)
+        except Exception as e:
+            print(f"⚠️ WARNING: Could not attach to the shared snapshot in '{self.snapshot_dir}': {e}")
+            return False
+        if state is None:
+            print(f"⚠️ WARNING: No current shared snapshot in '{self.snapshot_dir}'; loading in this process.")
+            return False
+        for name, value in state.items():
+            setattr(self, name, value)
+        return True
+
+    def _build_detail_index(self):
+        # Minute-level Global_active_power (memory-mapped from the cache when available)
+        try:
+            minute = load_minute_data(self.file_path)['Global_active_power']
+        except Exception as e:
+            print(f"⚠️ WARNING: Minute-level detail disabled: {e}")
+            return None
+        category_codes = HOUR_TO_CATEGORY_CODE[minute.index.hour]
+        return build_detail_index(minute, category_codes, TIME_CATEGORIES)
+
+    def _load(self):
+        try:
+            if self.snapshot_dir:
+                source = self.current_source()
+                if self._attach_snapshot(source):
+                    self.data_version = _data_version(source, self.model_version)
+                    return
+
+            if self.household_dir:
+                # Imported here: households builds on this module (and runs in pool workers)
+                from households import ingest_households
+                self.households, data_df, source = ingest_households(self.household_dir, compact=self.compact)
+                if ANOMALY_DETECTION:
+                    self.anomalies = EventIndex.concat([view.anomalies for view in self.households.values()])
+            else:
+                # The partitioned store is built by its own streaming pass, without a detector
+                detector = AnomalyDetector() if ANOMALY_DETECTION and self.storage != 'partitioned' else None
+                data_df = load_and_process_data(self.file_path, compact=self.compact, storage=self.storage,
+                                                detector=detector)
+                if detector is not None:
+                    self.anomalies = detector.events()
+                # The Gruha Jyothi eligibility function is commented out based on past context
+                # data_df = calculate_gruha_jyothi_eligibility(data_df)
+                source = self.current_source()
+            if self.anomalies is not None:
+                counts = ', '.join(f'{n:,} {kind}s' for kind, n in self.anomalies.counts().items())
+                print(f"✅ Anomaly index: {counts} ({self.anomalies.nbytes / 1e3:.0f} kB).")
+            # Reuses the saved model artifact when the source file has not changed
+            self.prediction_model, self.model_r2, self.model_mae, self.model_version = load_or_train_model(data_df, source)
+
+            # IMPORTANT FIX: Ensure the DateTime column is the index for resample operations in the dashboard file.
+            data_df = data_df.set_index('DateTime')
+
+            # Next-24h/168h demand forecasts from lag and rolling-window features (see forecasting.py)
+            try:
+                self.forecaster = train_forecaster(data_df)
+            except Exception as e:
+                print(f"⚠️ WARNING: Load forecasting disabled: {e}")
+
+            # Per-category daily/hourly aggregates behind the charts (see aggregates.py)
+            with stage('aggregate_cube'):
+                self.aggregate_cube = build_aggregate_cube(data_df, TIME_CATEGORIES)
+            # Defaults for features a prediction request leaves out (float64 even in compact mode)
+            self.feature_means = data_df[MODEL_FEATURES].astype('float64').mean()
+            if self.storage == 'partitioned' and not self.household_dir:
+                # Metrics, date ranges and zooms read the month partitions they need, so no
+                # minute-level history and no per-hour index is held in memory
+                from partitioned_store import open_store
+                self.store = open_store(self.file_path)
+                with stage('key_metrics'):
+                    self.metrics = self.store.totals().key_metrics()
+                if MINUTE_DETAIL:
+                    self.detail_index = self.store.detail_views()
+            else:
+                with stage('key_metrics'):
+                    self.metrics = compute_key_metrics(data_df)
+                with stage('prefix_index'):
+                    self.prefix_index = PrefixSumIndex(data_df)
+                if MINUTE_DETAIL and not self.household_dir:
+                    with stage('detail_index'):
+                        self.detail_index = self._build_detail_index()
+            self.data_version = _data_version(source, self.model_version)
+            self.data_df = data_df
+        except Exception as e:
+            print(f"❌ ERROR: Loading the energy data failed: {e}")
+            self.error = e
+        finally:
+            self._done.set()
+
+
+def _data_version(source, model_version):
+    # Changes whenever the source data or the model does (keys the callback result cache)
+    token = json.dumps([source, model_version, MINUTE_DETAIL, ANOMALY_DETECTION and settings_key()],
+                       sort_keys=True, default=str)
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:16]
+
+
+# Everything a worker needs from a shared snapshot (see DataService.snapshot_state)
+SNAPSHOT_ATTRIBUTES = ('data_df', 'prediction_model', 'model_r2', 'model_mae', 'model_version', 'forecaster',
+                       'aggregate_cube', 'feature_means', 'detail_index', 'prefix_index', 'store', 'anomalies',
+                       'households', 'metrics')
+
+data_service = DataService(snapshot_dir=SHARED_SNAPSHOT_DIR, household_dir=HOUSEHOLD_DIR)
+
+
+def in_worker_process():
+    """True inside a multiprocessing worker, including while a spawned one re-imports the main module.
+
+    parent_process() is only set after that re-import, but the worker's name is set before it.
+    """
+    return (multiprocessing.parent_process() is not None
+            or multiprocessing.current_process().name != 'MainProcess')
+
+
+def get_data_service():
+    """Returns the shared DataService, starting its background load on first use.
+
+    Inside multiprocessing workers (e.g. the household ingest and model selection pools,
+    whose spawned processes re-import app.py) the service is returned without starting it.
+    """
+    if in_worker_process():
+        return data_service
+    return data_service.start()
+
+
+# The former module-level results (data_df, model_r2, peak_hour, ...) are still importable,
+# but only block on the background load when someone actually asks for them.
+_SERVICE_ATTRIBUTES = ('data_df', 'prediction_model', 'model_r2', 'model_mae', 'forecaster', 'aggregate_cube',
+                       'feature_means', 'detail_index', 'prefix_index', 'store', 'anomalies', 'households')
+_METRIC_ATTRIBUTES = ('total_sub1_kwh', 'total_sub2_kwh', 'total_sub3_kwh', 'total_all_subs',
+                      'total_global_active_kwh', 'total_residual_kwh', 'consumption_breakdown',
+                      'normalized_breakdown', 'avg_hourly_usage', 'peak_hour', 'avg_sub_metering_usage')
+
+def __getattr__(name):
+    if name in _SERVICE_ATTRIBUTES:
+        return getattr(data_service.wait(), name)
+    if name in _METRIC_ATTRIBUTES:
+        return data_service.wait().metrics[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional: without it every start parses the CSV
+    feather = None
+
+# --- Configuration ---
+# Cached frames live next to the code unless ENERGY_CACHE_DIR points elsewhere.
+CACHE_DIR = os.environ.get(
+    'ENERGY_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+)
+# Bump this whenever the cleaning/resampling steps change so old caches are ignored.
+CACHE_FORMAT_VERSION = 1
+# Bytes hashed from the head and the tail of the source file.
+HASH_BLOCK_SIZE = 1 << 20
+
+
+# --- 1. Source Fingerprint ---
+def source_fingerprint(file_path):
+    """Returns the size/mtime/content-hash key that identifies a source file version."""
+    stat = os.stat(file_path)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(HASH_BLOCK_SIZE))
+        if stat.st_size > 2 * HASH_BLOCK_SIZE:
+            f.seek(-HASH_BLOCK_SIZE, os.SEEK_END)
+            digest.update(f.read(HASH_BLOCK_SIZE))
+    return {
+        'version': CACHE_FORMAT_VERSION,
+        'source': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest.hexdigest(),
+    }
+
+
+def _cache_stem(file_path):
+    # One cache slot per source path, so pointing FILE_PATH elsewhere never reads a stale frame
+    path_key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, path_key)
+
+
+# --- 2. Read / Write Cached Frames ---
+def load_cached_frames(file_path, names):
+    """Returns {name: DataFrame} from the cache, or None if it is missing or stale."""
+    if feather is None:
+        return None
+    stem = _cache_stem(file_path)
+    try:
+        with open(stem + '.json') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('fingerprint') != source_fingerprint(file_path):
+        return None
+
+    frames = {}
+    for name in names:
+        if name not in meta.get('frames', []):
+            return None
+        # Uncompressed Feather files are memory mapped; numeric columns without nulls are
+        # handed to pandas without copying.
+        table = feather.read_table(f'{stem}.{name}.feather', memory_map=True)
+        frames[name] = table.to_pandas(split_blocks=True)
+        index_col = meta.get('index', {}).get(name)
+        if index_col:
+            frames[name] = frames[name].set_index(index_col)
+    return frames
+
+
+def store_cached_frames(file_path, frames):
+    """Writes {name: DataFrame} for file_path to the cache. Failures only print a warning."""
+    if feather is None:
+        return False
+    stem = _cache_stem(file_path)
+    fingerprint = source_fingerprint(file_path)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Frames already cached for this exact source version are kept alongside the new ones
+        meta = {'fingerprint': fingerprint, 'frames': [], 'index': {}}
+        if os.path.exists(stem + '.json'):
+            with open(stem + '.json') as f:
+                old_meta = json.load(f)
+            if old_meta.get('fingerprint') == fingerprint:
+                meta = old_meta
+            os.remove(stem + '.json')
+
+        index = meta['index']
+        for name, frame in frames.items():
+            if frame.index.name is not None:
+                index[name] = frame.index.name
+                frame = frame.reset_index()
+            tmp_path = f'{stem}.{name}.feather.tmp'
+            feather.write_feather(frame, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, f'{stem}.{name}.feather')
+
+        # The metadata file is written last, so a half-written cache is never considered valid
+        meta['frames'] = sorted(set(meta['frames']) | set(frames))
+        with open(stem + '.json.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(stem + '.json.tmp', stem + '.json')
+    except (OSError, ValueError) as e:
+        print(f"⚠️ WARNING: Could not write data cache to '{CACHE_DIR}': {e}")
+        return False
+    return True
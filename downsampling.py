@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+# Points sent back per zoomed time-series response (min and max of DETAIL_POINTS/2 buckets)
+DETAIL_POINTS = 2000
+# Smallest precomputed bucket is 2**PYRAMID_BASE_LEVEL rows; finer zooms bucket the raw slice
+PYRAMID_BASE_LEVEL = 3
+
+
+# --- 1. Min/Max Bucketing ---
+def minmax_indices(values, bucket_size):
+    """Indices of the minimum and the maximum of each `bucket_size` run of `values`, in order.
+
+    Unlike random sampling, every local peak and trough survives: a spike anywhere in a
+    bucket is always one of the two points kept for it.
+    """
+    n = len(values)
+    if n == 0:
+        return np.empty(0, dtype='int64')
+    n_buckets = -(-n // bucket_size)
+    padded = np.full(n_buckets * bucket_size, np.nan)
+    padded[:n] = values
+    buckets = padded.reshape(n_buckets, bucket_size)
+    offsets = np.arange(n_buckets) * bucket_size
+    lows = offsets + np.nanargmin(buckets, axis=1)
+    highs = offsets + np.nanargmax(buckets, axis=1)
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def peak_preserving_sample(values, max_points):
+    """Positions of at most ~max_points values chosen by min/max bucketing (sorted)."""
+    values = np.asarray(values, dtype='float64')
+    if len(values) <= max_points:
+        return np.arange(len(values))
+    return minmax_indices(values, -(-len(values) // (max_points // 2)))
+
+
+# --- 2. Multi-Resolution Min/Max Pyramid ---
+class MinMaxPyramid:
+    """Zoomable, peak-preserving view of one full-resolution time series.
+
+    Level L stores the positions of the min and max of every 2**L consecutive rows, so a
+    window query binary-searches the sorted time index (O(log n)) and then reads about
+    max_points/2 buckets from the level that fits. Its cost depends on the points returned,
+    not on how many rows the window or the whole series hold. Extra memory is about a
+    quarter of the series length in index pairs.
+    """
+
+    def __init__(self, times, values):
+        self.times = np.asarray(times, dtype='datetime64[ns]').view('int64')
+        self.values = np.asarray(values, dtype='float32')
+        self.levels = {}
+
+        size = 1 << PYRAMID_BASE_LEVEL
+        if len(self.values) <= size:
+            return
+        n_buckets = -(-len(self.values) // size)
+        padded = np.full(n_buckets * size, np.nan, dtype='float32')
+        padded[:len(self.values)] = self.values
+        buckets = padded.reshape(n_buckets, size)
+        offsets = np.arange(n_buckets, dtype='int64') * size
+        lows = offsets + np.nanargmin(buckets, axis=1)
+        highs = offsets + np.nanargmax(buckets, axis=1)
+
+        level = PYRAMID_BASE_LEVEL
+        self.levels[level] = (lows, highs)
+        while len(lows) > 1:
+            # Merge neighbouring buckets pairwise: keep the lower min and the higher max
+            if len(lows) % 2:
+                lows, highs = np.append(lows, lows[-1]), np.append(highs, highs[-1])
+            a, b = lows[0::2], lows[1::2]
+            lows = np.where(self.values[a] <= self.values[b], a, b)
+            a, b = highs[0::2], highs[1::2]
+            highs = np.where(self.values[a] >= self.values[b], a, b)
+            level += 1
+            self.levels[level] = (lows, highs)
+
+    def __len__(self):
+        return len(self.values)
+
+    def window_bounds(self, start=None, end=None):
+        """Row range [i0, i1) of the window, found by binary search on the time index."""
+        i0 = 0 if start is None else int(np.searchsorted(self.times, pd.Timestamp(start).value, side='left'))
+        i1 = len(self.times) if end is None else int(np.searchsorted(self.times, pd.Timestamp(end).value, side='right'))
+        return i0, max(i0, i1)
+
+    def window(self, start=None, end=None, max_points=DETAIL_POINTS):
+        """Returns (times, values, rows_in_window) with at most ~max_points points for [start, end]."""
+        i0, i1 = self.window_bounds(start, end)
+        width = i1 - i0
+        if width <= max_points:
+            positions = np.arange(i0, i1)
+        else:
+            bucket = -(-width // (max_points // 2))
+            if bucket < (1 << PYRAMID_BASE_LEVEL):
+                # Finer than the pyramid: bucket the raw slice (fewer than 2**base * max_points rows)
+                positions = i0 + minmax_indices(self.values[i0:i1], bucket)
+            else:
+                level = min(int(np.ceil(np.log2(bucket))), max(self.levels))
+                lows, highs = self.levels[level]
+                k0, k1 = i0 >> level, ((i1 - 1) >> level) + 1
+                positions = np.concatenate([lows[k0:k1], highs[k0:k1], [i0, i1 - 1]])
+                positions = np.unique(positions[(positions >= i0) & (positions < i1)])
+        return self.times[positions].view('datetime64[ns]'), self.values[positions], width
+
+
+def build_detail_index(minute_series, category_codes, categories):
+    """One MinMaxPyramid for 'ALL' and one per Time_Category over a minute-level Series.
+
+    category_codes gives each minute's position in `categories`.
+    """
+    times = minute_series.index.values
+    values = minute_series.to_numpy(dtype='float32')
+    index = {'ALL': MinMaxPyramid(times, values)}
+    for code, category in enumerate(categories):
+        mask = category_codes == code
+        index[category] = MinMaxPyramid(times[mask], values[mask])
+    return index
+
+
+def parse_relayout_range(relayout_data, axis='xaxis'):
+    """(start, end) of a zoomed axis from Dash relayoutData.
+
+    Returns 'autorange' when the axis was reset (double click / home button) and None when
+    the event did not touch this axis at all.
+    """
+    if not relayout_data:
+        return None
+    if relayout_data.get(f'{axis}.autorange'):
+        return 'autorange'
+    if f'{axis}.range[0]' in relayout_data and f'{axis}.range[1]' in relayout_data:
+        return relayout_data[f'{axis}.range[0]'], relayout_data[f'{axis}.range[1]']
+    if f'{axis}.range' in relayout_data:
+        start, end = relayout_data[f'{axis}.range']
+        return start, end
+    return None
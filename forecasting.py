@@ -0,0 +1,232 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from instrumentation import stage
+
+# --- Configuration ---
+# Hours ahead forecast by one call; the dashboard reports the first REPORT_HORIZONS of them
+FORECAST_HORIZON = 168
+REPORT_HORIZONS = (24, 168)
+# Lag features: every hour of the last week, so each horizon can use "same hour yesterday / last week"
+LAG_HOURS = 168
+# Trailing windows (hours) for the rolling mean features; the first also gets a rolling std
+ROLLING_WINDOWS = (24, 168)
+# Ridge penalty, relative to the mean diagonal of XᵀX (the lags and rolling means are collinear)
+RIDGE = 1e-4
+# The latest share of forecast origins is held out for the reported errors
+HOLDOUT_FRACTION = 0.2
+# Origins per block when accumulating XᵀX and XᵀY, which bounds memory on long histories
+BLOCK_ROWS = 8192
+
+
+# --- 1. Features (one vectorized pass over the hourly series) ---
+# A forecast "origin" t is the last observed hour; its features describe the history up to t
+# and the targets are y[t+1 .. t+FORECAST_HORIZON]. Row layout:
+#   intercept | y[t-167 .. t] | rolling means (24h, 168h) | rolling std (24h) | hour-of-day dummies (23) | weekday dummies (6)
+N_FEATURES = 1 + LAG_HOURS + len(ROLLING_WINDOWS) + 1 + 23 + 6
+
+
+def hourly_series(data_df):
+    """Energy_Consumption_kWh on a gap-free hourly index (duplicate hours, e.g. a fleet, are averaged)."""
+    series = data_df['Energy_Consumption_kWh'].astype('float64')
+    if not series.index.is_unique:
+        series = series.groupby(level=0).mean()
+    return series.asfreq('h')
+
+
+class _WindowStats:
+    # Trailing-window sums from cumulative sums: each window is two lookups, for every origin at once
+    def __init__(self, values):
+        filled = np.nan_to_num(values)
+        self.sums = np.concatenate([[0.0], np.cumsum(filled)])
+        self.squares = np.concatenate([[0.0], np.cumsum(filled ** 2)])
+
+    def mean_std(self, ends, window):
+        total = self.sums[ends + 1] - self.sums[ends + 1 - window]
+        mean = total / window
+        square_mean = (self.squares[ends + 1] - self.squares[ends + 1 - window]) / window
+        return mean, np.sqrt(np.maximum(square_mean - mean ** 2, 0.0))
+
+
+def _origin_features(values, lag_windows, stats, hours, weekdays, origins):
+    # The feature rows of the given origins; lag_windows is a zero-copy sliding view of values
+    X = np.zeros((len(origins), N_FEATURES))
+    X[:, 0] = 1.0
+    X[:, 1:1 + LAG_HOURS] = lag_windows[origins - (LAG_HOURS - 1)]
+    col = 1 + LAG_HOURS
+    for i, window in enumerate(ROLLING_WINDOWS):
+        mean, std = stats.mean_std(origins, window)
+        X[:, col + i] = mean
+        if i == 0:
+            X[:, col + len(ROLLING_WINDOWS)] = std
+    col += len(ROLLING_WINDOWS) + 1
+    hour, weekday = hours[origins], weekdays[origins]
+    rows = np.arange(len(origins))
+    X[rows[hour > 0], col + hour[hour > 0] - 1] = 1.0
+    X[rows[weekday > 0], col + 23 + weekday[weekday > 0] - 1] = 1.0
+    return X
+
+
+def _complete_origins(values, horizon):
+    # Origins whose whole lag window and (for horizon > 0) whole target window are observed
+    missing = np.concatenate([[0], np.cumsum(np.isnan(values))])
+    origins = np.arange(LAG_HOURS - 1, len(values) - horizon)
+    return origins[missing[origins + 1 + horizon] - missing[origins + 1 - LAG_HOURS] == 0]
+
+
+def _feature_blocks(series, horizon):
+    # (values, blocks): blocks(origins) yields (features, targets) BLOCK_ROWS origins at a time
+    values = series.to_numpy(dtype='float64')
+    lag_windows = sliding_window_view(values, LAG_HOURS)
+    target_windows = sliding_window_view(values[1:], horizon)
+    stats = _WindowStats(values)
+    hours, weekdays = series.index.hour.to_numpy(), series.index.dayofweek.to_numpy()
+
+    def blocks(selected):
+        for start in range(0, len(selected), BLOCK_ROWS):
+            block = selected[start:start + BLOCK_ROWS]
+            yield _origin_features(values, lag_windows, stats, hours, weekdays, block), target_windows[block]
+    return values, blocks
+
+
+def _score(blocks, origins, coef):
+    # (mae, r2, naive_mae) per horizon of coef's forecasts from `origins`
+    horizon = coef.shape[1]
+    abs_error, naive_error = np.zeros(horizon), np.zeros(horizon)
+    y_sum, y_squares, squared_error = np.zeros(horizon), np.zeros(horizon), np.zeros(horizon)
+    # Seasonal naive (the same hour one week before each target) lies in the lag window
+    has_naive = horizon <= LAG_HOURS
+    for X, Y in blocks(origins):
+        error = X @ coef - Y
+        abs_error += np.abs(error).sum(axis=0)
+        squared_error += (error ** 2).sum(axis=0)
+        y_sum += Y.sum(axis=0)
+        y_squares += (Y ** 2).sum(axis=0)
+        if has_naive:
+            naive = X[:, 1:1 + horizon]
+            naive_error += np.abs(naive - Y).sum(axis=0)
+    n = max(len(origins), 1)
+    mae = abs_error / n
+    variance = y_squares - y_sum ** 2 / n
+    r2 = np.where(variance > 0, 1 - squared_error / np.where(variance > 0, variance, 1), 0.0)
+    naive_mae = naive_error / n if has_naive else np.full(horizon, np.nan)
+    return mae, r2, naive_mae
+
+
+# --- 2. The Forecaster ---
+class LoadForecaster:
+    """Direct multi-horizon linear forecaster: one coefficient column per hour ahead.
+
+    forecast() scores every horizon with a single (features x horizons) matrix product.
+    mae/r2 hold the errors per horizon on the held-out latest origins, and naive_mae the
+    errors of the seasonal-naive forecast (same hour one week earlier) for comparison.
+    holdout_coef (fitted before holdout_start) lets evaluate() score another series, such
+    as one household of the fleet, on the same held-out period.
+    """
+
+    def __init__(self, coef, hour_profile, mae, r2, naive_mae, trained_through, holdout_coef=None,
+                 holdout_start=None):
+        self.coef = coef
+        self.hour_profile = hour_profile
+        self.mae = mae
+        self.r2 = r2
+        self.naive_mae = naive_mae
+        self.trained_through = trained_through
+        self.holdout_coef = holdout_coef
+        self.holdout_start = holdout_start
+
+    @property
+    def horizon(self):
+        return self.coef.shape[1]
+
+    def summary(self, horizon, errors=None):
+        """Mean held-out MAE over hours 1..horizon, and the seasonal-naive MAE for the same hours.
+
+        errors is a (mae, naive_mae) pair from evaluate(); by default the training series' own.
+        """
+        mae, naive_mae = (self.mae, self.naive_mae) if errors is None else errors
+        return float(np.nanmean(mae[:horizon])), float(np.nanmean(naive_mae[:horizon]))
+
+    def evaluate(self, series):
+        """(mae, naive_mae) per horizon on the held-out origins of another hourly series.
+
+        Only origins from holdout_start on are scored, with the coefficients fitted before it,
+        so the errors are out of sample for the series too. None when it has no such origin.
+        """
+        if self.holdout_coef is None:
+            return None
+        values, blocks = _feature_blocks(series, self.horizon)
+        origins = _complete_origins(values, self.horizon)
+        origins = origins[series.index[origins] >= self.holdout_start]
+        if not len(origins):
+            return None
+        mae, _, naive_mae = _score(blocks, origins, self.holdout_coef)
+        return mae, naive_mae
+
+    def predict_features(self, X):
+        """Forecasts for a batch of feature rows: (n_origins, horizon)."""
+        return X @ self.coef
+
+    def forecast(self, series):
+        """(times, forecasts) for the FORECAST_HORIZON hours after the last hour of `series`.
+
+        Missing hours in the last week are filled from the training hour-of-day profile.
+        """
+        series = series.iloc[-LAG_HOURS:]
+        if len(series) < LAG_HOURS:
+            raise ValueError(f"a forecast needs the last {LAG_HOURS} hours, got {len(series)}")
+        index = series.index
+        values = series.to_numpy(dtype='float64')
+        missing = np.isnan(values)
+        values[missing] = self.hour_profile[index.hour[missing]]
+        origin = np.array([LAG_HOURS - 1])
+        X = _origin_features(values, sliding_window_view(values, LAG_HOURS), _WindowStats(values),
+                             index.hour.to_numpy(), index.dayofweek.to_numpy(), origin)
+        times = index[-1] + pd.to_timedelta(np.arange(1, self.horizon + 1), unit='h')
+        return times, self.predict_features(X)[0]
+
+
+def _solve(xtx, xty):
+    ridge = RIDGE * np.trace(xtx) / len(xtx)
+    return np.linalg.solve(xtx + ridge * np.eye(len(xtx)), xty)
+
+
+def train_forecaster(data_df, horizon=FORECAST_HORIZON):
+    """Fits the direct multi-horizon model on the DateTime-indexed hourly frame.
+
+    The features of every origin come from sliding-window views and cumulative sums over the
+    whole series; XᵀX and XᵀY are accumulated block by block and all horizons are solved in
+    one ridge solve. The latest HOLDOUT_FRACTION of origins is scored first, then folded in,
+    so the returned model has seen all the data. Returns None when there is too little data.
+    """
+    with stage('forecast_features'):
+        series = hourly_series(data_df)
+        values, blocks = _feature_blocks(series, horizon)
+        origins = _complete_origins(values, horizon)
+        if len(origins) < 2 * N_FEATURES:
+            print(f"⚠️ WARNING: Only {len(origins)} complete forecast windows; load forecasting disabled.")
+            return None
+        split = origins[int(len(origins) * (1 - HOLDOUT_FRACTION))]
+        # Training origins stop one horizon before the held-out ones, so no target is shared
+        train, test = origins[origins < split - horizon], origins[origins >= split]
+
+    with stage('forecast_fit'):
+        xtx = {name: np.zeros((N_FEATURES, N_FEATURES)) for name in ('train', 'test')}
+        xty = {name: np.zeros((N_FEATURES, horizon)) for name in ('train', 'test')}
+        for name, selected in (('train', train), ('test', test)):
+            for X, Y in blocks(selected):
+                xtx[name] += X.T @ X
+                xty[name] += X.T @ Y
+        holdout_coef = _solve(xtx['train'], xty['train'])
+
+    with stage('forecast_evaluate'):
+        mae, r2, naive_mae = _score(blocks, test, holdout_coef)
+
+    coef = _solve(xtx['train'] + xtx['test'], xty['train'] + xty['test'])
+    hour_profile = series.groupby(series.index.hour).mean().reindex(range(24)).fillna(series.mean()).to_numpy()
+    forecaster = LoadForecaster(coef, hour_profile, mae, r2, naive_mae, series.index[-1],
+                                holdout_coef=holdout_coef, holdout_start=series.index[split])
+    print(f"✅ Forecaster trained on {len(train) + len(test):,} windows: held-out MAE "
+          + ", ".join(f"{h}h {forecaster.summary(h)[0]:.3f} kW" for h in REPORT_HORIZONS if h <= horizon))
+    return forecaster
@@ -0,0 +1,29 @@
+"""gunicorn settings for serving the dashboard from several workers on one shared dataset.
+
+    gunicorn -c gunicorn_conf.py wsgi:server
+
+Before any worker is forked, on_starting runs `python shared_snapshot.py` as a separate
+loader process. It loads the data, trains the model and publishes the results to
+ENERGY_SHARED_SNAPSHOT (or is a no-op if the snapshot there is already current). The
+master never holds the data itself, and each worker maps the snapshot read-only, so
+adding workers costs only their own interpreter and Dash objects.
+"""
+import os
+import subprocess
+import sys
+
+from shared_snapshot import DEFAULT_SNAPSHOT_DIR
+
+bind = os.environ.get('ENERGY_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('ENERGY_WORKERS', '4'))
+# Workers import the app after the fork; the loader process does the heavy lifting
+preload_app = False
+
+# Inherited by the workers, which attach to the snapshot instead of loading
+os.environ.setdefault('ENERGY_SHARED_SNAPSHOT', DEFAULT_SNAPSHOT_DIR)
+
+
+def on_starting(server):
+    here = os.path.dirname(os.path.abspath(__file__))
+    server.log.info("Publishing the shared data snapshot to %s", os.environ['ENERGY_SHARED_SNAPSHOT'])
+    subprocess.run([sys.executable, os.path.join(here, 'shared_snapshot.py')], cwd=here, check=True)
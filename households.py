@@ -0,0 +1,92 @@
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from aggregates import build_aggregate_cube
+from anomalies import AnomalyDetector
+from data_analysis import ANOMALY_DETECTION, TIME_CATEGORIES, HouseholdView, compute_key_metrics, load_and_process_data
+from data_cache import source_fingerprint
+from instrumentation import stage
+
+# --- Configuration ---
+# Every file matching these in the household directory is one household, named after the file
+HOUSEHOLD_PATTERNS = ('*.txt', '*.csv')
+# Ingest processes (None = one per core); ENERGY_INGEST_WORKERS overrides
+INGEST_WORKERS = int(os.environ['ENERGY_INGEST_WORKERS']) if os.environ.get('ENERGY_INGEST_WORKERS') else None
+# The label the dashboard uses for all households together
+FLEET = 'FLEET'
+
+
+# --- 1. Discovery ---
+def household_files(directory):
+    """{household: file path} for the household files in `directory`, sorted by name."""
+    paths = sorted({p for pattern in HOUSEHOLD_PATTERNS for p in glob.glob(os.path.join(directory, pattern))})
+    return {os.path.splitext(os.path.basename(p))[0]: p for p in paths}
+
+
+def fleet_source(directory):
+    """Identifies the version of every household file in `directory` (model artifact, snapshot)."""
+    return {
+        'source': os.path.abspath(directory),
+        'households': {h: source_fingerprint(path) for h, path in household_files(directory).items()},
+    }
+
+
+# --- 2. Per-Household Work (runs in the pool) ---
+def _ingest_household(household, file_path, compact):
+    # Parse, resample, scan for anomalies and aggregate one household; each file keeps its own columnar cache
+    detector = AnomalyDetector() if ANOMALY_DETECTION else None
+    hourly = load_and_process_data(file_path, compact=compact, storage='memory', detector=detector).set_index('DateTime')
+    return HouseholdView(household, hourly, build_aggregate_cube(hourly, TIME_CATEGORIES), compute_key_metrics(hourly),
+                         detector.events() if detector is not None else None)
+
+
+# --- 3. Fleet Ingestion ---
+def fleet_frame(views):
+    """All households' hourly rows in one time-sorted frame with a categorical Household column."""
+    fleet = pd.concat([view.data_df for view in views.values()], keys=list(views), names=['Household'])
+    fleet = fleet.reset_index('Household').sort_index(kind='stable')
+    fleet['Household'] = pd.Categorical(fleet['Household'], categories=list(views))
+    return fleet.reset_index()
+
+
+def ingest_households(directory, compact=False, max_workers=INGEST_WORKERS):
+    """Loads every household file in `directory` in a process pool.
+
+    Returns ({household: HouseholdView}, fleet hourly frame with a DateTime column, source).
+    Parsing and resampling, the costly part, run one file per process, so ingest time
+    drops with the number of cores. `source` is fleet_source(directory). A household that
+    fails to load is skipped with an error message.
+    """
+    files = household_files(directory)
+    if not files:
+        raise FileNotFoundError(f"No household files ({', '.join(HOUSEHOLD_PATTERNS)}) in '{directory}'")
+
+    start = time.perf_counter()
+    views = {}
+    with stage('ingest_households'):
+        if max_workers == 1 or len(files) == 1:
+            views = {h: _ingest_household(h, path, compact) for h, path in files.items()}
+        else:
+            # 'spawn' everywhere: this runs on the DataService thread, and forking a threaded
+            # web server is unsafe. Spawned workers re-import app.py, which is why
+            # get_data_service() does not start loading inside them.
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+                futures = {h: pool.submit(_ingest_household, h, path, compact) for h, path in files.items()}
+                for household, future in futures.items():
+                    try:
+                        views[household] = future.result()
+                    except Exception as e:
+                        print(f"❌ ERROR: Household '{household}' ({files[household]}) could not be loaded: {e}")
+    if not views:
+        raise RuntimeError(f"None of the {len(files)} household files in '{directory}' could be loaded")
+    print(f"✅ Loaded {len(views)} households from '{directory}' in {time.perf_counter() - start:.1f}s.")
+
+    with stage('fleet_frame'):
+        fleet = fleet_frame(views)
+    return views, fleet, fleet_source(directory)
@@ -0,0 +1,240 @@
+import cProfile
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import flask
+
+from result_cache import callback_cache
+
+# --- Configuration ---
+# Set ENERGY_PROFILING=1 to allow cProfile capture of single requests (see register_instrumentation)
+PROFILING_ENABLED = os.environ.get('ENERGY_PROFILING') == '1'
+PROFILE_DIR = os.environ.get(
+    'ENERGY_PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.profiles')
+)
+# Histogram upper bounds (seconds for latencies, bytes for payloads)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PAYLOAD_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7)
+
+
+# --- 1. Metric Types (Prometheus text exposition) ---
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label value."""
+
+    def __init__(self, name, help_text, label, buckets):
+        self.name, self.help_text, self.label, self.buckets = name, help_text, label, tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            counts, total = self._series.get(label_value, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1  # +Inf
+            self._series[label_value] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_value, (counts, total) in series:
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                labels = _format_labels({self.label: label_value, 'le': bound if bound == '+Inf' else f'{bound:g}'})
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels({self.label: label_value})
+            lines.append(f'{self.name}_sum{labels} {total:.6f}')
+            lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+STAGE_SECONDS = Histogram('energy_stage_seconds', 'Time spent in each data loading / model training stage.',
+                          'stage', STAGE_BUCKETS)
+CALLBACK_SECONDS = Histogram('energy_callback_seconds', 'Time spent inside each Dash callback function.',
+                             'callback', LATENCY_BUCKETS)
+CALLBACK_RESPONSE_SECONDS = Histogram(
+    'energy_callback_response_seconds',
+    'Wall time of each Dash callback request, including JSON serialisation of the figures.',
+    'callback', LATENCY_BUCKETS)
+CALLBACK_RESPONSE_BYTES = Histogram('energy_callback_response_bytes', 'Size of each Dash callback response body.',
+                                    'callback', PAYLOAD_BUCKETS)
+HISTOGRAMS = (STAGE_SECONDS, CALLBACK_SECONDS, CALLBACK_RESPONSE_SECONDS, CALLBACK_RESPONSE_BYTES)
+
+
+# --- 2. Timing Spans ---
+@contextmanager
+def stage(name):
+    """Times the enclosed block into energy_stage_seconds{stage=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(name, time.perf_counter() - start)
+
+
+def timed_callback(name):
+    """Decorator for Dash callbacks: records their own latency and names the request.
+
+    The request name lets the after-request hook attribute the response time (which adds
+    Dash's JSON serialisation) and the response size to this callback.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if flask.has_request_context():
+                flask.g.dash_callback = name
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                CALLBACK_SECONDS.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+# --- 3. Process and Data Gauges ---
+def process_rss_bytes():
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+_frame_size_cache = {}
+
+def frame_bytes(data_df):
+    # memory_usage(deep=True) walks object columns, so it is computed once per frame
+    key = id(data_df)
+    if key not in _frame_size_cache:
+        _frame_size_cache.clear()
+        _frame_size_cache[key] = int(data_df.memory_usage(deep=True).sum())
+    return _frame_size_cache[key]
+
+
+def render_metrics(data_service):
+    """All metrics in Prometheus text format (version 0.0.4)."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+
+    gauges = [('process_resident_memory_bytes', 'Resident memory size in bytes.', process_rss_bytes())]
+    data_df = data_service.data_df if data_service.ready else None
+    if data_df is not None:
+        gauges += [
+            ('energy_data_frame_bytes', 'Memory used by the hourly data frame (deep).', frame_bytes(data_df)),
+            ('energy_data_frame_rows', 'Rows in the hourly data frame.', len(data_df)),
+        ]
+    gauges.append(('energy_data_ready', '1 once the data and model have loaded.', int(data_service.ready)))
+    for name, help_text, value in gauges:
+        if value is not None:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+    return '\n'.join(lines + render_cache_metrics(callback_cache.stats())) + '\n'
+
+
+def render_cache_metrics(stats):
+    """Callback result cache counters and sizes (see result_cache.py), for sizing its budget."""
+    lines = ['# HELP energy_callback_cache_requests_total Callback cache lookups by outcome (hit, disk_hit, miss).',
+             '# TYPE energy_callback_cache_requests_total counter']
+    for name, counts in sorted(stats['callbacks'].items()):
+        for outcome, key in (('hit', 'hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses')):
+            labels = _format_labels({'callback': name, 'outcome': outcome})
+            lines.append(f'energy_callback_cache_requests_total{labels} {counts[key]}')
+    for name, kind, help_text, value in (
+        ('energy_callback_cache_evictions_total', 'counter', 'Entries evicted to stay within the byte budget.',
+         stats['evictions']),
+        ('energy_callback_cache_expirations_total', 'counter', 'Entries dropped after their TTL.', stats['expirations']),
+        ('energy_callback_cache_entries', 'gauge', 'Results held in memory.', stats['entries']),
+        ('energy_callback_cache_bytes', 'gauge', 'Pickled size of the results held in memory.', stats['bytes']),
+        ('energy_callback_cache_max_bytes', 'gauge', 'In-memory byte budget.', stats['max_bytes']),
+        ('energy_callback_cache_disk_bytes', 'gauge', 'Size of the disk tier when last measured.', stats['disk_bytes']),
+    ):
+        if value is not None:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+    return lines
+
+
+# --- 4. Flask Hooks: /metrics and Per-Request Profiling ---
+class _ProfileSwitch:
+    """Arms cProfile for the next matching request (POST /debug/profile-next)."""
+
+    def __init__(self):
+        self._armed = None
+        self._lock = threading.Lock()
+
+    def arm(self, path_prefix):
+        with self._lock:
+            self._armed = path_prefix
+
+    def take(self, path):
+        with self._lock:
+            if self._armed is not None and path.startswith(self._armed):
+                self._armed = None
+                return True
+            return False
+
+
+def register_instrumentation(server, data_service):
+    """Adds GET /metrics and the callback timing hooks to the Dash app's Flask server.
+
+    With ENERGY_PROFILING=1, a request sent with the header 'X-Profile: 1', or the next
+    request after POST /debug/profile-next?path=/_dash-update-component, is run under
+    cProfile. Its stats are written to PROFILE_DIR (view with python -m pstats <file>).
+    """
+    profile_switch = _ProfileSwitch()
+
+    @server.before_request
+    def _start_request_timer():
+        flask.g.request_start = time.perf_counter()
+        if PROFILING_ENABLED and (flask.request.headers.get('X-Profile') == '1'
+                                  or profile_switch.take(flask.request.path)):
+            flask.g.profiler = cProfile.Profile()
+            flask.g.profiler.enable()
+
+    @server.after_request
+    def _record_request(response):
+        profiler = flask.g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            response.headers['X-Profile-File'] = _dump_profile(profiler)
+        name = flask.g.get('dash_callback')
+        if name is not None and 'request_start' in flask.g:
+            CALLBACK_RESPONSE_SECONDS.observe(name, time.perf_counter() - flask.g.request_start)
+            if not response.direct_passthrough:
+                CALLBACK_RESPONSE_BYTES.observe(name, response.calculate_content_length() or 0)
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return flask.Response(render_metrics(data_service), mimetype='text/plain; version=0.0.4')
+
+    if PROFILING_ENABLED:
+        @server.route('/debug/profile-next', methods=['POST'])
+        def profile_next():
+            path = flask.request.args.get('path', '/')
+            profile_switch.arm(path)
+            return flask.jsonify(armed=path)
+
+    return metrics
+
+
+def _dump_profile(profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{flask.g.get('dash_callback') or 'request'}"
+                                     f"-{os.getpid()}-{threading.get_ident()}.pstats")
+    profiler.dump_stats(path)
+    print(f"✅ Profiled {flask.request.method} {flask.request.path} -> '{path}'")
+    return os.path.basename(path)
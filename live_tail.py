@@ -0,0 +1,168 @@
+import io
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from data_analysis import (FILE_PATH, RAW_COLUMNS, HourlyAccumulator, HourlyMetricTotals, clean_minute_chunk,
+                           engineer_features)
+
+# --- Configuration ---
+# Set LIVE_MODE = True to tail FILE_PATH and refresh the sidebar as the meters append rows.
+LIVE_MODE = False
+# How often the tail thread looks for new rows, and how often the browser asks for them
+LIVE_POLL_SECONDS = 15
+
+
+# --- 1. Locating the Resume Point ---
+def _line_timestamp(line):
+    try:
+        date, time_, _ = line.decode('utf-8').split(';', 2)
+        return datetime.strptime(f'{date} {time_}', '%d/%m/%Y %H:%M:%S')
+    except ValueError:  # header, blank or malformed line
+        return None
+
+
+def find_offset_of_hour(file_path, hour):
+    """Byte offset of the first line stamped at or after `hour`, by binary search.
+
+    The file is appended in time order, so this costs O(log size) seeks rather than a scan.
+    """
+    hour = pd.Timestamp(hour).to_pydatetime()
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+
+        def first_line_after(offset):
+            f.seek(offset)
+            if offset:
+                f.readline()  # skip the partial line we landed in
+            pos = f.tell()
+            return pos, _line_timestamp(f.readline())
+
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos, stamp = first_line_after(mid)
+            if pos >= size or (stamp is not None and stamp >= hour):
+                hi = mid
+            else:
+                lo = mid + 1
+        return first_line_after(lo)[0]
+
+
+# --- 2. Live Tail ---
+class LiveTail:
+    """Follows the source file and keeps hourly bins and sidebar metrics current.
+
+    Seeded from the DataService's hourly frame, then every poll parses only the bytes
+    appended since the last one. New rows go through the same cleaning as the full load
+    (clean_minute_chunk) into an HourlyAccumulator. Hours that complete are folded into
+    running HourlyMetricTotals, so a poll costs O(new rows), not O(history).
+    """
+
+    def __init__(self, data_service, file_path=None, poll_seconds=LIVE_POLL_SECONDS):
+        self.data_service = data_service
+        self.file_path = file_path or data_service.file_path or FILE_PATH
+        self.poll_seconds = poll_seconds
+        self.offset = None
+        self.rows_ingested = 0
+        self.error = None
+        self._accumulator = HourlyAccumulator()
+        self._totals = HourlyMetricTotals()
+        self._new_hours = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # Seeding
+    def _seed(self):
+        hourly = self.data_service.wait().data_df
+        if hourly.empty:
+            self.offset = 0
+            return
+        # The last loaded hour may have been partial: drop it from the totals and re-read its
+        # minutes from the file, together with anything appended after the initial load.
+        last_hour = hourly.index[-1]
+        self._totals.add(hourly.iloc[:-1])
+        self.offset = find_offset_of_hour(self.file_path, last_hour)
+
+    # Polling
+    def poll(self):
+        """Parses rows appended since the last poll. Returns the number of clean rows added."""
+        if self.offset is None:
+            self._seed()
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            raise RuntimeError(f"'{self.file_path}' shrank from {self.offset} to {size} bytes; restart to reload it")
+        if size == self.offset:
+            return 0
+
+        with open(self.file_path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b'\n') + 1  # only whole lines; a half-written one is read next time
+        if end == 0:
+            return 0
+
+        raw = pd.read_csv(io.BytesIO(data[:end]), sep=';', header=None, names=RAW_COLUMNS,
+                          na_values=['?'], dtype={'Date': str, 'Time': str})
+        # A seek landing on the header (empty file at seed time) yields a non-date row
+        raw = raw[raw['Date'] != 'Date']
+        rows = clean_minute_chunk(raw)
+
+        with self._lock:
+            self._accumulator.add(rows)
+            sums, counts = self._accumulator.drain_completed()
+            if len(counts):
+                completed = self._hourly_features(sums, counts)
+                self._totals.add(completed)
+                self._new_hours.append(completed)
+            self.offset += end
+            self.rows_ingested += len(rows)
+        return len(rows)
+
+    @staticmethod
+    def _hourly_features(sums, counts):
+        means = sums.div(counts, axis=0)
+        means.index.name = 'DateTime'
+        return engineer_features(means.reset_index()).set_index('DateTime')
+
+    # Results
+    def key_metrics(self):
+        """The sidebar metrics over the loaded history plus everything tailed so far."""
+        with self._lock:
+            sums, counts = self._accumulator.totals()
+            open_hour = self._hourly_features(sums, counts) if len(counts) else None
+            return self._totals.key_metrics(open_hours=open_hour)
+
+    def new_hours(self):
+        """Hourly bins completed since the tail started (DateTime-indexed)."""
+        with self._lock:
+            if len(self._new_hours) > 1:
+                self._new_hours = [pd.concat(self._new_hours)]
+            return self._new_hours[0] if self._new_hours else pd.DataFrame()
+
+    # Background thread
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='live-tail', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def active(self):
+        return self.offset is not None and self.error is None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"❌ ERROR: Live tail of '{self.file_path}' stopped: {e}")
+                self.error = e
+                return
+            self._stop.wait(self.poll_seconds)
@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+from threadpoolctl import threadpool_limits
+
+from instrumentation import STAGE_SECONDS, stage
+
+# --- Configuration ---
+# Candidate regressors (name -> constructor); every one is tried on every feature set
+CANDIDATE_MODELS = {
+    'linear': LinearRegression,
+    'ridge': partial(Ridge, alpha=1.0),
+    'hist_gbm': partial(HistGradientBoostingRegressor, max_iter=200, random_state=0),
+}
+# Candidate feature sets (name -> columns, all from data_analysis.MODEL_FEATURES)
+FEATURE_SETS = {
+    'all': ['Global_reactive_power', 'Voltage', 'Global_intensity', 'Sub_metering_3', 'Time_of_Day', 'Month'],
+    'no_calendar': ['Global_reactive_power', 'Voltage', 'Global_intensity', 'Sub_metering_3'],
+    'no_intensity': ['Global_reactive_power', 'Voltage', 'Sub_metering_3', 'Time_of_Day', 'Month'],
+}
+# Expanding-window folds; ENERGY_CV_FOLDS overrides
+CV_FOLDS = int(os.environ.get('ENERGY_CV_FOLDS', '5'))
+# Rows (hours) left out between each fold's training and test rows, so a test hour's
+# neighbours are never trained on
+CV_GAP_ROWS = 24
+# Worker processes (None = one per core; 1, e.g. on a single core, runs the folds in this
+# process without a pool); ENERGY_SELECTION_WORKERS overrides
+SELECTION_WORKERS = (int(os.environ['ENERGY_SELECTION_WORKERS'])
+                     if os.environ.get('ENERGY_SELECTION_WORKERS') else None)
+
+
+# --- 1. Folds ---
+def time_series_folds(n_rows, n_folds=CV_FOLDS, gap=CV_GAP_ROWS):
+    """(train_end, test_start, test_end) row bounds of the expanding-window folds over time-sorted rows.
+
+    Fold k trains on rows [0, train_end) and is scored on the later rows [test_start, test_end).
+    """
+    splitter = TimeSeriesSplit(n_splits=n_folds, gap=gap)
+    return [(int(train[-1]) + 1, int(test[0]), int(test[-1]) + 1) for train, test in splitter.split(np.empty(n_rows))]
+
+
+# --- 2. One Fold (runs in the pool) ---
+# Each worker maps the shared matrix once; tasks only carry names and row bounds
+_MATRIX = None
+
+
+def _attach(path):
+    global _MATRIX
+    _MATRIX = np.load(path, mmap_mode='r')
+    # One BLAS/OpenMP thread per worker: the pool already runs one task per core
+    threadpool_limits(limits=1)
+
+
+def _evaluate(task, matrix=None):
+    # Fits one candidate on one fold's training rows and scores it on the fold's test rows
+    matrix = _MATRIX if matrix is None else matrix
+    candidate, feature_set, columns, fold, (train_end, test_start, test_end) = task
+    y = matrix[:, -1]
+    start = time.perf_counter()
+    model = CANDIDATE_MODELS[candidate]().fit(matrix[:train_end, columns], y[:train_end])
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    predicted = model.predict(matrix[test_start:test_end, columns])
+    predict_seconds = time.perf_counter() - start
+    actual = y[test_start:test_end]
+    return {
+        'candidate': candidate, 'feature_set': feature_set, 'fold': fold,
+        'train_rows': train_end, 'test_rows': test_end - test_start,
+        'r2': float(r2_score(actual, predicted)), 'mae': float(mean_absolute_error(actual, predicted)),
+        'fit_seconds': fit_seconds, 'predict_seconds': predict_seconds,
+    }
+
+
+# --- 3. Final Model ---
+def _final_model(candidate, columns, feature_names, X, y):
+    # The winner refit on every row. It always takes the full feature matrix, so
+    # prediction_api and the voltage sweep score it like the plain LinearRegression.
+    estimator = CANDIDATE_MODELS[candidate]().fit(X[:, columns], y)
+    if hasattr(estimator, 'coef_'):
+        # Linear winners become one LinearRegression over all features (unused ones weigh 0),
+        # which keeps predict_matrix's single matrix-vector product
+        model = LinearRegression()
+        model.coef_ = np.zeros(len(feature_names))
+        model.coef_[columns] = estimator.coef_
+        model.intercept_ = float(estimator.intercept_)
+        model.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        model.n_features_in_ = len(feature_names)
+        return model
+    select = ColumnTransformer([('features', 'passthrough', columns)])
+    return Pipeline([('select', select), ('model', estimator)]).fit(X, y)
+
+
+# --- 4. Model Selection ---
+def select_model(X, y, feature_names, max_workers=None, n_folds=CV_FOLDS):
+    """Cross-validates every CANDIDATE_MODELS x FEATURE_SETS pair and refits the best one.
+
+    X (time-sorted rows, feature_names columns) and y are written once to a memory-mapped
+    .npy file; every pool worker maps those pages read-only instead of receiving a copy,
+    and each task (one candidate, feature set and fold) carries only names and row bounds.
+    The winner has the highest mean R² over the folds. Returns (model, mean R², mean MAE,
+    report); report holds every fold's scores and timings and the per-pair means, and is
+    also kept on the model as cv_results_. max_workers defaults to SELECTION_WORKERS.
+    """
+    max_workers = max_workers or SELECTION_WORKERS or os.cpu_count() or 1
+    # Raises ValueError when there are too few rows for the folds
+    folds = time_series_folds(len(y), n_folds)
+    tasks = [(candidate, name, [feature_names.index(f) for f in features], k, bounds)
+             for candidate in CANDIDATE_MODELS for name, features in FEATURE_SETS.items()
+             for k, bounds in enumerate(folds)]
+
+    start = time.perf_counter()
+    with stage('model_select'), tempfile.TemporaryDirectory(prefix='energy-cv-') as tmp:
+        if max_workers == 1:
+            matrix = np.column_stack([X, y]).astype('float64')
+            results = [_evaluate(task, matrix) for task in tasks]
+        else:
+            path = os.path.join(tmp, 'features.npy')
+            matrix = np.lib.format.open_memmap(path, mode='w+', dtype='float64', shape=(len(y), X.shape[1] + 1))
+            matrix[:, :-1], matrix[:, -1] = X, y
+            matrix.flush()
+            del matrix
+            # 'spawn' for the same reason as households.ingest_households (this runs on the loader thread)
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                     initializer=_attach, initargs=(path,)) as pool:
+                results = list(pool.map(_evaluate, tasks))
+    for result in results:
+        STAGE_SECONDS.observe('model_cv_fold', result['fit_seconds'] + result['predict_seconds'])
+
+    leaderboard = []
+    for candidate in CANDIDATE_MODELS:
+        for name in FEATURE_SETS:
+            scores = [r for r in results if r['candidate'] == candidate and r['feature_set'] == name]
+            leaderboard.append({
+                'candidate': candidate, 'feature_set': name,
+                'r2': float(np.mean([r['r2'] for r in scores])), 'r2_std': float(np.std([r['r2'] for r in scores])),
+                'mae': float(np.mean([r['mae'] for r in scores])),
+                'fit_seconds': float(sum(r['fit_seconds'] for r in scores)),
+            })
+    leaderboard.sort(key=lambda row: -row['r2'])
+    best = leaderboard[0]
+    print(f"✅ Model selection: {len(tasks)} fits ({len(leaderboard)} candidates x {len(folds)} folds) in "
+          f"{time.perf_counter() - start:.1f}s; best {best['candidate']}/{best['feature_set']} "
+          f"R² {best['r2']:.3f} ± {best['r2_std']:.3f}, MAE {best['mae']:.3f} kW.")
+
+    with stage('model_fit'):
+        columns = [feature_names.index(f) for f in FEATURE_SETS[best['feature_set']]]
+        model = _final_model(best['candidate'], columns, list(feature_names), X, y)
+    report = {'winner': dict(best), 'leaderboard': leaderboard, 'folds': results}
+    model.cv_results_ = report
+    return model, best['r2'], best['mae'], report
@@ -0,0 +1,122 @@
+import glob
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+# --- Configuration ---
+# Versioned model artifacts live next to the code unless ENERGY_MODEL_DIR points elsewhere.
+MODEL_DIR = os.environ.get(
+    'ENERGY_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.models')
+)
+# Bump this when the artifact layout changes so older files are ignored.
+ARTIFACT_FORMAT_VERSION = 2
+# Older versions beyond this many are deleted when a new one is saved.
+KEEP_VERSIONS = 5
+
+
+# --- 1. Sufficient Statistics for Least Squares ---
+class LinearSufficientStats:
+    """Running XᵀX / Xᵀy / yᵀy accumulators for ordinary least squares with an intercept.
+
+    update() costs O(new rows); solve() and r2() cost O(features²) no matter how many rows
+    have been seen, so a model can be refreshed with each new day of data instead of refit.
+    """
+
+    def __init__(self, n_features):
+        k = n_features + 1  # column 0 is the intercept
+        self.xtx = np.zeros((k, k))
+        self.xty = np.zeros(k)
+        self.yty = 0.0
+        self.y_sum = 0.0
+        self.n = 0
+
+    def update(self, X, y):
+        X = np.asarray(X, dtype='float64')
+        y = np.asarray(y, dtype='float64')
+        Xa = np.column_stack([np.ones(len(X)), X])
+        self.xtx += Xa.T @ Xa
+        self.xty += Xa.T @ y
+        self.yty += float(y @ y)
+        self.y_sum += float(y.sum())
+        self.n += len(y)
+
+    def solve(self):
+        """Returns (intercept, coef) minimising the squared error over every row seen."""
+        beta = np.linalg.lstsq(self.xtx, self.xty, rcond=None)[0]
+        return beta[0], beta[1:]
+
+    def r2(self, intercept, coef):
+        """R² of the given linear model over the accumulated rows."""
+        if self.n < 2:
+            return 0.0
+        beta = np.concatenate([[intercept], coef])
+        sse = self.yty - 2 * beta @ self.xty + beta @ self.xtx @ beta
+        sst = self.yty - self.y_sum ** 2 / self.n
+        return float(1 - sse / sst) if sst > 0 else 0.0
+
+
+# --- 2. Versioned Artifacts ---
+def _artifact_path(version):
+    return os.path.join(MODEL_DIR, f'model_v{version:04d}.pkl')
+
+
+def _saved_versions():
+    paths = glob.glob(os.path.join(MODEL_DIR, 'model_v*.pkl'))
+    return sorted(int(os.path.basename(p)[len('model_v'):-len('.pkl')]) for p in paths)
+
+
+def save_model_artifact(model, r2, mae, feature_means, features, source, training_state=None, settings=None):
+    """Saves the model and its metrics as the next version and points latest.json at it.
+
+    `settings` records the training configuration (see data_analysis.training_settings).
+    Returns the new version number, or None if the artifact could not be written.
+    """
+    try:
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        versions = _saved_versions()
+        version = versions[-1] + 1 if versions else 1
+        meta = {
+            'format': ARTIFACT_FORMAT_VERSION,
+            'version': version,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'features': list(features),
+            'r2': float(r2),
+            'mae': float(mae),
+            'source': source,
+            'incremental': training_state is not None,
+            'settings': settings,
+        }
+        artifact = dict(meta, model=model, feature_means=feature_means, training_state=training_state)
+
+        tmp_path = _artifact_path(version) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _artifact_path(version))
+        with open(os.path.join(MODEL_DIR, 'latest.json.tmp'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(os.path.join(MODEL_DIR, 'latest.json.tmp'), os.path.join(MODEL_DIR, 'latest.json'))
+
+        for old in versions[:max(0, len(versions) - (KEEP_VERSIONS - 1))]:
+            os.remove(_artifact_path(old))
+    except OSError as e:
+        print(f"⚠️ WARNING: Could not save model artifact to '{MODEL_DIR}': {e}")
+        return None
+    return version
+
+
+def load_latest_model_artifact(features):
+    """Returns the newest artifact dict trained on `features`, or None."""
+    try:
+        with open(os.path.join(MODEL_DIR, 'latest.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != ARTIFACT_FORMAT_VERSION or meta.get('features') != list(features):
+            return None
+        with open(_artifact_path(meta['version']), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, ValueError, KeyError, pickle.UnpicklingError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"⚠️ WARNING: Ignoring unreadable model artifact in '{MODEL_DIR}': {e}")
+        return None
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional: without it only the in-memory backend is available
+    pa = ds = pq = None
+
+from data_analysis import (FILE_PATH, HOUR_TO_CATEGORY_CODE, NUMERIC_COLUMNS, STREAM_CHUNKSIZE, TIME_CATEGORIES,
+                           HourlyMetricTotals, engineer_features, iter_minute_chunks)
+from data_cache import source_fingerprint
+from downsampling import DETAIL_POINTS, peak_preserving_sample
+from instrumentation import stage
+from live_tail import find_offset_of_hour
+
+# --- Configuration ---
+# The store lives next to the code unless ENERGY_STORE_DIR points elsewhere (one sub-folder per source file).
+STORE_DIR = os.environ.get(
+    'ENERGY_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.store')
+)
+# Bump this when the partition layout changes so older stores are rebuilt.
+STORE_FORMAT_VERSION = 1
+# Columns key_metrics() reads from each hourly partition
+METRIC_COLUMNS = ['Energy_Consumption_kWh', 'Sub_metering_1', 'Sub_metering_2', 'Sub_metering_3']
+# Zoom windows longer than this are drawn from hourly means instead of minute readings
+MAX_MINUTE_WINDOW_DAYS = 92
+
+
+# --- 1. Layout ---
+# <root>/minute/year=YYYY/month=MM/part-0.parquet   cleaned minute readings (DateTime + NUMERIC_COLUMNS)
+# <root>/hourly/year=YYYY/month=MM/part-0.parquet   that month's hourly resample, features engineered
+# <root>/manifest.json                              source fingerprint and the list of months
+# Hive-style folders, so pyarrow/duckdb/spark can also read the store directly.
+def _month_key(year, month):
+    return f'{year:04d}-{month:02d}'
+
+
+def _partition_path(root, level, key):
+    year, month = key.split('-')
+    return os.path.join(root, level, f'year={year}', f'month={month}', 'part-0.parquet')
+
+
+def _write_parquet(frame, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def _day_bounds(start, end):
+    # Whole days, both ends inclusive, like PrefixSumIndex.bounds
+    lo = None if start is None else pd.Timestamp(start).normalize()
+    hi = None if end is None else pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+    return lo, hi
+
+
+# --- 2. The Store ---
+class PartitionedStore:
+    """Month-partitioned Parquet copy of the cleaned data, queried with partition and column pushdown.
+
+    Only the partitions overlapping a query's time range are opened, only the requested
+    columns are decoded, and the DateTime predicate is applied inside the scan. Memory
+    therefore follows the size of the query, not the length of the history.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+
+    @property
+    def months(self):
+        return self.manifest['months']
+
+    def months_between(self, start=None, end=None):
+        """Partition keys ('YYYY-MM') that overlap [start, end)."""
+        lo = None if start is None else _month_key(start.year, start.month)
+        hi = None if end is None else _month_key((end - pd.Timedelta(1)).year, (end - pd.Timedelta(1)).month)
+        return [m for m in self.months if (lo is None or m >= lo) and (hi is None or m <= hi)]
+
+    def _scan(self, level, columns, start, end, months):
+        paths = [_partition_path(self.root, level, key) for key in months]
+        if not paths:
+            return None
+        names = None if columns is None else ['DateTime'] + [c for c in columns if c != 'DateTime']
+        predicate = None
+        if start is not None:
+            predicate = ds.field('DateTime') >= pa.scalar(start.value, pa.timestamp('ns'))
+        if end is not None:
+            upper = ds.field('DateTime') < pa.scalar(end.value, pa.timestamp('ns'))
+            predicate = upper if predicate is None else predicate & upper
+        return ds.dataset(paths, format='parquet').to_table(columns=names, filter=predicate)
+
+    def read_between(self, level, columns=None, start=None, end=None):
+        """DateTime-indexed rows of `level` ('minute' or 'hourly') with start <= DateTime < end."""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        with stage('store_read'):
+            table = self._scan(level, columns, start, end, self.months_between(start, end))
+            if table is None:
+                empty = pd.DataFrame({c: pd.Series(dtype='float64') for c in (columns or NUMERIC_COLUMNS)})
+                return empty.set_index(pd.DatetimeIndex([], name='DateTime'))
+            frame = table.sort_by('DateTime').to_pandas(split_blocks=True)
+        return frame.set_index('DateTime')
+
+    def read(self, level, columns=None, start=None, end=None):
+        """Like read_between, for whole days: `end` is the last day included."""
+        return self.read_between(level, columns, *_day_bounds(start, end))
+
+    def iter_months(self, level, columns=None, start=None, end=None):
+        """Yields read() results one partition at a time, so memory stays at one month."""
+        lo, hi = _day_bounds(start, end)
+        for key in self.months_between(lo, hi):
+            month_start = pd.Timestamp(key + '-01')
+            yield self.read_between(level, columns, max(lo, month_start) if lo is not None else month_start,
+                                    min(hi, month_start + pd.offsets.MonthBegin(1)) if hi is not None
+                                    else month_start + pd.offsets.MonthBegin(1))
+
+    # Same interface as data_analysis.PrefixSumIndex, computed by streaming the partitions
+    def totals(self, start=None, end=None, category='ALL'):
+        """HourlyMetricTotals for the date range (and category), reading four columns per month."""
+        totals = HourlyMetricTotals()
+        for hourly in self.iter_months('hourly', METRIC_COLUMNS, start, end):
+            if category != 'ALL':
+                codes = HOUR_TO_CATEGORY_CODE[hourly.index.hour]
+                hourly = hourly[codes == TIME_CATEGORIES.index(category)]
+            totals.add(hourly)
+        return totals
+
+    def hour_of_day_means(self, start=None, end=None, category='ALL'):
+        """(hours, mean energy) for the hours of day that have data in the range."""
+        totals = self.totals(start, end, category)
+        hours = np.flatnonzero(totals.hour_of_day_counts)
+        return hours, totals.hour_of_day_sums[hours] / totals.hour_of_day_counts[hours]
+
+    def detail_views(self):
+        """Zoom views for 'ALL' and each Time_Category (the DataService.detail_index interface)."""
+        return {category: StoreDetailView(self, category) for category in ['ALL'] + TIME_CATEGORIES}
+
+
+class StoreDetailView:
+    """Peak-preserving Global_active_power for a zoom window, read from the store on demand.
+
+    Drop-in for downsampling.MinMaxPyramid.window, without holding the minute history in
+    memory: each zoom reads the months it overlaps and a single column.
+    """
+
+    def __init__(self, store, category='ALL'):
+        self.store = store
+        self.category = category
+
+    def window(self, start=None, end=None, max_points=DETAIL_POINTS):
+        """Returns (times, values, rows_in_window) with at most ~max_points points for [start, end]."""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        wide = start is None or end is None or end - start > pd.Timedelta(days=MAX_MINUTE_WINDOW_DAYS)
+        level = 'hourly' if wide else 'minute'
+        frame = self.store.read_between(level, ['Global_active_power'], start,
+                                        None if end is None else end + pd.Timedelta(1))
+        if self.category != 'ALL':
+            frame = frame[HOUR_TO_CATEGORY_CODE[frame.index.hour] == TIME_CATEGORIES.index(self.category)]
+        values = frame['Global_active_power'].to_numpy(dtype='float32')
+        positions = peak_preserving_sample(values, max_points)
+        return frame.index.values[positions], values[positions], len(values)
+
+
+# --- 3. Building and Updating ---
+def _store_root(file_path):
+    path_key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(STORE_DIR, path_key)
+
+
+def _write_month(root, key, minutes, existing):
+    # A month seen before (out-of-order rows, or the month a resumed update starts in) is merged
+    if key in existing:
+        previous = pd.read_parquet(_partition_path(root, 'minute', key)).set_index('DateTime')
+        minutes = pd.concat([previous, minutes]).sort_index(kind='stable')
+    with stage('store_write'):
+        _write_parquet(minutes.reset_index(), _partition_path(root, 'minute', key))
+        hourly = minutes.resample('h').mean(numeric_only=True).reset_index()
+        _write_parquet(engineer_features(hourly), _partition_path(root, 'hourly', key))
+    existing.add(key)
+
+
+def update_store(file_path=None, chunksize=STREAM_CHUNKSIZE):
+    """Brings the store for file_path up to date and returns its root folder.
+
+    A current store is left alone. When the same file has only grown, the update resumes at
+    the start of its last stored month (found by binary search in the file), so appending a
+    day costs O(one month). Anything else rebuilds the store in one streaming pass. Either
+    way at most one read chunk plus one month of readings is held in memory.
+    """
+    file_path = file_path or FILE_PATH
+    root = _store_root(file_path)
+    fingerprint = source_fingerprint(file_path)
+    try:
+        with open(os.path.join(root, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if manifest is not None and manifest.get('format') == STORE_FORMAT_VERSION and manifest['source'] == fingerprint:
+        return root
+
+    resume = (manifest is not None and manifest.get('format') == STORE_FORMAT_VERSION and manifest['months']
+              and manifest['source']['source'] == fingerprint['source']
+              and fingerprint['size'] >= manifest['source']['size'])
+    if resume:
+        months = set(manifest['months'])
+        last = manifest['months'][-1]
+        offset = find_offset_of_hour(file_path, pd.Timestamp(last + '-01'))
+        # The last month is re-read in full, so drop what was stored of it
+        months.discard(last)
+        for level in ('minute', 'hourly'):
+            os.remove(_partition_path(root, level, last))
+    else:
+        shutil.rmtree(root, ignore_errors=True)
+        months, offset = set(), 0
+    if os.path.exists(os.path.join(root, 'manifest.json')):
+        os.remove(os.path.join(root, 'manifest.json'))
+
+    current, pending = None, []
+    for chunk in iter_minute_chunks(file_path, chunksize, offset):
+        keys = chunk.index.year * 100 + chunk.index.month
+        for key_value, part in chunk.groupby(keys, sort=True):
+            key = _month_key(key_value // 100, key_value % 100)
+            if key != current and pending:
+                _write_month(root, current, pd.concat(pending), months)
+                pending = []
+            current = key
+            pending.append(part)
+    if pending:
+        _write_month(root, current, pd.concat(pending), months)
+
+    # The manifest is written last, so a half-built store is never opened
+    os.makedirs(root, exist_ok=True)
+    manifest = {'format': STORE_FORMAT_VERSION, 'source': fingerprint, 'months': sorted(months)}
+    with open(os.path.join(root, 'manifest.json.tmp'), 'w') as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(root, 'manifest.json.tmp'), os.path.join(root, 'manifest.json'))
+    return root
+
+
+def open_store(file_path=None, chunksize=STREAM_CHUNKSIZE):
+    """Updates (if needed) and opens the partitioned store for file_path."""
+    if pa is None:
+        raise RuntimeError("the partitioned storage backend needs pyarrow (pip install pyarrow)")
+    with stage('store_update'):
+        return PartitionedStore(update_store(file_path, chunksize))
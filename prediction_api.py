@@ -0,0 +1,175 @@
+import io
+
+import flask
+import numpy as np
+import pandas as pd
+
+from data_analysis import MODEL_FEATURES
+
+# --- Configuration ---
+# Upper bound on rows scored by one /api/predict request
+MAX_BATCH_ROWS = 2_000_000
+VOLTAGE_INDEX = MODEL_FEATURES.index('Voltage')
+
+
+# --- 1. Vectorized Scoring ---
+def predict_matrix(model, X):
+    """Scores an (n, len(MODEL_FEATURES)) float matrix with one matrix-vector product.
+
+    Equivalent to model.predict(X) for the LinearRegression in data_analysis, without
+    building a DataFrame or running sklearn's per-call input validation. Other models
+    picked by model selection (which also take the full matrix) use their own predict().
+    """
+    if not hasattr(model, 'coef_'):
+        return model.predict(X)
+    return X @ np.asarray(model.coef_, dtype='float64') + float(model.intercept_)
+
+
+def voltage_sweep(model, feature_means, voltages):
+    """Predicts for each voltage with every other feature held at its mean."""
+    voltages = np.asarray(voltages, dtype='float64').ravel()
+    X = np.broadcast_to(feature_means.to_numpy(dtype='float64'), (len(voltages), len(MODEL_FEATURES))).copy()
+    X[:, VOLTAGE_INDEX] = voltages
+    return predict_matrix(model, X)
+
+
+def feature_matrix(columns, n_rows, feature_means):
+    """Stacks {feature: values} into the model's column order; absent features use the mean."""
+    X = np.empty((n_rows, len(MODEL_FEATURES)), dtype='float64')
+    for i, feature in enumerate(MODEL_FEATURES):
+        if feature in columns:
+            X[:, i] = columns[feature]
+        else:
+            X[:, i] = feature_means[feature]
+    return X
+
+
+# --- 2. Request Parsing ---
+class BadRequest(ValueError):
+    pass
+
+
+def _vector(values, name):
+    # A 1-D float array, or BadRequest (nested lists and scalars are not vectors)
+    if not isinstance(values, list):
+        raise BadRequest(f"'{name}' must be a list of numbers")
+    vector = np.asarray(values, dtype='float64')
+    if vector.ndim != 1:
+        raise BadRequest(f"'{name}' must be a flat list of numbers")
+    return vector
+
+
+def _check_feature_names(names, where):
+    # Every name must be a model feature (case-sensitive), and at least one must be given
+    unknown = [str(name) for name in names if name not in MODEL_FEATURES]
+    if unknown:
+        raise BadRequest(f"unknown feature(s) in {where}: {unknown}; expected some of {MODEL_FEATURES}")
+    if not names:
+        raise BadRequest(f"{where} must name at least one of {MODEL_FEATURES}")
+
+
+def _matrix_from_json(payload, feature_means):
+    if 'voltages' in payload:
+        return None, _vector(payload['voltages'], 'voltages')
+    if 'sweep' in payload:
+        sweep = payload['sweep']
+        if not isinstance(sweep, dict):
+            raise BadRequest("'sweep' must be an object: {\"start\": ..., \"stop\": ..., \"num\": ...}")
+        num = int(sweep.get('num', 100))
+        if not 0 < num <= MAX_BATCH_ROWS:
+            raise BadRequest(f"sweep.num must be between 1 and {MAX_BATCH_ROWS}")
+        return None, np.linspace(float(sweep['start']), float(sweep['stop']), num)
+    if 'columns' in payload:
+        if not isinstance(payload['columns'], dict):
+            raise BadRequest("'columns' must be an object: {feature: [values], ...}")
+        _check_feature_names(list(payload['columns']), "'columns'")
+        columns = {k: _vector(v, f'columns.{k}') for k, v in payload['columns'].items()}
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) != 1:
+            raise BadRequest("all 'columns' must have the same length")
+        return feature_matrix(columns, lengths.pop(), feature_means), None
+    if 'rows' in payload:
+        rows = payload['rows']
+        if not isinstance(rows, list):
+            raise BadRequest("'rows' must be a list of objects or of lists")
+        if rows and not all(isinstance(row, dict) for row in rows):
+            # Positional rows must list every feature in MODEL_FEATURES order
+            X = np.asarray(rows, dtype='float64')
+            if X.ndim != 2 or X.shape[1] != len(MODEL_FEATURES):
+                raise BadRequest(f"positional rows need {len(MODEL_FEATURES)} values: {MODEL_FEATURES}")
+            return X, None
+        # Keys a row leaves out fall back to the feature mean, like absent columns
+        frame = pd.DataFrame.from_records(rows)
+        if rows:
+            _check_feature_names(list(frame.columns), "'rows'")
+        columns = {c: frame[c].astype('float64').fillna(feature_means[c]).to_numpy() for c in frame.columns}
+        return feature_matrix(columns, len(frame), feature_means), None
+    raise BadRequest("expected one of 'rows', 'columns', 'voltages' or 'sweep'")
+
+
+def _matrix_from_csv(body, feature_means):
+    frame = pd.read_csv(io.BytesIO(body))
+    if 'Voltage' in frame.columns and len(frame.columns) == 1:
+        return None, frame['Voltage'].to_numpy(dtype='float64')
+    _check_feature_names(list(frame.columns), "the CSV header")
+    columns = {c: frame[c].to_numpy(dtype='float64') for c in frame.columns}
+    return feature_matrix(columns, len(frame), feature_means), None
+
+
+def parse_prediction_request(request, feature_means):
+    """Returns (X, voltages): a full feature matrix, or a 1-D voltage sweep (the other is None).
+
+    Anything malformed, including unknown feature names, raises BadRequest (a 400).
+    """
+    try:
+        if request.mimetype in ('text/csv', 'application/csv'):
+            X, voltages = _matrix_from_csv(request.get_data(), feature_means)
+        else:
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict):
+                raise BadRequest("send a JSON object or a text/csv body")
+            X, voltages = _matrix_from_json(payload, feature_means)
+
+        values = voltages if X is None else X
+        if len(values) == 0 or len(values) > MAX_BATCH_ROWS:
+            raise BadRequest(f"batch must hold between 1 and {MAX_BATCH_ROWS} rows")
+        if not np.isfinite(values).all():
+            raise BadRequest("all feature values must be finite numbers")
+    except BadRequest:
+        raise
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise BadRequest(f"could not read the request: {e}")
+    return X, voltages
+
+
+# --- 3. Flask Route ---
+def register_prediction_api(server, data_service):
+    """Adds POST /api/predict to the Dash app's Flask server.
+
+    JSON bodies: {"rows": [{feature: value, ...}, ...] or [[6 values], ...]},
+    {"columns": {feature: [values], ...}}, {"voltages": [...]} or
+    {"sweep": {"start": 220, "stop": 250, "num": 100}}. A text/csv body with a header row
+    is read the same way as "columns". Features that are left out use the dataset mean.
+    """
+
+    @server.route('/api/predict', methods=['POST'])
+    def api_predict():
+        if not data_service.ready or data_service.prediction_model is None:
+            return flask.jsonify(error="model not ready", status=data_service.status), 503
+        try:
+            X, voltages = parse_prediction_request(flask.request, data_service.feature_means)
+        except BadRequest as e:
+            return flask.jsonify(error=str(e)), 400
+
+        model = data_service.prediction_model
+        if X is None:
+            predictions = voltage_sweep(model, data_service.feature_means, voltages)
+        else:
+            predictions = predict_matrix(model, X)
+
+        response = {'count': int(len(predictions)), 'unit': 'kW', 'predictions': predictions.round(6).tolist()}
+        if voltages is not None:
+            response['voltages'] = voltages.tolist()
+        return flask.jsonify(response)
+
+    return api_predict
@@ -0,0 +1,213 @@
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# --- Configuration ---
+# In-memory budget for cached callback results (0 turns the cache off); ENERGY_CALLBACK_CACHE_MB overrides
+CALLBACK_CACHE_BYTES = int(float(os.environ.get('ENERGY_CALLBACK_CACHE_MB', '64')) * 1e6)
+# Seconds a result stays valid (None = until evicted or the data version changes)
+CALLBACK_CACHE_TTL = float(os.environ['ENERGY_CALLBACK_CACHE_TTL']) if os.environ.get('ENERGY_CALLBACK_CACHE_TTL') else None
+# Optional disk tier, shared by every worker on the host (off unless ENERGY_CALLBACK_CACHE_DIR is set)
+CALLBACK_CACHE_DIR = os.environ.get('ENERGY_CALLBACK_CACHE_DIR')
+CALLBACK_CACHE_DISK_BYTES = int(float(os.environ.get('ENERGY_CALLBACK_CACHE_DISK_MB', '512')) * 1e6)
+# Bump this when a cached callback's output changes shape, so older disk entries are never read.
+CACHE_FORMAT_VERSION = 1
+
+
+# --- 1. Plain Values ---
+def _plain(value):
+    # Figures and Patches are stored as the JSON-ready dicts Dash would send, so cached
+    # values are cheap to pickle and never shared as mutable plotly objects
+    if hasattr(value, 'to_plotly_json'):
+        return value.to_plotly_json()
+    if isinstance(value, (tuple, list)):
+        return type(value)(_plain(v) for v in value)
+    return value
+
+
+# --- 2. The Cache ---
+class ResultCache:
+    """LRU cache of callback results with a byte budget, an optional TTL and an optional disk tier.
+
+    Keys are (callback name, data version, arguments); a result is only reused for the data
+    it was computed from. Entry sizes are their pickled sizes. Past the budget the least
+    recently used entries are evicted. On a memory miss the disk tier (if any) is checked
+    and a hit there is promoted to memory. stats() gives hits and misses per callback.
+    """
+
+    def __init__(self, max_bytes=CALLBACK_CACHE_BYTES, ttl=CALLBACK_CACHE_TTL, disk_dir=CALLBACK_CACHE_DIR,
+                 disk_max_bytes=CALLBACK_CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # digest -> (value, size, expires_at)
+        self._bytes = 0
+        self._disk_bytes = None  # measured on the first disk write
+        self._counts = {}  # callback name -> {'hits', 'disk_hits', 'misses'}
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def digest(name, version, args):
+        key = repr((CACHE_FORMAT_VERSION, name, version, args))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _count(self, name, outcome):
+        counts = self._counts.setdefault(name, {'hits': 0, 'disk_hits': 0, 'misses': 0})
+        counts[outcome] += 1
+
+    def get(self, name, digest):
+        """(True, value) on a hit, (False, None) on a miss."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[2] is None or entry[2] > time.monotonic():
+                    self._entries.move_to_end(digest)
+                    self._count(name, 'hits')
+                    return True, entry[0]
+                self._drop(digest)
+                self.expirations += 1
+        found, value = self._disk_get(digest)
+        with self._lock:
+            self._count(name, 'disk_hits' if found else 'misses')
+        if found:
+            self._memory_put(digest, value, len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+        return found, value
+
+    def put(self, digest, value):
+        """Stores value (already plain) in memory and, when configured, on disk."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._memory_put(digest, value, len(data))
+        self._disk_put(digest, data)
+
+    def _memory_put(self, digest, value, size):
+        if size > self.max_bytes:
+            return
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._drop(digest)
+            self._entries[digest] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # The disk tier: one pickle per entry, LRU by modification time (touched on every hit)
+    def _disk_path(self, digest):
+        return os.path.join(self.disk_dir, digest[:2], digest + '.pkl')
+
+    def _disk_get(self, digest):
+        if not self.disk_dir:
+            return False, None
+        path = self._disk_path(digest)
+        try:
+            if self.ttl is not None and os.path.getmtime(path) + self.ttl < time.time():
+                return False, None
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)
+            return True, value
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False, None
+
+    def _disk_put(self, digest, data):
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ WARNING: Could not write the callback cache entry '{path}': {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+            over_budget = self._disk_bytes is None or self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        # Other workers write to the same folder, so the size is re-measured here
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for file_name in names:
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        """Entry count, bytes, evictions and per-callback hit/miss counts."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disk_bytes': self._disk_bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'callbacks': {name: dict(counts) for name, counts in self._counts.items()},
+            }
+
+
+callback_cache = ResultCache()
+
+
+# --- 3. Decorator ---
+def memoized(name, version, cache=callback_cache):
+    """Caches a function's results by its (hashable, repr-stable) arguments and version().
+
+    version() identifies the data the result is computed from (DataService.data_version);
+    while it returns None, nothing is cached.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args):
+            data_version = version()
+            if not cache.enabled or data_version is None:
+                return fn(*args)
+            digest = cache.digest(name, data_version, args)
+            found, value = cache.get(name, digest)
+            if not found:
+                value = _plain(fn(*args))
+                cache.put(digest, value)
+            return value
+        return wrapper
+    return decorator
@@ -0,0 +1,109 @@
+import json
+import mmap
+import os
+import pickle
+import sys
+import time
+
+from data_cache import CACHE_DIR
+
+# --- Configuration ---
+# Where the loader process publishes the snapshot that gunicorn workers attach to.
+# Pointing ENERGY_SHARED_SNAPSHOT at a tmpfs such as /dev/shm keeps it off disk entirely.
+DEFAULT_SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'snapshot')
+# Bump this when the snapshot layout changes so older snapshots are rebuilt.
+SNAPSHOT_FORMAT_VERSION = 1
+# Every array buffer starts on a cache-line boundary inside the buffers file
+BUFFER_ALIGNMENT = 64
+
+
+# --- 1. Publishing (one loader process) ---
+def publish_snapshot(state, source, snapshot_dir=DEFAULT_SNAPSHOT_DIR):
+    """Writes {name: object} as a pickle whose array buffers live in one flat file.
+
+    Pickle protocol 5 hands every contiguous numpy buffer (DataFrame blocks, the aggregate
+    cube, the prefix sums, the detail pyramids) to us out of band, so they are written
+    once, aligned, into snapshot.buffers and never copied into the pickle stream itself.
+    """
+    buffers = []
+    payload = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    spans = []
+    with open(os.path.join(snapshot_dir, 'snapshot.buffers.tmp'), 'wb') as f:
+        for buffer in buffers:
+            raw = buffer.raw()
+            f.write(b'\0' * (-f.tell() % BUFFER_ALIGNMENT))
+            spans.append((f.tell(), raw.nbytes))
+            f.write(raw)
+    with open(os.path.join(snapshot_dir, 'snapshot.pkl.tmp'), 'wb') as f:
+        f.write(payload)
+    os.replace(os.path.join(snapshot_dir, 'snapshot.buffers.tmp'), os.path.join(snapshot_dir, 'snapshot.buffers'))
+    os.replace(os.path.join(snapshot_dir, 'snapshot.pkl.tmp'), os.path.join(snapshot_dir, 'snapshot.pkl'))
+
+    # The manifest is written last, so a half-written snapshot is never attached to
+    manifest = {
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source': source,
+        'spans': spans,
+        'buffer_bytes': sum(n for _, n in spans),
+        'pickle_bytes': len(payload),
+    }
+    with open(os.path.join(snapshot_dir, 'snapshot.json.tmp'), 'w') as f:
+        json.dump(manifest, f)
+    os.replace(os.path.join(snapshot_dir, 'snapshot.json.tmp'), os.path.join(snapshot_dir, 'snapshot.json'))
+    return manifest
+
+
+# --- 2. Attaching (every worker) ---
+def attach_snapshot(snapshot_dir, source):
+    """Returns the published {name: object}, its arrays mapped zero-copy and read-only.
+
+    Returns None when there is no snapshot or it was built from another version of the
+    source file. Every process that attaches shares the same physical pages, so another
+    worker only adds its own small Python objects, not another copy of the data.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, 'snapshot.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != SNAPSHOT_FORMAT_VERSION or manifest.get('source') != source:
+        return None
+
+    with open(os.path.join(snapshot_dir, 'snapshot.buffers'), 'rb') as f:
+        if manifest['buffer_bytes']:
+            mapped = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            mapped = memoryview(b'')
+    with open(os.path.join(snapshot_dir, 'snapshot.pkl'), 'rb') as f:
+        payload = f.read()
+    # The arrays keep the mapping alive for as long as they are referenced
+    return pickle.loads(payload, buffers=[mapped[offset:offset + n] for offset, n in manifest['spans']])
+
+
+# --- 3. Loader Entry Point ---
+def main(snapshot_dir=None):
+    """Loads the data once in this process and publishes it for the web workers."""
+    from data_analysis import HOUSEHOLD_DIR, DataService
+
+    snapshot_dir = snapshot_dir or os.environ.get('ENERGY_SHARED_SNAPSHOT') or DEFAULT_SNAPSHOT_DIR
+    # The same source the workers check: FILE_PATH, or every file in ENERGY_HOUSEHOLD_DIR
+    service = DataService(household_dir=HOUSEHOLD_DIR)
+    source = service.current_source()
+    if attach_snapshot(snapshot_dir, source) is not None:
+        print(f"✅ Shared snapshot in '{snapshot_dir}' is current.")
+        return 0
+    try:
+        service.wait()
+    except Exception:
+        return 1
+    manifest = publish_snapshot(service.snapshot_state(), source, snapshot_dir)
+    print(f"✅ Published shared snapshot to '{snapshot_dir}' "
+          f"({manifest['buffer_bytes'] / 1e6:.1f} MB mapped, {manifest['pickle_bytes'] / 1e6:.1f} MB pickled).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:]))
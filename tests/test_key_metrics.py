@@ -0,0 +1,29 @@
+"""Compact mode (float32 readings) must show exactly the sidebar and pie values of the default frame."""
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from dashboard_layout import format_key_metrics  # noqa: E402
+from data_analysis import compute_key_metrics, load_and_process_data  # noqa: E402
+from generate_data import generate  # noqa: E402
+
+
+def test_compact_key_metrics_match_default(tmp_path):
+    data_file = str(tmp_path / 'readings.txt')
+    generate(data_file, 20000)
+    metrics = {}
+    for compact in (False, True):
+        hourly = load_and_process_data(data_file, compact=compact, use_cache=False).set_index('DateTime')
+        metrics[compact] = compute_key_metrics(hourly)
+
+    assert metrics[True] == metrics[False]
+    # No float32 leaks into the pie or the sidebar text ("1.3730000257492065 kW")
+    assert not any(isinstance(v, np.float32) for v in metrics[True]['consumption_breakdown'].values())
+    texts = format_key_metrics(metrics[True], 0.5)
+    assert texts == format_key_metrics(metrics[False], 0.5)
+    assert len(texts[0].split()[0].split('.')[1]) <= 3 and len(texts[2].split()[0].split('.')[1]) <= 3
@@ -0,0 +1,65 @@
+"""POST /api/predict answers malformed bodies with a 400, never a 500 or a silent all-means prediction."""
+import os
+import sys
+from types import SimpleNamespace
+
+import flask
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_analysis import MODEL_FEATURES, _linear_model  # noqa: E402
+from prediction_api import register_prediction_api  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    service = SimpleNamespace(
+        ready=True, status='ready',
+        prediction_model=_linear_model(0.5, np.arange(1, len(MODEL_FEATURES) + 1) / 100),
+        feature_means=pd.Series(np.ones(len(MODEL_FEATURES)), index=MODEL_FEATURES),
+    )
+    server = flask.Flask(__name__)
+    register_prediction_api(server, service)
+    return server.test_client()
+
+
+@pytest.mark.parametrize('payload', [
+    {'voltages': 5},
+    {'voltages': [[230, 240], [250, 260]]},
+    {'voltages': ['a']},
+    {'sweep': [1, 2]},
+    {'sweep': {'start': 220}},
+    {'columns': [1, 2]},
+    {'columns': {'Voltage': [[1, 2]]}},
+    {'columns': {'voltage': [240]}},
+    {'columns': {}},
+    {'rows': [{'voltage': 240}]},
+    {'rows': [{'Voltage': 240, 'Colour': 1}]},
+    {'rows': 'Voltage'},
+    {'rows': [[1, 2]]},
+    {'rows': []},
+    {'nothing': []},
+])
+def test_malformed_json_is_a_400(client, payload):
+    response = client.post('/api/predict', json=payload)
+    assert response.status_code == 400, response.get_data(as_text=True)
+    assert 'error' in response.get_json()
+
+
+def test_unknown_csv_column_is_a_400(client):
+    response = client.post('/api/predict', data='voltage,Month\n240,1\n', content_type='text/csv')
+    assert response.status_code == 400
+
+
+def test_valid_requests(client):
+    voltages = client.post('/api/predict', json={'voltages': [230, 240]}).get_json()
+    assert voltages['count'] == 2 and voltages['voltages'] == [230.0, 240.0]
+    rows = client.post('/api/predict', json={'rows': [{'Voltage': 230}, {'Voltage': 240}]}).get_json()
+    assert rows['predictions'] == voltages['predictions']
+    columns = client.post('/api/predict', json={'columns': {'Voltage': [230, 240]}}).get_json()
+    assert columns['predictions'] == voltages['predictions']
+    csv = client.post('/api/predict', data='Voltage,Month\n230,1\n', content_type='text/csv')
+    assert csv.status_code == 200 and csv.get_json()['count'] == 1
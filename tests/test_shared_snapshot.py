@@ -0,0 +1,51 @@
+"""The gunicorn deployment in household mode: one loader process publishes the fleet, a worker attaches it."""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+import json
+import data_analysis
+service = data_analysis.data_service.wait()
+print(json.dumps({'households': sorted(service.households), 'rows': len(service.data_df),
+                  'house_a_rows': len(service.view('house_a').data_df)}))
+"""
+
+
+def _run(args, env):
+    result = subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, timeout=600)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def test_loader_then_worker_in_household_mode(tmp_path):
+    household_dir = tmp_path / 'households'
+    household_dir.mkdir()
+    for seed, name in enumerate(['house_a', 'house_b']):
+        _run(['benchmarks/generate_data.py', '--rows', '20000', '--seed', str(seed),
+              '--output', str(household_dir / f'{name}.txt')], os.environ.copy())
+
+    env = dict(os.environ, PYTHONPATH=ROOT, ENERGY_HOUSEHOLD_DIR=str(household_dir),
+               ENERGY_SHARED_SNAPSHOT=str(tmp_path / 'snapshot'), ENERGY_CACHE_DIR=str(tmp_path / 'cache'),
+               ENERGY_MODEL_DIR=str(tmp_path / 'models'), ENERGY_CALLBACK_CACHE_MB='0',
+               ENERGY_INGEST_WORKERS='1', ENERGY_SELECTION_WORKERS='1',
+               # Household mode must never touch the single-file source
+               ENERGY_DATA_FILE=str(tmp_path / 'missing.txt'))
+
+    loader = _run(['shared_snapshot.py'], env)
+    assert 'Published shared snapshot' in loader
+    assert 'is current' in _run(['shared_snapshot.py'], env)
+
+    worker = _run(['-c', WORKER], env)
+    assert 'loading in this process' not in worker and 'Loaded 2 households' not in worker
+    state = json.loads(worker.strip().splitlines()[-1])
+    assert state['households'] == ['house_a', 'house_b']
+    assert 0 < state['house_a_rows'] < state['rows']
+
+    # A changed household file makes the snapshot stale: the worker loads by itself
+    with open(household_dir / 'house_b.txt', 'a') as f:
+        f.write('1/1/2007;00:00:00;1.000;0.100;240.000;4.200;0.000;0.000;0.000\n')
+    assert 'No current shared snapshot' in _run(['-c', WORKER], env)
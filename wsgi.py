@@ -0,0 +1,8 @@
+"""WSGI entry point for multi-worker deployments.
+
+    gunicorn -c gunicorn_conf.py wsgi:server
+
+gunicorn_conf.py loads the data once, in a separate loader process, and publishes it as a
+shared snapshot; every worker that imports this module attaches to it instead of loading.
+"""
+from app import app, server  # noqa: F401